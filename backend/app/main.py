@@ -1,31 +1,73 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Body, Request
-from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Body, Request, Depends
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any, Iterable
-from io import BytesIO
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Iterable, Callable, Awaitable
 import re
 import os
 import base64
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
 
 from app.services.pdf_address import (
     parse_lotplan_from_text,
     parse_au_address_structured,
     extract_pdf_insights,
+    iter_pdf_insights,
     extract_text_insights,
+    close_ocr_executor,
+    insights_cache,
 )
 from app.services.arcgis import (
-    query_parcels_by_point,
-    query_parcels_by_lotplan,
-    query_parcels_from_address,
-    to_kmz,
+    Plan,
+    run_plan_async,
+    gather_plans,
+    parcels_by_lotplans_plan,
+    parcels_from_address_plan,
+    parcel_labels_plan,
+    folder_name_plan,
+    query_parcels_by_lotplans_async,
+    query_parcels_from_address_async,
+    best_folder_name_from_parcels_async,
+    iter_kmz,
     normalize_lotplan,
-    best_folder_name_from_parcels,
+    close_http_session,
+    close_http_async_client,
+    close_query_executor,
+    parcel_cache,
+    label_cache,
+    invalidate_parcel_cache,
+    invalidate_label_cache,
+    upstream_stats,
+    LOTPLAN_BATCH_SIZE,
 )
+from app.services import metrics
+from app.services.tracing import start_trace, end_trace, trace_store
+from app.services.cache import set_cache_bypass, reset_cache_bypass
+from app.services.workers import pdf_executor, QueueFull
+from app.services.resilience import UpstreamError, DeadlineExceeded, set_deadline, reset_deadline
+from app.services.cadastre import local_cadastre
+from app.services.gazetteer import address_gazetteer
+from app.services.jobs import job_store, job_runner, check_webhook_url, JOB_MAX_DOCUMENTS
 
 API_KEY = os.getenv("X_API_KEY", "")
 
-app = FastAPI(title="Parcel Agent", version="0.4.0-qld")
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    job_runner.start(_process_job_document)
+    yield
+    await job_runner.stop()
+    await close_http_async_client()
+    close_query_executor()
+    close_http_session()
+    close_ocr_executor()
+    pdf_executor.shutdown()
+    for cache in (parcel_cache, label_cache, insights_cache):
+        cache.flush()
+
+app = FastAPI(title="Parcel Agent", version="0.4.0-qld", lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,8 +75,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Debug-Trace-Id"],
 )
 
+_HEX_COLOR = r"^#?[0-9A-Fa-f]{6}$"
+
+class KmzStyle(BaseModel):
+    color: Optional[str] = Field(None, pattern=_HEX_COLOR)
+    fill_opacity: Optional[float] = Field(None, ge=0, le=1)
+    line_width: Optional[float] = Field(None, gt=0, le=20)
+    palette: Optional[List[str]] = Field(None, description="Hex colours cycled across group folders")
+
+class KmzGeometry(BaseModel):
+    simplify_m: Optional[float] = Field(None, ge=0, le=100, description="Simplification tolerance in metres; shared boundaries stay aligned")
+    precision: Optional[int] = Field(None, ge=0, le=15, description="Decimal places kept in KML coordinates")
+
 class AddressIn(BaseModel):
     property_name: Optional[str] = None
     house_number: Optional[str] = None
@@ -50,6 +105,7 @@ class AddressLookup(BaseModel):
     relax_no_number: bool = False
     max_results: int = 500
     property_name: Optional[str] = None
+    style: Optional[KmzStyle] = None
 
 class LotPlanGroup(BaseModel):
     label: Optional[str] = None
@@ -61,6 +117,7 @@ class GroupedKmzRequest(BaseModel):
     groups: List[LotPlanGroup]
     default_label: Optional[str] = None
     max_results: int = 1000
+    style: Optional[KmzStyle] = None
 
 class EmailAttachment(BaseModel):
     filename: str
@@ -74,6 +131,15 @@ class EmailParcelRequest(BaseModel):
     relax_no_number: bool = False
     max_results: int = 1000
     attachments: Optional[List[EmailAttachment]] = None
+    style: Optional[KmzStyle] = None
+    max_pages: Optional[int] = Field(None, ge=1)
+    stop_after_matches: Optional[int] = Field(None, ge=1)
+
+class EmailJobRequest(BaseModel):
+    emails: List[EmailParcelRequest]
+    label: Optional[str] = None
+    webhook_url: Optional[str] = Field(None, pattern=r"^https?://")
+    style: Optional[KmzStyle] = None
 
 _LOTPLAN_FINDER = re.compile(
     r"\d+[A-Z]?(?:\s*/\s*|\s*[-]?\s*)?[A-Z]{1,4}\s*\d+",
@@ -84,12 +150,48 @@ def _safe_folder_name(name: str) -> str:
     return "".join(ch for ch in name if ch.isalnum() or ch in " -_,")\
         .replace(",,", ",").strip().strip(",") or "parcels"
 
-def _kmz_stream_response(features: List[Dict[str, Any]], folder_name: str, grouped: Optional[Dict[str, List[Dict[str, Any]]]] = None):
-    display_name = folder_name or "parcels"
+def _kmz_headers(display_name: str) -> Dict[str, str]:
     safe_name = _safe_folder_name(display_name)
-    kmz_bytes = to_kmz(features, folder_name=display_name, grouped_features=grouped)
-    headers = {"Content-Disposition": f'attachment; filename="{safe_name}.kmz"'}
-    return StreamingResponse(BytesIO(kmz_bytes), media_type="application/vnd.google-earth.kmz", headers=headers)
+    return {"Content-Disposition": f'attachment; filename="{safe_name}.kmz"'}
+
+def _style_query(
+    color: Optional[str] = Query(None, pattern=_HEX_COLOR),
+    fill_opacity: Optional[float] = Query(None, ge=0, le=1),
+    line_width: Optional[float] = Query(None, gt=0, le=20),
+    palette: Optional[str] = Query(None, description="Comma-separated hex colours cycled across group folders"),
+) -> KmzStyle:
+    colors = [c.strip() for c in (palette or "").split(",") if c.strip()]
+    return KmzStyle(color=color, fill_opacity=fill_opacity, line_width=line_width, palette=colors or None)
+
+def _geometry_query(
+    simplify_m: Optional[float] = Query(None, ge=0, le=100, description="Simplification tolerance in metres; shared boundaries stay aligned"),
+    precision: Optional[int] = Query(None, ge=0, le=15, description="Decimal places kept in KML coordinates"),
+) -> KmzGeometry:
+    return KmzGeometry(simplify_m=simplify_m, precision=precision)
+
+def _kmz_style_kwargs(style: Optional[KmzStyle]) -> Dict[str, Any]:
+    if not style:
+        return {}
+    for c in style.palette or []:
+        if not re.match(_HEX_COLOR, c):
+            raise HTTPException(400, f"Invalid palette colour: {c}")
+    return {
+        "style": style.model_dump(exclude={"palette"}, exclude_none=True),
+        "palette": style.palette or None,
+    }
+
+def _kmz_geometry_kwargs(geometry: Optional[KmzGeometry]) -> Dict[str, Any]:
+    return geometry.model_dump(exclude_none=True) if geometry else {}
+
+def _kmz_stream_response(features: List[Dict[str, Any]], folder_name: str, grouped: Optional[Dict[str, List[Dict[str, Any]]]] = None, style: Optional[KmzStyle] = None, geometry: Optional[KmzGeometry] = None):
+    display_name = folder_name or "parcels"
+    chunks = iter_kmz(features, folder_name=display_name, grouped_features=grouped, **_kmz_style_kwargs(style), **_kmz_geometry_kwargs(geometry))
+    return StreamingResponse(chunks, media_type="application/vnd.google-earth.kmz", headers=_kmz_headers(display_name))
+
+async def _kmz_stream_response_async(features: List[Dict[str, Any]], folder_name: str, grouped: Optional[Dict[str, List[Dict[str, Any]]]] = None, style: Optional[KmzStyle] = None, geometry: Optional[KmzGeometry] = None):
+    display_name = folder_name or "parcels"
+    chunks = await pdf_executor.stream(iter_kmz, features, folder_name=display_name, grouped_features=grouped, **_kmz_style_kwargs(style), **_kmz_geometry_kwargs(geometry))
+    return StreamingResponse(chunks, media_type="application/vnd.google-earth.kmz", headers=_kmz_headers(display_name))
 
 def _extract_lotplan_tokens(raw: str) -> List[str]:
     if not raw:
@@ -110,11 +212,34 @@ def _html_to_text(html: Optional[str]) -> str:
     text = _HTML_TAG.sub(" ", text)
     return re.sub(r"\s+", " ", text).strip()
 
-def _resolve_insights_to_parcels(
+def _normalize_or_compact(token: str) -> str:
+    try:
+        return normalize_lotplan(token)
+    except ValueError:
+        return token.replace(" ", "").upper()
+
+def _address_lookup_key(addr: Dict[str, Any], relax_no_number: bool) -> str:
+    return json.dumps([addr, bool(relax_no_number)], sort_keys=True, default=str)
+
+def _address_lookup_plan(addr: Dict[str, Any], relax_no_number: bool, max_results: int) -> Plan[List[Dict[str, Any]]]:
+    try:
+        return (yield from parcels_from_address_plan(addr, relax_no_number=relax_no_number, max_results=max_results))
+    except ValueError:
+        return []
+
+def _address_lookups_plan(lookups: List[tuple], max_results: int) -> Plan[Dict[str, List[Dict[str, Any]]]]:
+    unique: Dict[str, tuple] = {}
+    for addr, relax in lookups:
+        unique.setdefault(_address_lookup_key(addr, relax), (addr, relax))
+    hits = yield from gather_plans([_address_lookup_plan(addr, relax, max_results) for addr, relax in unique.values()])
+    return dict(zip(unique, hits))
+
+def _resolve_insights_plan(
     insights_iter: Iterable[Dict[str, Any]],
     max_results: int,
     relax_no_number: bool,
-) -> Dict[str, Any]:
+    prefetched: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> Plan[Dict[str, Any]]:
     grouped_features: Dict[str, List[Dict[str, Any]]] = {}
     all_parcels: List[Dict[str, Any]] = []
     ungrouped_parcels: List[Dict[str, Any]] = []
@@ -125,57 +250,91 @@ def _resolve_insights_to_parcels(
 
     insights_list = [ins for ins in insights_iter if ins]
 
+    # Claim every lot/plan token up front (first occurrence wins, as before) so
+    # the Parcels layer is hit with batched IN queries instead of one per token.
+    def claim(token: str) -> Optional[str]:
+        raw_token = (token or "").strip()
+        if not raw_token:
+            return None
+        norm_token = _normalize_or_compact(raw_token)
+        if norm_token in processed_tokens:
+            return None
+        processed_tokens.add(norm_token)
+        return norm_token
+
+    claimed_group_tokens: List[List[List[str]]] = []
+    claimed_record_tokens: List[List[str]] = []
     for insight in insights_list:
+        claimed_group_tokens.append([
+            [tok for tok in map(claim, group.get("lotplans") or []) if tok]
+            for group in insight.get("address_lotplan_groups", []) or []
+        ])
+        claimed_record_tokens.append([
+            tok for tok in (claim(record.get("lotplan", "")) for record in insight.get("lotplans", []) or []) if tok
+        ])
+    all_claimed = [tok for groups in claimed_group_tokens for toks in groups for tok in toks]
+    all_claimed.extend(tok for toks in claimed_record_tokens for tok in toks)
+    # Lot/plans looked up while the document was still being extracted aren't fetched again.
+    prefetched = prefetched or {}
+    lotplan_hits = dict(prefetched)
+    lotplan_hits.update((yield from parcels_by_lotplans_plan([tok for tok in all_claimed if tok not in prefetched], max_results=max_results)))
+
+    # Address lookups run concurrently in two waves: group fallbacks first, then
+    # standalone addresses not already claimed by a successful group. The
+    # assembly pass below then replays the original sequential logic.
+    def group_entries(insight_index: int):
+        groups = insights_list[insight_index].get("address_lotplan_groups", []) or []
+        for group, group_tokens in zip(groups, claimed_group_tokens[insight_index]):
+            structured_addr = group.get("address") or {}
+            relax_flag = group.get("relax_no_number", relax_no_number)
+            token_parcels = [feat for tok in group_tokens for feat in lotplan_hits[tok]]
+            yield group, structured_addr, relax_flag, token_parcels
+
+    group_lookups = [
+        (structured_addr, relax_flag)
+        for insight_index in range(len(insights_list))
+        for _, structured_addr, relax_flag, token_parcels in group_entries(insight_index)
+        if not token_parcels and structured_addr
+    ]
+    address_hits = yield from _address_lookups_plan(group_lookups, max_results)
+    claimed_originals: set[str] = set()
+    record_lookups = []
+    for insight_index, insight in enumerate(insights_list):
+        for _, structured_addr, relax_flag, token_parcels in group_entries(insight_index):
+            found = token_parcels or (structured_addr and address_hits[_address_lookup_key(structured_addr, relax_flag)])
+            if found and structured_addr.get("original"):
+                claimed_originals.add(structured_addr["original"])
+        for record in insight.get("addresses", []) or []:
+            addr = record.get("address") or {}
+            if addr.get("original") not in claimed_originals:
+                record_lookups.append((addr, relax_no_number))
+    address_hits.update((yield from _address_lookups_plan(record_lookups, max_results)))
+    # Resolve folder labels for every candidate parcel in one batched Address query.
+    address_labels = yield from parcel_labels_plan(
+        [feat for hits in lotplan_hits.values() for feat in hits]
+        + [feat for hits in address_hits.values() for feat in hits]
+    )
+
+    for insight_index, insight in enumerate(insights_list):
         for page in insight.get("pages", []) or []:
             text = page.get("text")
             if text:
                 fallback_texts.append(text)
 
-        groups = insight.get("address_lotplan_groups", []) or []
-        for group in groups:
-            structured_addr = group.get("address") or {}
+        for group, structured_addr, relax_flag, group_parcels in group_entries(insight_index):
             raw_address = group.get("raw_address") or structured_addr.get("original")
-            lot_tokens = group.get("lotplans") or []
-            relax_flag = group.get("relax_no_number", relax_no_number)
-            group_parcels: List[Dict[str, Any]] = []
-            for token in lot_tokens:
-                raw_token = token.strip()
-                if not raw_token:
-                    continue
-                try:
-                    norm_token = normalize_lotplan(raw_token)
-                except ValueError:
-                    norm_token = raw_token.replace(" ", "").upper()
-                if norm_token in processed_tokens:
-                    continue
-                processed_tokens.add(norm_token)
-                group_parcels.extend(query_parcels_by_lotplan(norm_token, max_results=max_results))
             if not group_parcels and structured_addr:
-                try:
-                    group_parcels = query_parcels_from_address(structured_addr, relax_no_number=relax_flag, max_results=max_results)
-                except ValueError:
-                    group_parcels = []
+                group_parcels = address_hits[_address_lookup_key(structured_addr, relax_flag)]
             if group_parcels:
-                folder_label = best_folder_name_from_parcels(group_parcels, raw_address)
+                folder_label = yield from folder_name_plan(group_parcels, raw_address, labels=address_labels)
                 grouped_features.setdefault(folder_label, []).extend(group_parcels)
                 group_labels.append(folder_label)
                 all_parcels.extend(group_parcels)
                 if structured_addr.get("original"):
                     used_addresses.add(structured_addr["original"])
 
-        lotplan_records = insight.get("lotplans", []) or []
-        for record in lotplan_records:
-            token = record.get("lotplan", "")
-            if not token:
-                continue
-            try:
-                norm = normalize_lotplan(token)
-            except ValueError:
-                norm = token.replace(" ", "").upper()
-            if norm in processed_tokens:
-                continue
-            processed_tokens.add(norm)
-            hits = query_parcels_by_lotplan(norm, max_results=max_results)
+        for norm in claimed_record_tokens[insight_index]:
+            hits = lotplan_hits[norm]
             if hits:
                 ungrouped_parcels.extend(hits)
                 all_parcels.extend(hits)
@@ -186,12 +345,9 @@ def _resolve_insights_to_parcels(
             original = addr.get("original")
             if original and original in used_addresses:
                 continue
-            try:
-                hits = query_parcels_from_address(addr, relax_no_number=relax_no_number, max_results=max_results)
-            except ValueError:
-                hits = []
+            hits = address_hits[_address_lookup_key(addr, relax_no_number)]
             if hits:
-                folder_label = best_folder_name_from_parcels(hits, original or addr.get("street"))
+                folder_label = yield from folder_name_plan(hits, original or addr.get("street"), labels=address_labels)
                 grouped_features.setdefault(folder_label, []).extend(hits)
                 group_labels.append(folder_label)
                 all_parcels.extend(hits)
@@ -201,27 +357,19 @@ def _resolve_insights_to_parcels(
     if not all_parcels:
         combined = "\n".join(fallback_texts)
         lotplans = parse_lotplan_from_text(combined)
-        for lp in lotplans[:100]:
-            try:
-                norm = normalize_lotplan(lp)
-            except ValueError:
-                norm = lp.replace(" ", "").upper()
-            if norm in processed_tokens:
-                continue
-            processed_tokens.add(norm)
-            hits = query_parcels_by_lotplan(norm, max_results=max_results)
+        fallback_tokens = [tok for tok in map(claim, lotplans[:100]) if tok]
+        fallback_hits = yield from parcels_by_lotplans_plan(fallback_tokens, max_results=max_results)
+        for norm in fallback_tokens:
+            hits = fallback_hits[norm]
             if hits:
                 ungrouped_parcels.extend(hits)
                 all_parcels.extend(hits)
         if not all_parcels:
             text_addresses = parse_au_address_structured(combined)
             for addr in text_addresses[:5]:
-                try:
-                    hits = query_parcels_from_address(addr, relax_no_number=relax_no_number, max_results=max_results)
-                except ValueError:
-                    hits = []
+                hits = yield from _address_lookup_plan(addr, relax_no_number, max_results)
                 if hits:
-                    folder_label = best_folder_name_from_parcels(hits, addr.get("original"))
+                    folder_label = yield from folder_name_plan(hits, addr.get("original"))
                     grouped_features.setdefault(folder_label, []).extend(hits)
                     group_labels.append(folder_label)
                     all_parcels.extend(hits)
@@ -234,7 +382,7 @@ def _resolve_insights_to_parcels(
     if group_labels:
         folder_name = " & ".join(dict.fromkeys(group_labels))[:120] or None
     if not folder_name:
-        folder_name = best_folder_name_from_parcels(all_parcels, None)
+        folder_name = yield from folder_name_plan(all_parcels, None)
 
     return {
         "folder_name": folder_name,
@@ -243,6 +391,183 @@ def _resolve_insights_to_parcels(
         "all_parcels": all_parcels,
     }
 
+class _LotplanPrefetch:
+    # Parcels lookups for lot/plans found on the pages extracted so far, started
+    # while later pages are still being extracted. Tokens found while a lookup is
+    # in flight wait for the next one, unless a full IN batch is ready.
+    def __init__(self, max_results: int):
+        self.max_results = max_results
+        self.requested: set[str] = set()
+        self.pending: List[str] = []
+        self.tasks: List[asyncio.Task] = []
+        self.in_flight = 0
+        self.closed = False
+
+    def add(self, tokens: Iterable[str]) -> None:
+        for token in tokens:
+            norm = _normalize_or_compact(token)
+            if norm and norm not in self.requested:
+                self.requested.add(norm)
+                self.pending.append(norm)
+        if self.pending and (not self.in_flight or len(self.pending) >= LOTPLAN_BATCH_SIZE):
+            self._flush()
+
+    def _flush(self) -> None:
+        batch, self.pending = self.pending, []
+        self.in_flight += 1
+        task = asyncio.ensure_future(self._lookup(batch))
+        task.add_done_callback(self._done)
+        self.tasks.append(task)
+
+    async def _lookup(self, batch: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        # Own lookup budget (the task runs in a copy of the request's context):
+        # touching the request's deadline here would start its clock while later
+        # pages are still being extracted.
+        token = set_deadline()
+        try:
+            return await query_parcels_by_lotplans_async(batch, max_results=self.max_results)
+        finally:
+            reset_deadline(token)
+
+    def _done(self, _task: asyncio.Task) -> None:
+        self.in_flight -= 1
+        if self.pending and not self.in_flight and not self.closed:
+            self._flush()
+
+    async def results(self) -> Dict[str, List[Dict[str, Any]]]:
+        # Tokens still pending are left to the resolve plan's own batched lookup.
+        self.closed = True
+        hits: Dict[str, List[Dict[str, Any]]] = {}
+        for task in list(self.tasks):
+            try:
+                hits.update(await task)
+            except Exception:
+                # Failed lookups are retried (and reported) by the resolve plan.
+                pass
+        return hits
+
+    def cancel(self) -> None:
+        self.closed = True
+        for task in self.tasks:
+            task.cancel()
+
+async def _streamed_pdf_insights(content: bytes, max_results: int, max_pages: Optional[int], stop_after_matches: Optional[int]) -> tuple:
+    # Pages are parsed as the extraction pool produces them; their lot/plans are
+    # looked up meanwhile. Returns (insights, prefetched lot/plan hits).
+    prefetch = _LotplanPrefetch(max_results)
+    insights: Optional[Dict[str, Any]] = None
+    stream = await pdf_executor.stream(iter_pdf_insights, content, max_pages=max_pages, stop_after_matches=stop_after_matches)
+    try:
+        async for kind, value in stream:
+            if kind == "page":
+                prefetch.add(value["lotplans"])
+            else:
+                insights = value
+        return insights, await prefetch.results()
+    finally:
+        await stream.aclose()
+        prefetch.cancel()
+
+async def _email_insights(payload: EmailParcelRequest, run: Callable[..., Awaitable[Any]]) -> List[Dict[str, Any]]:
+    texts: List[str] = []
+    if payload.body_text:
+        texts.append(payload.body_text)
+    if payload.body_html:
+        texts.append(_html_to_text(payload.body_html))
+    combined_text = "\n".join(part for part in texts if part)
+    insights: List[Dict[str, Any]] = []
+    if combined_text.strip():
+        insights.append(await run(extract_text_insights, combined_text))
+
+    for attachment in payload.attachments or []:
+        filename = attachment.filename or "attachment"
+        content_type = (attachment.content_type or "").lower()
+        if content_type.startswith("application/pdf") or filename.lower().endswith(".pdf"):
+            try:
+                data = base64.b64decode(attachment.content_base64)
+            except Exception as exc:
+                raise HTTPException(400, f"Failed to decode attachment {filename}: {exc}") from exc
+            try:
+                insights.append(await run(extract_pdf_insights, data, max_pages=payload.max_pages, stop_after_matches=payload.stop_after_matches))
+            except QueueFull:
+                raise
+            except Exception as exc:
+                raise HTTPException(500, f"Failed to analyze attachment {filename}: {exc}") from exc
+
+    if not insights:
+        raise HTTPException(400, "Email content does not contain parsable text or supported attachments.")
+    return insights
+
+def _kmz_bytes(features: List[Dict[str, Any]], **kwargs: Any) -> bytes:
+    return b"".join(iter_kmz(features, **kwargs))
+
+def _job_style(options: Dict[str, Any]) -> Optional[KmzStyle]:
+    return KmzStyle(**options["style"]) if options.get("style") else None
+
+def _job_geometry(options: Dict[str, Any]) -> KmzGeometry:
+    return KmzGeometry(**options.get("geometry") or {})
+
+async def _process_job_document(doc: Dict[str, Any]) -> tuple:
+    # Same pipeline as /process_pdf_kmz and /kmz_from_email, but waiting for a
+    # free extraction slot instead of answering 503.
+    options = doc["options"]
+    style = _job_style(options)
+    if doc["kind"] == "email":
+        email = EmailParcelRequest.model_validate_json(doc["payload"])
+        insights = await _email_insights(email, pdf_executor.run_when_free)
+        label = (email.subject or "").strip() or None
+        max_results, relax_no_number = email.max_results, email.relax_no_number
+        style = email.style or style
+    else:
+        insights = [await pdf_executor.run_when_free(
+            extract_pdf_insights, doc["payload"],
+            max_pages=options.get("max_pages"), stop_after_matches=options.get("stop_after_matches"),
+        )]
+        label = None
+        max_results, relax_no_number = options["max_results"], options["relax_no_number"]
+    resolved = await run_plan_async(_resolve_insights_plan(insights, max_results=max_results, relax_no_number=relax_no_number))
+    folder_name = label or resolved["folder_name"]
+    kmz = await pdf_executor.run_when_free(
+        _kmz_bytes,
+        resolved["ungrouped_parcels"],
+        folder_name=folder_name,
+        grouped_features=resolved["grouped_features"],
+        **_kmz_style_kwargs(style),
+        **_kmz_geometry_kwargs(_job_geometry(options)),
+    )
+    return folder_name, resolved, kmz
+
+async def _submit_job(documents: List[tuple], options: Dict[str, Any], webhook_url: Optional[str]) -> Dict[str, Any]:
+    if not documents:
+        raise HTTPException(400, "Provide at least one document.")
+    if len(documents) > JOB_MAX_DOCUMENTS:
+        raise HTTPException(400, f"Too many documents in one job (limit {JOB_MAX_DOCUMENTS}).")
+    if webhook_url:
+        try:
+            await check_webhook_url(webhook_url)
+        except ValueError as exc:
+            raise HTTPException(400, str(exc)) from exc
+    job_id = await asyncio.to_thread(job_store.create, documents, options, webhook_url)
+    job_runner.notify()
+    return await asyncio.to_thread(job_store.get, job_id)
+
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(UpstreamError)
+async def upstream_error_handler(request: Request, exc: UpstreamError):
+    headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+    return JSONResponse(
+        status_code=504 if isinstance(exc, DeadlineExceeded) else 503,
+        content={"detail": f"QLD MapServer unavailable: {exc}"},
+        headers=headers,
+    )
+
 @app.middleware("http")
 async def require_key(request: Request, call_next):
     if API_KEY:
@@ -251,54 +576,195 @@ async def require_key(request: Request, call_next):
             return JSONResponse(status_code=401, content={"detail":"Unauthorized"})
     return await call_next(request)
 
+@app.middleware("http")
+async def honour_cache_control(request: Request, call_next):
+    # "Cache-Control: no-cache" skips cached MapServer results (fresh ones are still stored).
+    bypass = "no-cache" in (request.headers.get("cache-control") or "").lower()
+    token = set_cache_bypass(bypass)
+    try:
+        return await call_next(request)
+    finally:
+        reset_cache_bypass(token)
+
+@app.middleware("http")
+async def upstream_deadline(request: Request, call_next):
+    # One lookup budget per request, shared by every MapServer sub-query.
+    token = set_deadline()
+    try:
+        return await call_next(request)
+    finally:
+        reset_deadline(token)
+
+@app.middleware("http")
+async def debug_timing(request: Request, call_next):
+    # "X-Debug-Timing: 1" adds a Server-Timing header (work done before the
+    # response started) and keeps a JSON trace at /admin/traces/{id}, finished
+    # once the body has been streamed (so it includes KMZ generation).
+    if (request.headers.get("x-debug-timing") or "").lower() not in ("1", "true", "yes"):
+        return await call_next(request)
+    trace, token = start_trace(request.method, request.url.path)
+    try:
+        response = await call_next(request)
+    finally:
+        end_trace(token)
+    response.headers["Server-Timing"] = trace.server_timing()
+    response.headers["X-Debug-Trace-Id"] = trace.id
+    trace_store.add(trace)
+    body = response.body_iterator
+
+    async def finish_trace():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            trace.total_ms = trace.elapsed_ms()
+
+    response.body_iterator = finish_trace()
+    return response
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Route templates (not raw paths) keep label cardinality bounded; streamed
+    # bodies are timed up to the start of the response.
+    if metrics.METRICS_ENABLED:
+        route = request.scope.get("route")
+        metrics.registry.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - start,
+            {"route": getattr(route, "path", "unmatched"), "method": request.method, "status": response.status_code},
+        )
+    return response
+
+@metrics.registry.collector
+def _service_metrics():
+    caches = [parcel_cache, label_cache, insights_cache]
+    stats = [cache.stats() for cache in caches]
+    yield ("cache_hits_total", "counter", "Cache hits.", [({"cache": st["name"]}, st.get("hits", 0)) for st in stats])
+    yield ("cache_misses_total", "counter", "Cache misses.", [({"cache": st["name"]}, st.get("misses", 0)) for st in stats])
+    yield ("cache_stale_hits_total", "counter", "Expired entries served during upstream outages.", [({"cache": st["name"]}, st.get("stale_hits", 0)) for st in stats])
+    yield ("cache_hit_ratio", "gauge", "Cache hits / lookups since the cache was created.", [({"cache": st["name"]}, st.get("hit_ratio") or 0) for st in stats])
+    yield ("cache_entries", "gauge", "Entries currently cached.", [({"cache": st["name"]}, st.get("entries", 0)) for st in stats])
+    upstream = upstream_stats()
+    yield ("upstream_events_total", "counter", "MapServer requests, retries, timeouts and fallbacks.", [({"event": name}, value) for name, value in sorted(upstream["counters"].items())])
+    yield ("upstream_breaker_open", "gauge", "1 while the MapServer circuit breaker is open or half-open.", [({}, 0 if upstream["breaker"]["state"] == "closed" else 1)])
+    flights = upstream["single_flight"]
+    yield ("upstream_single_flight_total", "counter", "Queries that led or shared an in-flight upstream call.", [({"role": "leader"}, flights["leaders"]), ({"role": "shared"}, flights["shared"])])
+    yield ("pdf_executor_in_flight", "gauge", "PDF/KMZ jobs running or queued in the executor.", [({}, pdf_executor.stats()["in_flight"])])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health", response_class=PlainTextResponse)
 def health():
     return "ok"
 
+@app.get("/admin/workers")
+def worker_stats():
+    return {"pdf": pdf_executor.stats(), "jobs": job_runner.stats()}
+
+@app.get("/admin/traces/{trace_id}")
+def debug_trace(trace_id: str):
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(404, "Trace not found (only the most recent ones are kept).")
+    return trace.to_json()
+
+@app.get("/admin/upstream")
+def upstream_status():
+    return upstream_stats()
+
+@app.get("/admin/cache")
+def cache_stats():
+    return {
+        "parcels": parcel_cache.stats(),
+        "address_labels": label_cache.stats(),
+        "pdf_insights": insights_cache.stats(),
+        "local_cadastre": local_cadastre.stats(),
+        "address_gazetteer": address_gazetteer.stats(),
+    }
+
+@app.post("/admin/cache/invalidate")
+def cache_invalidate(lotplan: Optional[str] = Query(None)):
+    tokens = _extract_lotplan_tokens(lotplan) if lotplan else None
+    return {
+        "removed": {
+            "parcels": invalidate_parcel_cache(tokens),
+            "address_labels": invalidate_label_cache(tokens),
+        }
+    }
+
 @app.post("/analyze_pdf")
-async def analyze_pdf(pdf: UploadFile = File(...)):
+async def analyze_pdf(
+    pdf: UploadFile = File(...),
+    max_pages: Optional[int] = Query(None, ge=1),
+    stop_after_matches: Optional[int] = Query(None, ge=1),
+):
     if not pdf.filename.lower().endswith(".pdf"):
         raise HTTPException(400, "Please upload a PDF file.")
     content = await pdf.read()
     try:
-        insights = extract_pdf_insights(content)
+        insights = await pdf_executor.run(extract_pdf_insights, content, max_pages=max_pages, stop_after_matches=stop_after_matches)
+    except QueueFull:
+        raise
     except Exception as exc:
         raise HTTPException(500, f"Failed to analyze PDF: {exc}") from exc
     return insights
 
 @app.post("/kmz_by_groups")
-def kmz_by_groups(payload: GroupedKmzRequest):
+async def kmz_by_groups(payload: GroupedKmzRequest, geometry: KmzGeometry = Depends(_geometry_query)):
     if not payload.groups:
         raise HTTPException(400, "Provide at least one group entry.")
     grouped_features: Dict[str, List[Dict[str, Any]]] = {}
     all_parcels: List[Dict[str, Any]] = []
     labels: List[str] = []
 
+    group_tokens: List[List[str]] = []
     for group in payload.groups:
-        lot_tokens = group.lotplans or []
-        features: List[Dict[str, Any]] = []
-        for token in lot_tokens:
+        tokens: List[str] = []
+        for token in group.lotplans or []:
             token = token.strip()
             if not token:
                 continue
             try:
-                norm = normalize_lotplan(token)
+                tokens.append(normalize_lotplan(token))
             except ValueError as exc:
                 raise HTTPException(400, f"Unsupported lot/plan token: {token}") from exc
-            features.extend(query_parcels_by_lotplan(norm, max_results=payload.max_results))
-        addr_payload: Optional[Dict[str, Any]] = group.address.model_dump() if group.address else None
-        relax_flag = group.relax_no_number if group.relax_no_number is not None else False
+        group_tokens.append(tokens)
+    all_tokens = list(dict.fromkeys(tok for tokens in group_tokens for tok in tokens))
+    lotplan_hits = await query_parcels_by_lotplans_async(all_tokens, max_results=payload.max_results)
+
+    group_features: List[List[Dict[str, Any]]] = [
+        [feat for norm in tokens for feat in lotplan_hits[norm]] for tokens in group_tokens
+    ]
+    addr_payloads: List[Optional[Dict[str, Any]]] = [
+        group.address.model_dump() if group.address else None for group in payload.groups
+    ]
+    relax_flags = [group.relax_no_number if group.relax_no_number is not None else False for group in payload.groups]
+    address_hits = await run_plan_async(_address_lookups_plan(
+        [
+            (addr_payload, relax_flag)
+            for features, addr_payload, relax_flag in zip(group_features, addr_payloads, relax_flags)
+            if not features and addr_payload
+        ],
+        payload.max_results,
+    ))
+    address_labels = await run_plan_async(parcel_labels_plan(
+        [feat for features in group_features for feat in features]
+        + [feat for hits in address_hits.values() for feat in hits]
+    ))
+
+    for group, features, addr_payload, relax_flag in zip(payload.groups, group_features, addr_payloads, relax_flags):
         if not features and addr_payload:
-            try:
-                features = query_parcels_from_address(addr_payload, relax_no_number=relax_flag, max_results=payload.max_results)
-            except ValueError:
-                features = []
+            features = address_hits[_address_lookup_key(addr_payload, relax_flag)]
         if not features:
             continue
         fallback_label = group.label
         if not fallback_label and addr_payload:
             fallback_label = addr_payload.get("original")
-        folder_label = best_folder_name_from_parcels(features, fallback_label)
+        folder_label = await best_folder_name_from_parcels_async(features, fallback_label, labels=address_labels)
         grouped_features.setdefault(folder_label, []).extend(features)
         labels.append(folder_label)
         all_parcels.extend(features)
@@ -309,68 +775,51 @@ def kmz_by_groups(payload: GroupedKmzRequest):
     root_label = payload.default_label
     if not root_label:
         root_label = " & ".join(dict.fromkeys(labels))[:120] or "parcels"
-    return _kmz_stream_response([], root_label, grouped=grouped_features)
+    return _kmz_stream_response([], root_label, grouped=grouped_features, style=payload.style, geometry=geometry)
 
 @app.post("/process_pdf_kmz")
 async def process_pdf_kmz(
     pdf: UploadFile = File(...),
     state: Optional[str] = Query(None),
     max_results: int = Query(300, ge=1, le=2000),
-    relax_no_number: bool = Query(False)
+    relax_no_number: bool = Query(False),
+    max_pages: Optional[int] = Query(None, ge=1),
+    stop_after_matches: Optional[int] = Query(None, ge=1),
+    style: KmzStyle = Depends(_style_query),
+    geometry: KmzGeometry = Depends(_geometry_query),
 ):
     if not pdf.filename.lower().endswith(".pdf"):
         raise HTTPException(400, "Please upload a PDF file.")
     content = await pdf.read()
-    insights = extract_pdf_insights(content)
-    resolved = _resolve_insights_to_parcels([insights], max_results=max_results, relax_no_number=relax_no_number)
-    return _kmz_stream_response(
+    insights, prefetched = await _streamed_pdf_insights(content, max_results, max_pages, stop_after_matches)
+    resolved = await run_plan_async(_resolve_insights_plan([insights], max_results=max_results, relax_no_number=relax_no_number, prefetched=prefetched))
+    return await _kmz_stream_response_async(
         resolved["ungrouped_parcels"],
         resolved["folder_name"],
         grouped=resolved["grouped_features"],
+        style=style,
+        geometry=geometry,
     )
 
 @app.post("/kmz_from_email")
-def kmz_from_email(payload: EmailParcelRequest):
-    texts: List[str] = []
-    if payload.body_text:
-        texts.append(payload.body_text)
-    if payload.body_html:
-        texts.append(_html_to_text(payload.body_html))
-    combined_text = "\n".join(part for part in texts if part)
-    insights: List[Dict[str, Any]] = []
-    if combined_text.strip():
-        insights.append(extract_text_insights(combined_text))
-
-    for attachment in payload.attachments or []:
-        filename = attachment.filename or "attachment"
-        content_type = (attachment.content_type or "").lower()
-        if content_type.startswith("application/pdf") or filename.lower().endswith(".pdf"):
-            try:
-                data = base64.b64decode(attachment.content_base64)
-            except Exception as exc:
-                raise HTTPException(400, f"Failed to decode attachment {filename}: {exc}") from exc
-            try:
-                insights.append(extract_pdf_insights(data))
-            except Exception as exc:
-                raise HTTPException(500, f"Failed to analyze attachment {filename}: {exc}") from exc
-
-    if not insights:
-        raise HTTPException(400, "Email content does not contain parsable text or supported attachments.")
-
-    resolved = _resolve_insights_to_parcels(
+async def kmz_from_email(payload: EmailParcelRequest, geometry: KmzGeometry = Depends(_geometry_query)):
+    insights = await _email_insights(payload, pdf_executor.run)
+    resolved = await run_plan_async(_resolve_insights_plan(
         insights,
         max_results=payload.max_results,
         relax_no_number=payload.relax_no_number,
-    )
+    ))
     folder_label = payload.subject.strip() if payload.subject and payload.subject.strip() else resolved["folder_name"]
     return _kmz_stream_response(
         resolved["ungrouped_parcels"],
         folder_label,
         grouped=resolved["grouped_features"],
+        style=payload.style,
+        geometry=geometry,
     )
 
 @app.get("/kmz_by_lotplan")
-def kmz_by_lotplan(lotplan: str, max_results: int = Query(1000, ge=1, le=5000)):
+async def kmz_by_lotplan(lotplan: str, max_results: int = Query(1000, ge=1, le=5000), style: KmzStyle = Depends(_style_query), geometry: KmzGeometry = Depends(_geometry_query)):
     raw_tokens = _extract_lotplan_tokens(lotplan)
     if not raw_tokens:
         raise HTTPException(400, "Provide lot/plan tokens like '4rp30439, 3rp048958'.")
@@ -382,16 +831,17 @@ def kmz_by_lotplan(lotplan: str, max_results: int = Query(1000, ge=1, le=5000)):
         raise HTTPException(400, str(exc)) from exc
     unique_tokens = list(dict.fromkeys(normalized_tokens))
     parcels: List[Dict[str,Any]] = []
+    lotplan_hits = await query_parcels_by_lotplans_async(unique_tokens, max_results=max_results)
     for tok in unique_tokens:
-        parcels.extend(query_parcels_by_lotplan(tok, max_results=max_results))
+        parcels.extend(lotplan_hits[tok])
     if not parcels:
         raise HTTPException(404, "No parcels found for given Lot/Plan token(s).")
     fallback = " & ".join(unique_tokens)[:120] or "lotplans"
-    folder_name = best_folder_name_from_parcels(parcels, fallback)
-    return _kmz_stream_response(parcels, folder_name)
+    folder_name = await best_folder_name_from_parcels_async(parcels, fallback)
+    return _kmz_stream_response(parcels, folder_name, style=style, geometry=geometry)
 
 @app.post("/kmz_by_address")
-def kmz_by_address(query: AddressLookup):
+async def kmz_by_address(query: AddressLookup, geometry: KmzGeometry = Depends(_geometry_query)):
     if not query.address.strip():
         raise HTTPException(400, "Address is required.")
     candidates = parse_au_address_structured(query.address)
@@ -404,10 +854,7 @@ def kmz_by_address(query: AddressLookup):
         if query.property_name:
             candidate_payload["property_name"] = query.property_name
         relax = query.relax_no_number or candidate_payload.get("house_number") in (None, "")
-        try:
-            hits = query_parcels_from_address(candidate_payload, relax_no_number=relax, max_results=query.max_results)
-        except ValueError:
-            hits = []
+        hits = await run_plan_async(_address_lookup_plan(candidate_payload, relax, query.max_results))
         if hits:
             parcels = hits
             fallback_label = candidate_payload.get("original") or fallback_label
@@ -416,16 +863,92 @@ def kmz_by_address(query: AddressLookup):
         raise HTTPException(404, "No parcels found for the provided address.")
     if query.property_name and fallback_label:
         fallback_label = f"\"{query.property_name}\", {fallback_label}"
-    folder_name = best_folder_name_from_parcels(parcels, fallback_label or "address")
-    return _kmz_stream_response(parcels, folder_name)
+    folder_name = await best_folder_name_from_parcels_async(parcels, fallback_label or "address")
+    return _kmz_stream_response(parcels, folder_name, style=query.style, geometry=geometry)
 
 @app.post("/kmz_by_address_fields")
-def kmz_by_address_fields(addr: AddressIn, max_results: int = Query(1000, ge=1, le=5000), relax_no_number: bool = Query(False)):
-    hits = query_parcels_from_address(addr.model_dump(), relax_no_number=relax_no_number, max_results=max_results)
+async def kmz_by_address_fields(addr: AddressIn, max_results: int = Query(1000, ge=1, le=5000), relax_no_number: bool = Query(False), style: KmzStyle = Depends(_style_query), geometry: KmzGeometry = Depends(_geometry_query)):
+    hits = await query_parcels_from_address_async(addr.model_dump(), relax_no_number=relax_no_number, max_results=max_results)
     if not hits:
         raise HTTPException(404, "No parcels found from provided address.")
     fallback = addr.original or f"{addr.house_number or ''} {addr.street or ''}, {addr.suburb or ''}, {addr.state or 'QLD'} {addr.postcode or ''}"
     if addr.property_name:
         fallback = f"\"{addr.property_name}\", {fallback}"
-    folder_name = best_folder_name_from_parcels(hits, fallback)
-    return _kmz_stream_response(hits, folder_name)
+    folder_name = await best_folder_name_from_parcels_async(hits, fallback)
+    return _kmz_stream_response(hits, folder_name, style=style, geometry=geometry)
+
+@app.post("/jobs/pdfs", status_code=202)
+async def submit_pdf_job(
+    files: List[UploadFile] = File(...),
+    label: Optional[str] = Query(None),
+    webhook_url: Optional[str] = Query(None, pattern=r"^https?://"),
+    max_results: int = Query(300, ge=1, le=2000),
+    relax_no_number: bool = Query(False),
+    max_pages: Optional[int] = Query(None, ge=1),
+    stop_after_matches: Optional[int] = Query(None, ge=1),
+    style: KmzStyle = Depends(_style_query),
+    geometry: KmzGeometry = Depends(_geometry_query),
+):
+    _kmz_style_kwargs(style)
+    documents = []
+    for upload in files:
+        if not upload.filename.lower().endswith(".pdf"):
+            raise HTTPException(400, f"{upload.filename} is not a PDF file.")
+        documents.append((upload.filename, "pdf", await upload.read()))
+    options = {
+        "label": label,
+        "max_results": max_results,
+        "relax_no_number": relax_no_number,
+        "max_pages": max_pages,
+        "stop_after_matches": stop_after_matches,
+        "style": style.model_dump(exclude_none=True),
+        "geometry": geometry.model_dump(exclude_none=True),
+    }
+    return await _submit_job(documents, options, webhook_url)
+
+@app.post("/jobs/emails", status_code=202)
+async def submit_email_job(payload: EmailJobRequest, geometry: KmzGeometry = Depends(_geometry_query)):
+    for email in payload.emails:
+        _kmz_style_kwargs(email.style or payload.style)
+    documents = [
+        ((email.subject or "").strip() or f"email {index + 1}", "email", email.model_dump_json().encode())
+        for index, email in enumerate(payload.emails)
+    ]
+    options = {
+        "label": payload.label,
+        "style": payload.style.model_dump(exclude_none=True) if payload.style else None,
+        "geometry": geometry.model_dump(exclude_none=True),
+    }
+    return await _submit_job(documents, options, payload.webhook_url)
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found.")
+    return job
+
+@app.get("/jobs/{job_id}/documents/{index}/kmz")
+def job_document_kmz(job_id: str, index: int):
+    found = job_store.document_kmz(job_id, index)
+    if found is None:
+        raise HTTPException(404, "Document not found or not completed.")
+    folder_name, kmz = found
+    return Response(kmz, media_type="application/vnd.google-earth.kmz", headers=_kmz_headers(folder_name or "parcels"))
+
+@app.get("/jobs/{job_id}/kmz")
+async def job_combined_kmz(job_id: str):
+    options = await asyncio.to_thread(job_store.options, job_id)
+    if options is None:
+        raise HTTPException(404, "Job not found.")
+    results = await asyncio.to_thread(job_store.results, job_id)
+    if not results:
+        raise HTTPException(404, "No completed documents in this job yet.")
+    grouped_features: Dict[str, List[Dict[str, Any]]] = {}
+    for folder_name, resolved in results:
+        for label, features in (resolved.get("grouped_features") or {}).items():
+            grouped_features.setdefault(label, []).extend(features)
+        if resolved.get("ungrouped_parcels"):
+            grouped_features.setdefault(folder_name, []).extend(resolved["ungrouped_parcels"])
+    root_label = options.get("label") or " & ".join(dict.fromkeys(folder for folder, _ in results))[:120] or "parcels"
+    return await _kmz_stream_response_async([], root_label, grouped=grouped_features, style=_job_style(options), geometry=_job_geometry(options))
@@ -1,15 +1,85 @@
-import os, json, requests, zipfile, io, re
+import os, json, requests, re, threading, contextvars, asyncio, time
+import httpx
+import numpy as np
+import shapely
 from collections import defaultdict
-from typing import List, Dict, Any, Optional, Tuple
-from shapely.geometry import shape, Polygon, MultiPolygon, GeometryCollection, mapping
-from shapely.ops import unary_union
-import simplekml
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable, Iterator, TypeVar, Generator
+from shapely.geometry import shape, Polygon, MultiPolygon, GeometryCollection
+from shapely.geometry.base import BaseGeometry
+from shapely.errors import GEOSException
+from requests.adapters import HTTPAdapter
+from app.services.cache import SqliteCache, MISSING, env_flag
+from app.services.singleflight import SingleFlight
+from app.services.cadastre import local_cadastre
+from app.services.gazetteer import address_gazetteer
+from app.services.resilience import (
+    BreakerCall, CircuitBreaker, CircuitOpen, Counters, DeadlineExceeded, UpstreamError, attempt_timeout, retry_sleep, RETRY_ATTEMPTS,
+)
+from app.services import kml
+from app.services.geometry import simplify_shared, metres_to_degrees, longitude_scale
+from app.services.metrics import timed, timed_stage, timed_iter, record_stage, observe_count
+from app.services.tracing import current as current_trace, record_response
 
 BASE_MAPSERVER = os.getenv("QLD_MAPSERVER_BASE", "https://spatial-gis.information.qld.gov.au/arcgis/rest/services/PlanningCadastre/LandParcelPropertyFramework/MapServer")
 ADDRESS_LAYER = int(os.getenv("QLD_ADDRESS_LAYER", "0"))
 PARCELS_LAYER = int(os.getenv("QLD_PARCELS_LAYER", "3"))
 ARCGIS_TOKEN = os.getenv("ARCGIS_AUTH_TOKEN","")
+# Batched lot/plan lookups: keep IN (...) lists small enough for GET URLs and the
+# layer's maxRecordCount.
+LOTPLAN_BATCH_SIZE = int(os.getenv("QLD_LOTPLAN_BATCH_SIZE", "50"))
+MAX_WHERE_LENGTH = int(os.getenv("QLD_MAX_WHERE_LENGTH", "1800"))
+MAX_RECORD_COUNT = int(os.getenv("QLD_MAX_RECORD_COUNT", "2000"))
+# Paging past maxRecordCount (resultOffset): hard page cap per query, and whether
+# the remaining pages are fetched in parallel once returnCountOnly gives a total.
+MAX_PAGES = int(os.getenv("QLD_MAX_PAGES", "20"))
+PARALLEL_PAGES = env_flag("QLD_PARALLEL_PAGES")
+# Shared keep-alive connection pool for every MapServer call.
+HTTP_TIMEOUT = float(os.getenv("QLD_HTTP_TIMEOUT", "60"))
+HTTP_POOL_CONNECTIONS = int(os.getenv("QLD_HTTP_POOL_CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.getenv("QLD_HTTP_POOL_MAXSIZE", "16"))
+HTTP_POOL_BLOCK = os.getenv("QLD_HTTP_POOL_BLOCK", "false").lower() in ("1", "true", "yes")
+HTTP_KEEPALIVE = os.getenv("QLD_HTTP_KEEPALIVE", "true").lower() in ("1", "true", "yes")
+# Max MapServer lookups a single request fans out in parallel.
+QUERY_CONCURRENCY = int(os.getenv("QLD_QUERY_CONCURRENCY", "8"))
+# Connection cap for the async client shared by every in-flight request.
+HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("QLD_HTTP_ASYNC_MAX_CONNECTIONS", "64"))
+
+# Expired entries are kept this much longer and served if the MapServer is down.
+STALE_TTL = float(os.getenv("QLD_STALE_TTL", str(30 * 24 * 3600)))
+
+parcel_cache = SqliteCache(
+    "parcels",
+    ttl=float(os.getenv("QLD_PARCEL_CACHE_TTL", str(7 * 24 * 3600))),
+    negative_ttl=float(os.getenv("QLD_PARCEL_CACHE_NEGATIVE_TTL", "3600")),
+    max_entries=int(os.getenv("QLD_PARCEL_CACHE_MAX_ENTRIES", "20000")),
+    enabled=env_flag("QLD_PARCEL_CACHE"),
+    stale_ttl=STALE_TTL,
+)
+label_cache = SqliteCache(
+    "address_labels",
+    ttl=float(os.getenv("QLD_LABEL_CACHE_TTL", str(7 * 24 * 3600))),
+    negative_ttl=float(os.getenv("QLD_LABEL_CACHE_NEGATIVE_TTL", "3600")),
+    max_entries=int(os.getenv("QLD_LABEL_CACHE_MAX_ENTRIES", "50000")),
+    enabled=env_flag("QLD_LABEL_CACHE"),
+    stale_ttl=STALE_TTL,
+)
+# Folder labels need one address row per lot/plan, not every address point on
+# it (strata plans have hundreds): label queries skip geometry, fetch only the
+# fields _format_address_label reads, and stop after this many rows per lot/plan
+# in the IN chunk. Lot/plans crowded out by a truncated chunk are asked again
+# on their own, for up to LABEL_ROUNDS rounds.
+LABEL_ROWS_PER_LOTPLAN = int(os.getenv("QLD_LABEL_ROWS_PER_LOTPLAN", "4"))
+LABEL_ROUNDS = int(os.getenv("QLD_LABEL_ROUNDS", "3"))
+
+# Retries, breaker and counters for MapServer calls (see services/resilience.py).
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+upstream_breaker = CircuitBreaker("mapserver")
+upstream_counters = Counters()
+# Identical concurrent queries (threads or coroutines) share one upstream call.
+SINGLE_FLIGHT = env_flag("QLD_SINGLE_FLIGHT")
+# A leader's deadline or breaker verdict is its own; followers try for themselves.
+query_flight = SingleFlight(unshared=(DeadlineExceeded, CircuitOpen))
 
 ADDR = {
     "lotplan": "lotplan",
@@ -22,8 +92,15 @@ ADDR = {
     "address": "address",
     "latitude": "latitude",
     "longitude": "longitude",
-    "objectid": "objectid"
+    "objectid": "objectid",
+    "property_name": "property_name",
+    "street_no_1": "street_no_1",
+    "street_full": "street_full",
 }
+_LABEL_FIELDS = ",".join(ADDR[key] for key in (
+    "lotplan", "property_name", "street_number", "street_no_1", "street_full", "street_name",
+    "street_type", "street_suffix", "locality", "state", "address",
+))
 PAR = {
     "lotplan": "lotplan",
     "objectid": "objectid",
@@ -34,20 +111,394 @@ PAR = {
     "shire_name": "shire_name",
 }
 
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def _http_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # pool_connections = number of hosts kept, pool_maxsize = sockets per host
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=HTTP_POOL_BLOCK)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["Connection"] = "keep-alive" if HTTP_KEEPALIVE else "close"
+                _session = session
+    return _session
+
+def close_http_session() -> None:
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _http_async_client() -> httpx.AsyncClient:
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    # An AsyncClient belongs to the loop that opened it; scripts calling
+    # asyncio.run() repeatedly get a fresh one.
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        limits = httpx.Limits(
+            max_connections=HTTP_ASYNC_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_MAXSIZE if HTTP_KEEPALIVE else 0,
+        )
+        _async_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=limits)
+        _async_client_loop = loop
+    return _async_client
+
+async def close_http_async_client() -> None:
+    global _async_client, _async_client_loop
+    client, _async_client, _async_client_loop = _async_client, None, None
+    if client is not None:
+        await client.aclose()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_fanout_state = threading.local()
+
+def _query_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=QUERY_CONCURRENCY, thread_name_prefix="arcgis")
+    return _executor
+
+def close_query_executor() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Results come back in input order. Calls made from inside a pool worker run
+# inline so nested fan-out can never deadlock the pool.
+def map_concurrently(fn: Callable[[T], R], items: Iterable[T]) -> List[R]:
+    items = list(items)
+    if len(items) <= 1 or QUERY_CONCURRENCY <= 1 or getattr(_fanout_state, "active", False):
+        return [fn(item) for item in items]
+
+    def run(item: T) -> R:
+        _fanout_state.active = True
+        try:
+            return fn(item)
+        finally:
+            _fanout_state.active = False
+
+    # Each task runs in a copy of the caller's context (cache bypass etc.).
+    futures = [_query_executor().submit(contextvars.copy_context().run, run, item) for item in items]
+    return [future.result() for future in futures]
+
 def _layer_url(layer_index: int) -> str:
     return f"{BASE_MAPSERVER.rstrip('/')}/{layer_index}"
 
-def _query(layer_index: int, params: dict) -> dict:
-    base = _layer_url(layer_index) + "/query"
-    payload = {**params, "f": "geojson", "outFields": "*", "returnGeometry": "true", "outSR": 4326}
+def _query_payload(params: dict) -> dict:
+    payload = {"outFields": "*", "returnGeometry": "true", **params, "f": "geojson", "outSR": 4326}
     if ARCGIS_TOKEN: payload["token"] = ARCGIS_TOKEN
-    r = requests.get(base, params=payload, timeout=60)
-    r.raise_for_status()
-    return r.json()
+    return payload
+
+class _Retryable(Exception):
+    pass
+
+def _checked_json(response: Any) -> dict:
+    # Works for both requests and httpx responses.
+    if response.status_code in RETRY_STATUSES:
+        raise _Retryable(f"HTTP {response.status_code}")
+    response.raise_for_status()
+    data = response.json()
+    # ArcGIS reports server faults as HTTP 200 with an "error" body.
+    error = data.get("error") if isinstance(data, dict) else None
+    if isinstance(error, dict) and error.get("code") in RETRY_STATUSES:
+        raise _Retryable(f"ArcGIS error {error.get('code')}: {error.get('message')}")
+    return data
+
+def _breaker_call() -> BreakerCall:
+    try:
+        return upstream_breaker.call()
+    except CircuitOpen:
+        upstream_counters.incr("circuit_open")
+        raise
+
+def _before_attempt() -> float:
+    try:
+        timeout = attempt_timeout(HTTP_TIMEOUT)
+    except DeadlineExceeded:
+        upstream_counters.incr("deadline_exceeded")
+        raise
+    upstream_counters.incr("requests")
+    return timeout
+
+def _after_failure(call: BreakerCall, attempt: int, failure: Exception, timed_out: bool) -> float:
+    upstream_counters.incr("timeouts" if timed_out else "errors")
+    if attempt >= RETRY_ATTEMPTS:
+        upstream_counters.incr("failures")
+        call.failure()
+        raise UpstreamError(f"MapServer query failed after {attempt + 1} attempts: {failure}") from failure
+    delay = retry_sleep(attempt)
+    if delay is None:
+        upstream_counters.incr("deadline_exceeded")
+        call.failure()
+        raise DeadlineExceeded() from failure
+    upstream_counters.incr("retries")
+    return delay
+
+# Queries are idempotent GETs, so transport errors, timeouts and 5xx/429 are
+# retried with jittered backoff inside the request deadline. The breaker sees
+# one outcome per query, once its retries are spent.
+def _fetch(layer_index: int, params: dict) -> dict:
+    url = _layer_url(layer_index) + "/query"
+    payload = _query_payload(params)
+    attempt = 0
+    with _breaker_call() as call:
+        while True:
+            timeout = _before_attempt()
+            try:
+                response = _http_session().get(url, params=payload, timeout=timeout)
+                data = _checked_json(response)
+            except requests.HTTPError:
+                call.success()
+                raise
+            except (requests.RequestException, ValueError, _Retryable) as exc:
+                time.sleep(_after_failure(call, attempt, exc, isinstance(exc, requests.Timeout)))
+                attempt += 1
+                continue
+            call.success()
+            record_response(response.status_code, len(response.content), len(data.get("features") or []))
+            return data
+
+async def _fetch_async(layer_index: int, params: dict) -> dict:
+    url = _layer_url(layer_index) + "/query"
+    payload = _query_payload(params)
+    attempt = 0
+    with _breaker_call() as call:
+        while True:
+            timeout = _before_attempt()
+            try:
+                response = await _http_async_client().get(url, params=payload, timeout=timeout)
+                data = _checked_json(response)
+            except httpx.HTTPStatusError:
+                call.success()
+                raise
+            except (httpx.HTTPError, ValueError, _Retryable) as exc:
+                await asyncio.sleep(_after_failure(call, attempt, exc, isinstance(exc, httpx.TimeoutException)))
+                attempt += 1
+                continue
+            call.success()
+            record_response(response.status_code, len(response.content), len(data.get("features") or []))
+            return data
+
+def _flight_key(layer_index: int, params: dict) -> Tuple[int, str]:
+    return layer_index, json.dumps(params, sort_keys=True, default=str)
+
+def _layer_label(layer_index: int) -> str:
+    if layer_index == ADDRESS_LAYER:
+        return "address"
+    if layer_index == PARCELS_LAYER:
+        return "parcels"
+    return str(layer_index)
+
+# Callers sharing a flight get the same response object; treat it as read-only.
+def _query(layer_index: int, params: dict) -> dict:
+    trace = current_trace()
+    if trace is not None:
+        with trace.query(_layer_label(layer_index), params):
+            return _shared_query(layer_index, params)
+    return _shared_query(layer_index, params)
+
+async def _query_async(layer_index: int, params: dict) -> dict:
+    trace = current_trace()
+    if trace is not None:
+        with trace.query(_layer_label(layer_index), params):
+            return await _shared_query_async(layer_index, params)
+    return await _shared_query_async(layer_index, params)
+
+def _shared_query(layer_index: int, params: dict) -> dict:
+    with timed_stage("arcgis_query", layer=_layer_label(layer_index)):
+        if not SINGLE_FLIGHT:
+            return _fetch(layer_index, params)
+        return query_flight.do(_flight_key(layer_index, params), lambda: _fetch(layer_index, params))
+
+async def _shared_query_async(layer_index: int, params: dict) -> dict:
+    with timed_stage("arcgis_query", layer=_layer_label(layer_index)):
+        if not SINGLE_FLIGHT:
+            return await _fetch_async(layer_index, params)
+        return await query_flight.do_async(_flight_key(layer_index, params), lambda: _fetch_async(layer_index, params))
+
+def upstream_stats() -> Dict[str, Any]:
+    return {
+        "breaker": upstream_breaker.stats(),
+        "counters": upstream_counters.snapshot(),
+        "single_flight": query_flight.stats(),
+    }
+
+# Lookups are written once as "plans": generators that yield a batch of
+# (layer, params) queries and are sent the decoded responses in the same order.
+# run_plan drives a plan on the thread pool, run_plan_async with httpx, so the
+# sync and async APIs share every line of lookup/caching logic. Query failures
+# are thrown back into the plan so it can fall back (e.g. to stale cache).
+QueryBatch = List[Tuple[int, Dict[str, Any]]]
+Plan = Generator[QueryBatch, List[dict], T]
+
+def run_plan(plan: Plan[T]) -> T:
+    try:
+        batch = next(plan)
+        while True:
+            try:
+                responses = map_concurrently(lambda query: _query(*query), batch)
+            except Exception as exc:
+                batch = plan.throw(exc)
+            else:
+                batch = plan.send(responses)
+    except StopIteration as done:
+        return done.value
+
+def _advance_plan(step: Callable[..., QueryBatch], *args: Any) -> Tuple[bool, Any]:
+    # StopIteration can't cross a future, so a finished plan returns (True, value).
+    try:
+        return False, step(*args)
+    except StopIteration as done:
+        return True, done.value
+
+async def run_plan_async(plan: Plan[T]) -> T:
+    # Plan steps read and write the SQLite caches and local stores, and merge
+    # geometry, so they're advanced on a worker thread rather than the loop.
+    semaphore = asyncio.Semaphore(max(1, QUERY_CONCURRENCY))
+
+    async def fetch(query: Tuple[int, Dict[str, Any]]) -> dict:
+        async with semaphore:
+            return await _query_async(*query)
+
+    finished, value = await asyncio.to_thread(_advance_plan, next, plan)
+    while not finished:
+        try:
+            responses = list(await asyncio.gather(*(fetch(query) for query in value)))
+        except Exception as exc:
+            finished, value = await asyncio.to_thread(_advance_plan, plan.throw, exc)
+        else:
+            finished, value = await asyncio.to_thread(_advance_plan, plan.send, responses)
+    return value
+
+def gather_plans(plans: List[Plan[Any]]) -> Plan[List[Any]]:
+    # Runs several plans side by side, merging each round of their queries into
+    # one batch so independent lookups still fan out together.
+    results: List[Any] = [None] * len(plans)
+    pending: Dict[int, QueryBatch] = {}
+    for index, plan in enumerate(plans):
+        try:
+            pending[index] = next(plan)
+        except StopIteration as done:
+            results[index] = done.value
+    while pending:
+        order = list(pending.items())
+        responses = yield [query for _, batch in order for query in batch]
+        pending = {}
+        offset = 0
+        for index, batch in order:
+            part = responses[offset:offset + len(batch)]
+            offset += len(batch)
+            try:
+                pending[index] = plans[index].send(part)
+            except StopIteration as done:
+                results[index] = done.value
+    return results
+
+def _exceeded_transfer_limit(data: dict) -> bool:
+    # Esri JSON puts the flag at the top level; f=geojson nests it in "properties".
+    return bool(data.get("exceededTransferLimit") or (data.get("properties") or {}).get("exceededTransferLimit"))
+
+def _result_count(data: dict) -> Optional[int]:
+    count = data.get("count", (data.get("properties") or {}).get("count"))
+    return int(count) if isinstance(count, (int, float)) else None
+
+def _page_params(params: Dict[str, Any], offset: int, size: int, order_by: str) -> Dict[str, Any]:
+    # A stable order is required for resultOffset paging to be consistent.
+    return {"orderByFields": order_by, **params, "resultOffset": offset, "resultRecordCount": size}
+
+def paged_query_plan(layer_index: int, params: Dict[str, Any], max_features: Optional[int] = None, order_by: str = "objectid") -> Plan[Tuple[List[Dict[str, Any]], bool]]:
+    # Returns (features, complete); complete is False when max_features or
+    # MAX_PAGES cut the result short.
+    limit = max_features if max_features is not None else MAX_RECORD_COUNT * MAX_PAGES
+    if limit <= 0:
+        return [], False
+    size = min(MAX_RECORD_COUNT, limit)
+    (data,) = yield [(layer_index, _page_params(params, 0, size, order_by))]
+    feats: List[Dict[str, Any]] = list(data.get("features", []))
+    # Older servers omit the flag, so a completely full page also means "maybe more".
+    more = bool(feats) and (_exceeded_transfer_limit(data) or len(feats) >= size)
+    pages = 1
+    if more and len(feats) < limit and PARALLEL_PAGES:
+        (count_data,) = yield [(layer_index, {**params, "returnCountOnly": "true"})]
+        total = _result_count(count_data)
+        if total is not None:
+            # The server may cap pages below what we asked for; step by what it returned.
+            step = len(feats)
+            target = min(total, limit, step * MAX_PAGES)
+            offsets = list(range(len(feats), target, step))
+            responses = (yield [(layer_index, _page_params(params, offset, min(step, target - offset), order_by)) for offset in offsets]) if offsets else []
+            for page in responses:
+                feats.extend(page.get("features", []))
+            return feats[:limit], len(feats) >= total
+    while more and len(feats) < limit and pages < MAX_PAGES:
+        size = min(MAX_RECORD_COUNT, limit - len(feats))
+        (data,) = yield [(layer_index, _page_params(params, len(feats), size, order_by))]
+        page = data.get("features", [])
+        feats.extend(page)
+        pages += 1
+        more = bool(page) and (_exceeded_transfer_limit(data) or len(page) >= size)
+    return feats[:limit], not more
+
+def iter_query_features(layer_index: int, params: Dict[str, Any], max_features: Optional[int] = None, order_by: str = "objectid") -> Iterator[Dict[str, Any]]:
+    # paged_query_plan as a stream: features are yielded as each round of pages
+    # arrives (e.g. straight into iter_kmz), instead of once all pages are in.
+    left = max_features if max_features is not None else MAX_RECORD_COUNT * MAX_PAGES
+    plan = paged_query_plan(layer_index, params, max_features, order_by)
+    try:
+        batch = next(plan)
+        while True:
+            responses = map_concurrently(lambda query: _query(*query), batch)
+            for (_, query), data in zip(batch, responses):
+                if query.get("returnCountOnly"):
+                    continue
+                page = data.get("features", [])[:left]
+                left -= len(page)
+                yield from page
+            batch = plan.send(responses)
+    except StopIteration:
+        return
+    finally:
+        plan.close()
 
 def _sql_escape(v: str) -> str:
     return v.replace("'", "''")
 
+def _in_clause_chunks(field: str, values: List[str], max_items: int = LOTPLAN_BATCH_SIZE, max_length: int = MAX_WHERE_LENGTH) -> List[Tuple[List[str], str]]:
+    prefix = f"UPPER({field}) IN ("
+    chunks: List[Tuple[List[str], List[str]]] = []
+    length = 0
+    for value in values:
+        literal = f"'{_sql_escape(value.upper())}'"
+        if not chunks or len(chunks[-1][0]) >= max_items or length + len(literal) + 1 > max_length:
+            chunks.append(([], []))
+            length = len(prefix) + 1
+        chunks[-1][0].append(value)
+        chunks[-1][1].append(literal)
+        length += len(literal) + 1
+    return [(vals, prefix + ",".join(literals) + ")") for vals, literals in chunks]
+
+def _lotplan_key(value: Any) -> str:
+    if not isinstance(value, str):
+        return ""
+    return re.sub(r"\s+", "", value.upper())
+
 _LOTPLAN_WITH_SPACE = re.compile(
     r"^(?P<lot>\d+[A-Z]?)\s+(?P<prefix>[A-Z]+)\s*(?P<number>\d+)$",
     re.IGNORECASE,
@@ -126,50 +577,129 @@ def _format_address_label(attrs: Dict[str, Any]) -> Optional[str]:
         return f"\"{prop_name}\", {label}"
     return label
 
-@lru_cache(maxsize=1024)
-def _address_label_for_lotplan(lotplan: str) -> Optional[str]:
-    clean = (lotplan or "").strip()
-    if not clean:
-        return None
+def _label_cache_key(lotplan: str) -> str:
+    return f"label:{lotplan}"
+
+def invalidate_label_cache(lotplans: Optional[List[str]] = None) -> int:
+    if lotplans is None:
+        return label_cache.invalidate()
+    keys = []
+    for lotplan in lotplans:
+        try:
+            keys.append(_label_cache_key(normalize_lotplan(lotplan)))
+        except ValueError:
+            keys.append(_label_cache_key(lotplan.strip().upper()))
+    return label_cache.invalidate(keys)
+
+def address_labels_plan(lotplans: List[str], use_cache: bool=True) -> Plan[Dict[str, Optional[str]]]:
+    labels: Dict[str, Optional[str]] = {}
+    norm_for: Dict[str, str] = {}
+    for lotplan in lotplans:
+        clean = (lotplan or "").strip()
+        if not clean:
+            labels[lotplan] = None
+            continue
+        try:
+            norm_for[lotplan] = normalize_lotplan(clean)
+        except ValueError:
+            norm_for[lotplan] = clean.upper()
+
+    resolved: Dict[str, Optional[str]] = {}
+    to_fetch: List[str] = []
+    for norm in dict.fromkeys(norm_for.values()):
+        cached = label_cache.get(_label_cache_key(norm)) if use_cache else MISSING
+        if cached is MISSING:
+            to_fetch.append(norm)
+        else:
+            resolved[norm] = cached
+
+    pending = to_fetch
     try:
-        clean = normalize_lotplan(clean)
-    except ValueError:
-        pass
-    where = f"UPPER({ADDR['lotplan']}) = UPPER('{_sql_escape(clean)}')"
-    data = _query(ADDRESS_LAYER, {"where": where, "resultRecordCount": 1})
-    for feat in data.get("features", []):
-        label = _format_address_label(feat.get("properties", {}) or {})
-        if label:
-            return label
-    return None
+        for _ in range(max(1, LABEL_ROUNDS)):
+            if not pending:
+                break
+            chunks = _in_clause_chunks(ADDR["lotplan"], pending)
+            pages = yield from gather_plans([
+                paged_query_plan(
+                    ADDRESS_LAYER, {"where": where, "outFields": _LABEL_FIELDS, "returnGeometry": "false"},
+                    max_features=len(norms) * LABEL_ROWS_PER_LOTPLAN, order_by=ADDR["objectid"],
+                )
+                for norms, where in chunks
+            ])
+            pending = []
+            for (norms, _), (feats, complete) in zip(chunks, pages):
+                chunk_labels: Dict[str, Optional[str]] = {norm: None for norm in norms}
+                for feat in feats:
+                    key = _lotplan_key((feat.get("properties", {}) or {}).get(ADDR["lotplan"]))
+                    if key in chunk_labels and chunk_labels[key] is None:
+                        chunk_labels[key] = _format_address_label(feat.get("properties", {}) or {})
+                for norm, label in chunk_labels.items():
+                    resolved[norm] = label
+                    # Only remember "no label" when the result wasn't truncated.
+                    if label is not None or complete:
+                        label_cache.set(_label_cache_key(norm), label)
+                    else:
+                        pending.append(norm)
+    except UpstreamError:
+        # Labels only name folders: degrade to stale labels (or none) rather than fail.
+        for norm in pending:
+            stale = label_cache.get_stale(_label_cache_key(norm))
+            resolved[norm] = None if stale is MISSING else stale
+            if stale is not MISSING:
+                upstream_counters.incr("stale_served")
+
+    for lotplan, norm in norm_for.items():
+        labels[lotplan] = resolved.get(norm)
+    return labels
+
+def address_labels_for_lotplans(lotplans: List[str], use_cache: bool=True) -> Dict[str, Optional[str]]:
+    return run_plan(address_labels_plan(lotplans, use_cache=use_cache))
 
-def best_folder_name_from_parcels(parcels: List[Dict[str, Any]], fallback: Optional[str] = None) -> str:
-    seen: set[str] = set()
+async def address_labels_for_lotplans_async(lotplans: List[str], use_cache: bool=True) -> Dict[str, Optional[str]]:
+    return await run_plan_async(address_labels_plan(lotplans, use_cache=use_cache))
+
+def _address_label_for_lotplan(lotplan: str) -> Optional[str]:
+    return address_labels_for_lotplans([lotplan]).get(lotplan)
+
+def _parcel_lotplans(parcels: List[Dict[str, Any]]) -> List[str]:
+    lotplans: List[str] = []
     for feat in parcels:
         props = feat.get("properties", {}) or {}
         lotplan = (props.get(PAR["lotplan"]) or "").strip()
-        if not lotplan:
-            continue
-        if lotplan in seen:
-            continue
-        seen.add(lotplan)
-        norm_lp = lotplan
-        try:
-            norm_lp = normalize_lotplan(lotplan)
-        except ValueError:
-            pass
-        label = _address_label_for_lotplan(norm_lp)
+        if lotplan:
+            lotplans.append(lotplan)
+    return list(dict.fromkeys(lotplans))
+
+def parcel_labels_plan(parcels: List[Dict[str, Any]]) -> Plan[Dict[str, Optional[str]]]:
+    return address_labels_plan(_parcel_lotplans(parcels))
+
+def address_labels_for_parcels(parcels: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    return run_plan(parcel_labels_plan(parcels))
+
+async def address_labels_for_parcels_async(parcels: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    return await run_plan_async(parcel_labels_plan(parcels))
+
+def folder_name_plan(parcels: List[Dict[str, Any]], fallback: Optional[str] = None, labels: Optional[Dict[str, Optional[str]]] = None) -> Plan[str]:
+    lotplans = _parcel_lotplans(parcels)
+    missing = [lp for lp in lotplans if labels is None or lp not in labels]
+    if missing:
+        labels = {**(labels or {}), **(yield from address_labels_plan(missing))}
+    for lotplan in lotplans:
+        label = labels.get(lotplan)
         if label:
             return label
     if fallback and fallback.strip():
         return fallback.strip()
-    for feat in parcels:
-        props = feat.get("properties", {}) or {}
-        lotplan = (props.get(PAR["lotplan"]) or "").strip()
-        if lotplan:
-            return lotplan
+    if lotplans:
+        return lotplans[0]
     return "parcels"
 
+def best_folder_name_from_parcels(parcels: List[Dict[str, Any]], fallback: Optional[str] = None, labels: Optional[Dict[str, Optional[str]]] = None) -> str:
+    return run_plan(folder_name_plan(parcels, fallback, labels=labels))
+
+async def best_folder_name_from_parcels_async(parcels: List[Dict[str, Any]], fallback: Optional[str] = None, labels: Optional[Dict[str, Optional[str]]] = None) -> str:
+    return await run_plan_async(folder_name_plan(parcels, fallback, labels=labels))
+
 def address_where(addr: Dict[str,Any], relax_no_number: bool=False) -> str:
     parts = []
     if addr.get("original"):
@@ -190,10 +720,14 @@ def address_where(addr: Dict[str,Any], relax_no_number: bool=False) -> str:
         parts.append(f"UPPER({ADDR['state']}) = UPPER('{_sql_escape(addr['state'])}')")
     return " AND ".join(parts) if parts else "1=1"
 
-def resolve_lotplans_from_address(addr: Dict[str,Any], relax_no_number: bool=False, max_results: int=50) -> Tuple[List[str], Optional[Tuple[float,float]]]:
+def resolve_lotplans_plan(addr: Dict[str,Any], relax_no_number: bool=False, max_results: int=50) -> Plan[Tuple[List[str], Optional[Tuple[float,float]]]]:
     w = address_where(addr, relax_no_number=relax_no_number)
-    data = _query(ADDRESS_LAYER, {"where": w, "resultRecordCount": max_results})
-    feats = data.get("features", [])
+    local = address_gazetteer.lookup(addr, relax_no_number=relax_no_number, max_results=max_results)
+    if local:
+        upstream_counters.incr("gazetteer_hits")
+        feats = [{"properties": {ADDR[key]: value for key, value in row.items()}} for row in local]
+    else:
+        feats, _ = yield from paged_query_plan(ADDRESS_LAYER, {"where": w}, max_features=max_results, order_by=ADDR["objectid"])
     lps: List[str] = []
     pt: Optional[Tuple[float,float]] = None
     for f in feats:
@@ -213,30 +747,140 @@ def resolve_lotplans_from_address(addr: Dict[str,Any], relax_no_number: bool=Fal
     lps = list(dict.fromkeys(lps))
     return lps, pt
 
-def query_parcels_by_lotplan(lotplan_token: str, max_results: int=500) -> List[Dict[str,Any]]:
-    parsed = _parse_lotplan_token(lotplan_token)
-    if parsed:
-        lotplan_compact, _, _ = parsed
-        where = f"UPPER({PAR['lotplan']}) = UPPER('{_sql_escape(lotplan_compact)}')"
-    else:
-        lp = _sql_escape(lotplan_token.strip().upper())
+def resolve_lotplans_from_address(addr: Dict[str,Any], relax_no_number: bool=False, max_results: int=50) -> Tuple[List[str], Optional[Tuple[float,float]]]:
+    return run_plan(resolve_lotplans_plan(addr, relax_no_number=relax_no_number, max_results=max_results))
+
+async def resolve_lotplans_from_address_async(addr: Dict[str,Any], relax_no_number: bool=False, max_results: int=50) -> Tuple[List[str], Optional[Tuple[float,float]]]:
+    return await run_plan_async(resolve_lotplans_plan(addr, relax_no_number=relax_no_number, max_results=max_results))
+
+def _lotplan_cache_key(compact: str) -> str:
+    return f"lotplan:{compact}"
+
+def _point_cache_key(lat: float, lon: float) -> str:
+    return f"point:{float(lat):.6f},{float(lon):.6f}"
+
+def invalidate_parcel_cache(lotplan_tokens: Optional[List[str]] = None) -> int:
+    if lotplan_tokens is None:
+        return parcel_cache.invalidate()
+    keys = []
+    for token in lotplan_tokens:
+        parsed = _parse_lotplan_token(token)
+        keys.append(_lotplan_cache_key(parsed[0] if parsed else _lotplan_key(token)))
+    return parcel_cache.invalidate(keys)
+
+def parcels_by_lotplans_plan(lotplan_tokens: List[str], max_results: int=500, use_cache: bool=True) -> Plan[Dict[str, List[Dict[str,Any]]]]:
+    results: Dict[str, List[Dict[str,Any]]] = {}
+    by_compact: Dict[str, List[str]] = defaultdict(list)
+    unparsed: List[str] = []
+    for token in lotplan_tokens:
+        if token in results:
+            continue
+        results[token] = []
+        parsed = _parse_lotplan_token(token)
+        if parsed:
+            by_compact[parsed[0]].append(token)
+        else:
+            unparsed.append(token)
+
+    fetched: Dict[str, List[Dict[str,Any]]] = local_cadastre.lookup_lotplans(list(by_compact))
+    if fetched:
+        upstream_counters.incr("local_hits", len(fetched))
+    to_fetch: List[str] = []
+    for compact in by_compact:
+        if compact in fetched:
+            continue
+        cached = parcel_cache.get(_lotplan_cache_key(compact)) if use_cache else MISSING
+        if cached is MISSING:
+            to_fetch.append(compact)
+        else:
+            fetched[compact] = cached
+
+    lookups: List[Plan[Tuple[List[Dict[str,Any]], bool]]] = []
+    for token in unparsed:
+        lp = _sql_escape(token.strip().upper())
         where = f"UPPER({PAR['lotplan']}) LIKE '%{lp}%'"
-    data = _query(PARCELS_LAYER, {"where": where, "resultRecordCount": max_results})
-    return data.get("features", [])
+        lookups.append(paged_query_plan(PARCELS_LAYER, {"where": where}, max_features=max_results, order_by=PAR["objectid"]))
+    chunks = _in_clause_chunks(PAR["lotplan"], to_fetch)
+    for compacts, where in chunks:
+        lookups.append(paged_query_plan(PARCELS_LAYER, {"where": where}, max_features=max_results * len(compacts), order_by=PAR["objectid"]))
+    try:
+        pages = yield from gather_plans(lookups)
+    except UpstreamError:
+        stale = {compact: parcel_cache.get_stale(_lotplan_cache_key(compact)) for compact in to_fetch}
+        if unparsed or any(value is MISSING for value in stale.values()):
+            raise
+        upstream_counters.incr("stale_served", len(stale))
+        fetched.update(stale)
+        pages = []
+
+    for token, (feats, _) in zip(unparsed, pages):
+        results[token] = feats
+    for (compacts, _), (feats, complete) in zip(chunks, pages[len(unparsed):]):
+        chunk_hits: Dict[str, List[Dict[str,Any]]] = {compact: [] for compact in compacts}
+        for feat in feats:
+            props = feat.get("properties", {}) or {}
+            key = _lotplan_key(props.get(PAR["lotplan"]))
+            if key in chunk_hits:
+                chunk_hits[key].append(feat)
+        fetched.update(chunk_hits)
+        # A truncated result may be missing features for some lot/plans; don't cache it.
+        if complete:
+            for compact, hits in chunk_hits.items():
+                parcel_cache.set(_lotplan_cache_key(compact), hits)
+    for compact, tokens in by_compact.items():
+        for token in tokens:
+            results[token] = fetched.get(compact, [])[:max_results]
+    return results
+
+def query_parcels_by_lotplans(lotplan_tokens: List[str], max_results: int=500, use_cache: bool=True) -> Dict[str, List[Dict[str,Any]]]:
+    return run_plan(parcels_by_lotplans_plan(lotplan_tokens, max_results=max_results, use_cache=use_cache))
+
+async def query_parcels_by_lotplans_async(lotplan_tokens: List[str], max_results: int=500, use_cache: bool=True) -> Dict[str, List[Dict[str,Any]]]:
+    return await run_plan_async(parcels_by_lotplans_plan(lotplan_tokens, max_results=max_results, use_cache=use_cache))
 
-def query_parcels_by_point(lat: float, lon: float, max_results: int=50) -> List[Dict[str,Any]]:
+def query_parcels_by_lotplan(lotplan_token: str, max_results: int=500, use_cache: bool=True) -> List[Dict[str,Any]]:
+    return query_parcels_by_lotplans([lotplan_token], max_results=max_results, use_cache=use_cache)[lotplan_token]
+
+async def query_parcels_by_lotplan_async(lotplan_token: str, max_results: int=500, use_cache: bool=True) -> List[Dict[str,Any]]:
+    return (await query_parcels_by_lotplans_async([lotplan_token], max_results=max_results, use_cache=use_cache))[lotplan_token]
+
+def parcels_by_point_plan(lat: float, lon: float, max_results: int=50, use_cache: bool=True) -> Plan[List[Dict[str,Any]]]:
+    local = local_cadastre.lookup_point(lat, lon, max_results=max_results)
+    if local:
+        upstream_counters.incr("local_hits")
+        return local
+    cache_key = _point_cache_key(lat, lon)
+    cached = parcel_cache.get(cache_key) if use_cache else MISSING
+    if cached is not MISSING:
+        return cached[:max_results]
     geom = {"x": float(lon), "y": float(lat), "spatialReference": {"wkid": 4326}}
-    params = {"geometry": json.dumps(geom), "geometryType": "esriGeometryPoint", "inSR": 4326, "spatialRel": "esriSpatialRelIntersects", "resultRecordCount": max_results}
-    data = _query(PARCELS_LAYER, params)
-    return data.get("features", [])
+    params = {"geometry": json.dumps(geom), "geometryType": "esriGeometryPoint", "inSR": 4326, "spatialRel": "esriSpatialRelIntersects"}
+    try:
+        feats, complete = yield from paged_query_plan(PARCELS_LAYER, params, max_features=max_results, order_by=PAR["objectid"])
+    except UpstreamError:
+        stale = parcel_cache.get_stale(cache_key)
+        if stale is MISSING:
+            raise
+        upstream_counters.incr("stale_served")
+        return stale[:max_results]
+    if complete and len(feats) < max_results:
+        parcel_cache.set(cache_key, feats)
+    return feats
 
-def query_parcels_from_address(addr: Dict[str,Any], relax_no_number: bool=False, max_results: int=500) -> List[Dict[str,Any]]:
-    lotplans, pt = resolve_lotplans_from_address(addr, relax_no_number=relax_no_number, max_results=max_results)
+def query_parcels_by_point(lat: float, lon: float, max_results: int=50, use_cache: bool=True) -> List[Dict[str,Any]]:
+    return run_plan(parcels_by_point_plan(lat, lon, max_results=max_results, use_cache=use_cache))
+
+async def query_parcels_by_point_async(lat: float, lon: float, max_results: int=50, use_cache: bool=True) -> List[Dict[str,Any]]:
+    return await run_plan_async(parcels_by_point_plan(lat, lon, max_results=max_results, use_cache=use_cache))
+
+def parcels_from_address_plan(addr: Dict[str,Any], relax_no_number: bool=False, max_results: int=500) -> Plan[List[Dict[str,Any]]]:
+    lotplans, pt = yield from resolve_lotplans_plan(addr, relax_no_number=relax_no_number, max_results=max_results)
     out: List[Dict[str,Any]] = []
+    by_lotplan = yield from parcels_by_lotplans_plan(lotplans, max_results=max_results)
     for lp in lotplans:
-        out.extend(query_parcels_by_lotplan(lp, max_results=max_results))
+        out.extend(by_lotplan[lp])
     if not out and pt:
-        out = query_parcels_by_point(pt[0], pt[1], max_results=max_results)
+        out = yield from parcels_by_point_plan(pt[0], pt[1], max_results=max_results)
     seen = set(); uniq = []
     for f in out:
         p = f.get("properties", {}) or {}
@@ -245,13 +889,36 @@ def query_parcels_from_address(addr: Dict[str,Any], relax_no_number: bool=False,
             uniq.append(f); seen.add(key)
     return uniq
 
-# KML styling
-def _apply_style(pol):
-    from simplekml import Color
-    pol.style.polystyle.color = Color.rgb(0xA2, 0x3F, 0x97, 102)  # ~40% alpha
-    pol.style.polystyle.fill = 1
-    pol.style.linestyle.color = Color.rgb(0xA2, 0x3F, 0x97, 255)
-    pol.style.linestyle.width = 3
+def query_parcels_from_address(addr: Dict[str,Any], relax_no_number: bool=False, max_results: int=500) -> List[Dict[str,Any]]:
+    return run_plan(parcels_from_address_plan(addr, relax_no_number=relax_no_number, max_results=max_results))
+
+async def query_parcels_from_address_async(addr: Dict[str,Any], relax_no_number: bool=False, max_results: int=500) -> List[Dict[str,Any]]:
+    return await run_plan_async(parcels_from_address_plan(addr, relax_no_number=relax_no_number, max_results=max_results))
+
+# KML styling: one shared <Style> per distinct colour, referenced by styleUrl
+DEFAULT_KMZ_STYLE: Dict[str, Any] = {"color": "A23F97", "fill_opacity": 0.4, "line_width": 3.0}
+
+def _kmz_styles(style: Optional[Dict[str, Any]], palette: Optional[List[str]], group_names: List[str]) -> Tuple[Dict[str, str], str, Dict[str, str]]:
+    base = {**DEFAULT_KMZ_STYLE, **{k: v for k, v in (style or {}).items() if v is not None}}
+    defs: Dict[str, str] = {}
+    ids: Dict[Tuple, str] = {}
+
+    def style_id(spec: Dict[str, Any]) -> str:
+        color = str(spec["color"]).lstrip("#").upper()
+        key = (color, float(spec["fill_opacity"]), float(spec["line_width"]))
+        if key not in ids:
+            sid = "parcel" if not ids else f"parcel-{len(ids)}"
+            ids[key] = sid
+            alpha = max(0, min(255, round(key[1] * 255)))
+            defs[sid] = kml.style_xml(color, alpha, color, key[2], style_id=sid)
+        return ids[key]
+
+    root_id = style_id(base)
+    group_ids = {
+        name: style_id({**base, "color": palette[index % len(palette)]}) if palette else root_id
+        for index, name in enumerate(group_names)
+    }
+    return defs, root_id, group_ids
 
 def _collect_polygons(shp) -> List[Polygon]:
     if shp.is_empty:
@@ -267,10 +934,42 @@ def _collect_polygons(shp) -> List[Polygon]:
         return polys
     return []
 
+def _shapes_from_geojson(geoms: List[Dict[str, Any]]) -> List[BaseGeometry]:
+    # Parcels are (multi)polygons: build them all in one from_ragged_array call
+    # instead of a shape() per feature. Anything unusual goes through shape().
+    if not geoms or any(g.get("type") not in ("Polygon", "MultiPolygon") for g in geoms):
+        return [shape(g) for g in geoms]
+    coords: List[Any] = []
+    ring_offsets = [0]
+    polygon_offsets = [0]
+    part_offsets = [0]
+    for geom in geoms:
+        polys = [geom["coordinates"]] if geom["type"] == "Polygon" else geom["coordinates"]
+        for poly in polys:
+            for ring in poly:
+                coords.extend(ring)
+                ring_offsets.append(len(coords))
+            polygon_offsets.append(len(ring_offsets) - 1)
+        part_offsets.append(len(polygon_offsets) - 1)
+    try:
+        array = np.asarray(coords, dtype=float).reshape(len(coords), -1)[:, :2]
+        built = shapely.from_ragged_array(
+            shapely.GeometryType.MULTIPOLYGON,
+            array,
+            (np.asarray(ring_offsets), np.asarray(polygon_offsets), np.asarray(part_offsets)),
+        )
+    except (ValueError, GEOSException):
+        return [shape(g) for g in geoms]
+    single = np.array([g["type"] == "Polygon" for g in geoms])
+    if single.any():
+        built[single] = shapely.get_geometry(built[single], 0)
+    return list(built)
+
+@timed("merge_features")
 def _merge_features_by_lotplan(features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    grouped: Dict[str, List[Tuple[str, Dict[str, Any]]]] = defaultdict(list)
+    grouped: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
     passthrough: List[Dict[str, Any]] = []
-    for feat in features:
+    for index, feat in enumerate(features):
         props = feat.get("properties", {}) or {}
         lp_value = props.get(PAR["lotplan"])
         key = None
@@ -282,44 +981,37 @@ def _merge_features_by_lotplan(features: List[Dict[str, Any]]) -> List[Dict[str,
             key = f"OBJ_{props[PAR['objectid']]}"
             display = str(props[PAR["objectid"]])
         if key:
-            grouped[key].append((display or key, feat))
+            grouped[key].append((display or key, index))
         else:
             passthrough.append(feat)
 
+    with_geometry = [i for entries in grouped.values() for _, i in entries if features[i].get("geometry")]
+    shapes = dict(zip(with_geometry, _shapes_from_geojson([features[i]["geometry"] for i in with_geometry])))
     merged: List[Dict[str, Any]] = []
     for key, entries in grouped.items():
-        display_name, first_feat = entries[0]
-        geoms = []
-        props_template: Dict[str, Any] = {}
-        for _, feat in entries:
-            geom = feat.get("geometry")
-            if not geom:
-                continue
-            shp = shape(geom)
-            if shp.is_empty:
-                continue
-            geoms.append(shp)
-            if not props_template:
-                props_template = feat.get("properties", {}) or {}
-        if not geoms:
+        display_name = entries[0][0]
+        indices = [i for _, i in entries if i in shapes and not shapes[i].is_empty]
+        if not indices:
             continue
-        unioned = unary_union(geoms) if len(geoms) > 1 else geoms[0]
-        props_copy = {**props_template}
+        geoms = [shapes[i] for i in indices]
+        unioned = shapely.union_all(geoms) if len(geoms) > 1 else geoms[0]
+        props_copy = {**(features[indices[0]].get("properties", {}) or {})}
         if PAR["lotplan"] not in props_copy or not props_copy.get(PAR["lotplan"]):
             props_copy[PAR["lotplan"]] = display_name
+        # Geometry objects go straight to the KML writer; no mapping() round-trip.
         merged.append({
-            "geometry": mapping(unioned),
+            "geometry": unioned,
             "properties": props_copy,
         })
     if merged or passthrough:
         return merged + passthrough
     return features
 
-def _add_feature_to_folder(kml_folder, f):
+def _feature_placemark(f: Dict[str, Any], style_id: str = "parcel", precision: Optional[int] = None) -> Optional[str]:
     geom = f.get("geometry")
     props = f.get("properties", {}) or {}
-    if not geom: return
-    shp = shape(geom)
+    if not geom: return None
+    shp = geom if isinstance(geom, BaseGeometry) else shape(geom)
     name = props.get(PAR["lotplan"]) or f"Parcel {props.get(PAR['objectid'],'')}" or "parcel"
     desc_lines = []
     if props.get(PAR["lotplan"]):
@@ -334,50 +1026,100 @@ def _add_feature_to_folder(kml_folder, f):
     desc = "\n".join(desc_lines)
     polygons = _collect_polygons(shp)
     if polygons:
-        if len(polygons) == 1:
-            poly = polygons[0]
-            kml_poly = kml_folder.newpolygon(name=name, description=desc)
-            kml_poly.outerboundaryis = [(x, y) for (x, y) in poly.exterior.coords]
-            interior_coords = [[(x, y) for (x, y) in interior.coords] for interior in getattr(poly, "interiors", [])]
-            if interior_coords:
-                kml_poly.innerboundaryis = interior_coords
-            _apply_style(kml_poly)
-        else:
-            multi = kml_folder.newmultigeometry(name=name, description=desc)
-            for poly in polygons:
-                kml_poly = multi.newpolygon()
-                kml_poly.outerboundaryis = [(x, y) for (x, y) in poly.exterior.coords]
-                interior_coords = [[(x, y) for (x, y) in interior.coords] for interior in getattr(poly, "interiors", [])]
-                if interior_coords:
-                    kml_poly.innerboundaryis = interior_coords
-                _apply_style(kml_poly)
-    else:
-        point = shp.representative_point()
-        kml_folder.newpoint(name=name, description=desc, coords=[(point.x, point.y)])
-
-def to_kmz(features: List[Dict[str,Any]], folder_name: str = "parcels", grouped_features: Optional[Dict[str, List[Dict[str,Any]]]] = None) -> bytes:
-    import simplekml
-    kml = simplekml.Kml()
-    if grouped_features:
-        root_folder = kml.newfolder(name=folder_name)
-        for sub_name, feats in grouped_features.items():
-            if not feats:
-                continue
-            sub_folder = root_folder.newfolder(name=sub_name)
-            merged = _merge_features_by_lotplan(feats)
-            for feat in merged:
-                _add_feature_to_folder(sub_folder, feat)
-        if features:
-            merged_features = _merge_features_by_lotplan(features)
-            for f in merged_features:
-                _add_feature_to_folder(root_folder, f)
-    else:
-        fol = kml.newfolder(name=folder_name)
-        merged_features = _merge_features_by_lotplan(features)
-        for f in merged_features:
-            _add_feature_to_folder(fol, f)
-    kml_bytes = kml.kml().encode("utf-8")
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
-        z.writestr("doc.kml", kml_bytes)
-    return buf.getvalue()
+        return kml.placemark_xml(str(name), desc, kml.polygons_xml(polygons, precision), style_url=style_id)
+    point = shp.representative_point()
+    return kml.placemark_xml(str(name), desc, kml.point_xml(point.x, point.y, precision))
+
+def _simplify_sections(sections: List[Tuple[Optional[str], str, List[Dict[str, Any]]]], simplify_m: float) -> None:
+    # Simplify every merged parcel in one pass so boundaries shared between
+    # neighbours (even across folders) stay coincident.
+    feats = [f for _, _, merged in sections for f in merged if f.get("geometry")]
+    shapes = [g if isinstance(g, BaseGeometry) else shape(g) for g in (f["geometry"] for f in feats)]
+    for feat, simplified in zip(feats, simplify_shared(shapes, metres_to_degrees(simplify_m), longitude_scale(shapes))):
+        feat["geometry"] = simplified
+
+def iter_kmz(
+    features: Iterable[Dict[str,Any]],
+    folder_name: str = "parcels",
+    grouped_features: Optional[Dict[str, List[Dict[str,Any]]]] = None,
+    style: Optional[Dict[str, Any]] = None,
+    palette: Optional[List[str]] = None,
+    simplify_m: Optional[float] = None,
+    precision: Optional[int] = None,
+) -> Iterator[bytes]:
+    return timed_iter("to_kmz", _iter_kmz(features, folder_name, grouped_features, style, palette, simplify_m, precision))
+
+def _iter_kmz(
+    features: Iterable[Dict[str,Any]],
+    folder_name: str,
+    grouped_features: Optional[Dict[str, List[Dict[str,Any]]]],
+    style: Optional[Dict[str, Any]],
+    palette: Optional[List[str]],
+    simplify_m: Optional[float],
+    precision: Optional[int],
+) -> Iterator[bytes]:
+    stream = kml.KmzStream()
+    # Accepts any iterable (e.g. iter_query_features); pages are pulled here,
+    # inside the KMZ generator, because parts are merged per lot/plan.
+    features = list(features)
+    groups = [(name, feats) for name, feats in (grouped_features or {}).items() if feats]
+    style_defs, root_style, group_styles = _kmz_styles(style, palette, [name for name, _ in groups])
+    sections: List[Tuple[Optional[str], str, List[Dict[str, Any]]]] = [
+        (name, group_styles[name], feats) for name, feats in groups
+    ]
+    if features or not grouped_features:
+        sections.append((None, root_style, features))
+    if simplify_m:
+        # Topology-aware simplification needs every parcel up front.
+        sections = [(name, sid, _merge_features_by_lotplan(feats)) for name, sid, feats in sections]
+        _simplify_sections(sections, simplify_m)
+
+    written = vertices = 0
+    serialise_seconds = 0.0
+
+    def write_features(feats: List[Dict[str, Any]], style_id: str) -> Iterator[bytes]:
+        nonlocal serialise_seconds, written, vertices
+        for feat in feats if simplify_m else _merge_features_by_lotplan(feats):
+            start = time.perf_counter()
+            placemark = _feature_placemark(feat, style_id, precision)
+            serialise_seconds += time.perf_counter() - start
+            if isinstance(feat.get("geometry"), BaseGeometry):
+                written += 1
+                vertices += int(shapely.get_num_coordinates(feat["geometry"]))
+            if placemark:
+                stream.write(placemark)
+            chunk = stream.drain()
+            if chunk:
+                yield chunk
+
+    stream.write(kml.KML_HEADER)
+    for definition in style_defs.values():
+        stream.write(definition + "\n")
+    stream.write(kml.folder_open(folder_name))
+    for sub_name, style_id, feats in sections:
+        if sub_name is not None:
+            stream.write(kml.folder_open(sub_name))
+        yield from write_features(feats, style_id)
+        if sub_name is not None:
+            stream.write(kml.FOLDER_CLOSE)
+    stream.write(kml.FOLDER_CLOSE)
+    stream.write(kml.KML_FOOTER)
+    yield stream.close()
+    record_stage("kml_serialise", serialise_seconds)
+    record_stage("zip", stream.zip_seconds)
+    observe_count("kmz_features", written)
+    observe_count("kmz_vertices", vertices)
+
+def to_kmz(
+    features: Iterable[Dict[str,Any]],
+    folder_name: str = "parcels",
+    grouped_features: Optional[Dict[str, List[Dict[str,Any]]]] = None,
+    style: Optional[Dict[str, Any]] = None,
+    palette: Optional[List[str]] = None,
+    simplify_m: Optional[float] = None,
+    precision: Optional[int] = None,
+) -> bytes:
+    return b"".join(iter_kmz(
+        features, folder_name=folder_name, grouped_features=grouped_features, style=style, palette=palette,
+        simplify_m=simplify_m, precision=precision,
+    ))
@@ -0,0 +1,233 @@
+import os, json, time, sqlite3, tempfile, threading
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+# Caches live in SQLite files (WAL mode) so they survive restarts and are shared
+# by every uvicorn worker pointing at the same directory.
+CACHE_DIR = os.getenv("QLD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "qld-quote-mapper"))
+
+MISSING = object()
+
+# Reads don't write: hit/miss counters and LRU "accessed" times are buffered
+# and flushed in one transaction every ACCESS_FLUSH_INTERVAL seconds or
+# ACCESS_FLUSH_BATCH reads, and before any write that depends on them.
+ACCESS_FLUSH_INTERVAL = float(os.getenv("QLD_CACHE_ACCESS_FLUSH_INTERVAL", "5"))
+ACCESS_FLUSH_BATCH = int(os.getenv("QLD_CACHE_ACCESS_FLUSH_BATCH", "256"))
+
+_bypass: ContextVar[bool] = ContextVar("cache_bypass", default=False)
+
+def set_cache_bypass(value: bool):
+    return _bypass.set(bool(value))
+
+def reset_cache_bypass(token) -> None:
+    _bypass.reset(token)
+
+def cache_bypassed() -> bool:
+    return _bypass.get()
+
+def env_flag(name: str, default: str = "true") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+class SqliteCache:
+    def __init__(self, name: str, ttl: float, max_entries: int, negative_ttl: Optional[float] = None,
+                 enabled: bool = True, path: Optional[str] = None, max_bytes: Optional[int] = None,
+                 stale_ttl: float = 0):
+        self.name = name
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self.enabled = enabled
+        self.path = path or os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialised = False
+        self._pending_lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._flushed_at = time.monotonic()
+        # Limits are enforced every ~2% of max_entries writes rather than on each
+        # one (the size scan is O(entries)), so a cache may briefly overshoot.
+        self._evict_every = max(1, max_entries // 50)
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialised:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS entries ("
+                        "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, "
+                        "accessed REAL NOT NULL, size INTEGER NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+                    conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                    self._initialised = True
+            self._local.conn = conn
+        return conn
+
+    def _bump(self, conn: sqlite3.Connection, counter: str, amount: int = 1) -> None:
+        conn.execute(
+            "INSERT INTO counters(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (counter, amount),
+        )
+
+    def _note(self, counter: str, key: Optional[str] = None, now: Optional[float] = None) -> None:
+        with self._pending_lock:
+            self._counts[counter] = self._counts.get(counter, 0) + 1
+            if key is not None:
+                self._touched[key] = now or time.time()
+            due = (len(self._touched) + sum(self._counts.values()) >= ACCESS_FLUSH_BATCH
+                   or time.monotonic() - self._flushed_at >= ACCESS_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._pending_lock:
+            touched, self._touched = self._touched, {}
+            counts, self._counts = self._counts, {}
+            self._flushed_at = time.monotonic()
+        if not touched and not counts:
+            return
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "UPDATE entries SET accessed = MAX(accessed, ?) WHERE key = ?",
+                    [(accessed, key) for key, accessed in touched.items()],
+                )
+                for counter, amount in counts.items():
+                    self._bump(conn, counter, amount)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            pass
+
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        if not self.enabled or cache_bypassed():
+            return default
+        try:
+            now = time.time()
+            row = self._conn().execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return default
+        if row is None or row[1] < now:
+            self._note("misses")
+            return default
+        self._note("hits", key, now)
+        return json.loads(row[0])
+
+    def get_stale(self, key: str) -> Any:
+        # Last known value even if expired (kept for stale_ttl); for upstream outages.
+        if not self.enabled or cache_bypassed():
+            return MISSING
+        try:
+            row = self._conn().execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return MISSING
+        if row is None:
+            return MISSING
+        self._note("stale_hits")
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        if ttl is None:
+            ttl = self.ttl if value not in (None, [], {}) else self.negative_ttl
+        if ttl <= 0:
+            return
+        payload = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        with self._pending_lock:
+            self._writes += 1
+            evict = self._writes >= self._evict_every
+            if evict:
+                self._writes = 0
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries(key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, now + ttl, now, len(payload)),
+            )
+            if evict:
+                # Eviction orders by "accessed", so apply buffered reads first.
+                self.flush()
+                self._evict(conn)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM entries WHERE expires < ?", (time.time() - self.stale_ttl,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)",
+                (excess,),
+            )
+            self._bump(conn, "evictions", excess)
+        if self.max_bytes:
+            (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+            if total > self.max_bytes:
+                doomed: List[str] = []
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append(key)
+                    total -= size
+                conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in doomed])
+                self._bump(conn, "evictions", len(doomed))
+
+    def invalidate(self, keys: Optional[List[str]] = None) -> int:
+        try:
+            conn = self._conn()
+            if keys is None:
+                removed = conn.execute("DELETE FROM entries").rowcount
+            else:
+                removed = sum(conn.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount for key in keys)
+            return removed
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "name": self.name,
+            "enabled": self.enabled,
+            "path": self.path,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "stale_ttl": self.stale_ttl,
+        }
+        self.flush()
+        try:
+            conn = self._conn()
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        except sqlite3.Error as exc:
+            out["error"] = str(exc)
+            return out
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        out.update({
+            "entries": entries,
+            "bytes": size,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "stale_hits": counters.get("stale_hits", 0),
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        })
+        return out
@@ -0,0 +1,213 @@
+import os, re, json, sqlite3, argparse
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import shapely
+from shapely.geometry import shape, mapping, Point
+from app.services.store import LocalStore
+
+# Optional local copy of the cadastre (SQLite + R*Tree) answered before the
+# MapServer. Build it with:  python -m app.services.cadastre import extract.gpkg
+CADASTRE_DB = os.getenv("QLD_CADASTRE_DB", "")
+IMPORT_BATCH = 5000
+# WGS84 plus the Australian datums (GDA94, GDA2020), which agree to ~1.8 m.
+_LONLAT_SRIDS = {4326, 4283, 7844}
+
+def _lotplan_key(value: Any) -> str:
+    if not isinstance(value, str):
+        return ""
+    return re.sub(r"\s+", "", value.upper())
+
+def _feature_lotplan(props: Dict[str, Any]) -> str:
+    key = _lotplan_key(props.get("lotplan"))
+    if not key and props.get("lot") and props.get("plan"):
+        key = _lotplan_key(f"{props['lot']}{props['plan']}")
+    return key
+
+class CadastreStore(LocalStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS parcels (id INTEGER PRIMARY KEY, lotplan TEXT NOT NULL, feature TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS parcels_lotplan ON parcels(lotplan)",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS parcels_rtree USING rtree(id, min_x, max_x, min_y, max_y)",
+    )
+
+    def lookup_lotplans(self, compacts: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        # Only lot/plans present locally appear in the result.
+        found: Dict[str, List[Dict[str, Any]]] = {}
+        if not compacts or not self.enabled:
+            return found
+        try:
+            conn = self._conn()
+            for start in range(0, len(compacts), 500):
+                chunk = compacts[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT lotplan, feature FROM parcels WHERE lotplan IN ({marks}) ORDER BY id", chunk)
+                for lotplan, feature in rows:
+                    found.setdefault(lotplan, []).append(json.loads(feature))
+        except sqlite3.Error:
+            return {}
+        return found
+
+    def lookup_point(self, lat: float, lon: float, max_results: int = 50) -> List[Dict[str, Any]]:
+        if not self.enabled:
+            return []
+        x, y = float(lon), float(lat)
+        try:
+            rows = self._conn().execute(
+                "SELECT p.feature FROM parcels_rtree r JOIN parcels p ON p.id = r.id "
+                "WHERE r.min_x <= ? AND r.max_x >= ? AND r.min_y <= ? AND r.max_y >= ? ORDER BY p.id",
+                (x, x, y, y),
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+        point = Point(x, y)
+        hits: List[Dict[str, Any]] = []
+        for (feature,) in rows:
+            feat = json.loads(feature)
+            if feat.get("geometry") and shape(feat["geometry"]).intersects(point):
+                hits.append(feat)
+                if len(hits) >= max_results:
+                    break
+        return hits
+
+    def import_features(self, features: Iterable[Dict[str, Any]], replace: bool = False) -> int:
+        conn = self._conn()
+        if replace:
+            conn.execute("DELETE FROM parcels")
+            conn.execute("DELETE FROM parcels_rtree")
+        (next_id,) = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM parcels").fetchone()
+        count = 0
+        batch: List[Dict[str, Any]] = []
+
+        def flush() -> None:
+            nonlocal next_id
+            geoms = shapely.from_geojson([json.dumps(f["geometry"]) for f in batch])
+            bounds = shapely.bounds(geoms)
+            ids = range(next_id, next_id + len(batch))
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO parcels(id, lotplan, feature) VALUES (?, ?, ?)",
+                [(i, _feature_lotplan(f["properties"]), json.dumps(f, separators=(",", ":"))) for i, f in zip(ids, batch)],
+            )
+            conn.executemany(
+                "INSERT INTO parcels_rtree(id, min_x, max_x, min_y, max_y) VALUES (?, ?, ?, ?, ?)",
+                [(i, b[0], b[2], b[1], b[3]) for i, b in zip(ids, bounds.tolist())],
+            )
+            conn.execute("COMMIT")
+            next_id += len(batch)
+            batch.clear()
+
+        for feat in features:
+            if not feat.get("geometry"):
+                continue
+            props = {str(k).lower(): v for k, v in (feat.get("properties") or {}).items()}
+            if _feature_lotplan(props) and not props.get("lotplan"):
+                props["lotplan"] = _feature_lotplan(props)
+            batch.append({"type": "Feature", "geometry": feat["geometry"], "properties": props})
+            count += 1
+            if len(batch) >= IMPORT_BATCH:
+                flush()
+        if batch:
+            flush()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"path": self.path or None, "enabled": self.enabled}
+        if self.enabled:
+            try:
+                (out["parcels"],) = self._conn().execute("SELECT COUNT(*) FROM parcels").fetchone()
+            except sqlite3.Error as exc:
+                out["error"] = str(exc)
+        return out
+
+local_cadastre = CadastreStore(CADASTRE_DB)
+
+def _check_srid(srid: Any, source: str) -> None:
+    if srid is not None and int(srid) not in _LONLAT_SRIDS:
+        raise ValueError(f"{source}: expected lon/lat coordinates (EPSG:4326/4283/7844), got EPSG:{srid}")
+
+def read_geojson(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as fh:
+        head = fh.read(1)
+        fh.seek(0)
+        if head == "{":
+            data = json.load(fh)
+            crs = ((data.get("crs") or {}).get("properties") or {}).get("name", "")
+            match = re.search(r"EPSG:{1,2}(\d+)", crs)
+            if match:
+                _check_srid(match.group(1), path)
+            yield from data.get("features", []) if data.get("type") == "FeatureCollection" else [data]
+        else:
+            # Newline-delimited GeoJSON
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+def _gpkg_geometry(blob: bytes):
+    # GeoPackage binary: "GP", version, flags, srs_id, optional envelope, then WKB.
+    if not blob or blob[:2] != b"GP":
+        return None
+    flags = blob[3]
+    if flags & 0b10000:
+        return None
+    envelope = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}[(flags >> 1) & 0b111]
+    return shapely.from_wkb(blob[8 + envelope:])
+
+def read_geopackage(path: str, layer: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        layers = conn.execute("SELECT table_name, column_name, srs_id FROM gpkg_geometry_columns").fetchall()
+        picked = [row for row in layers if layer is None or row[0] == layer]
+        if not picked:
+            raise ValueError(f"{path}: no geometry layer {layer or ''}".strip())
+        table, column, srid = picked[0]
+        _check_srid(srid, path)
+        cursor = conn.execute(f'SELECT * FROM "{table}"')
+        names = [d[0] for d in cursor.description]
+        for row in cursor:
+            values = dict(zip(names, row))
+            geom = _gpkg_geometry(values.pop(column))
+            if geom is None or geom.is_empty:
+                continue
+            yield {"type": "Feature", "geometry": mapping(geom), "properties": values}
+    finally:
+        conn.close()
+
+def read_with_pyogrio(path: str, layer: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    # FlatGeobuf (and any other OGR format) needs the optional pyogrio package.
+    try:
+        from pyogrio.raw import read
+    except ImportError as exc:
+        raise RuntimeError("Reading this format requires the optional 'pyogrio' package.") from exc
+    meta, _, geometry, field_data = read(path, layer=layer)
+    crs = meta.get("crs") or ""
+    match = re.search(r"EPSG:(\d+)", crs)
+    _check_srid(match.group(1) if match else None, path)
+    names = list(meta["fields"])
+    for index, wkb in enumerate(geometry):
+        if wkb is None:
+            continue
+        props = {name: (values[index].item() if hasattr(values[index], "item") else values[index]) for name, values in zip(names, field_data)}
+        yield {"type": "Feature", "geometry": mapping(shapely.from_wkb(wkb)), "properties": props}
+
+def read_features(path: str, layer: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".geojson", ".json", ".geojsonl", ".ndjson"):
+        return read_geojson(path)
+    if ext == ".gpkg":
+        return read_geopackage(path, layer)
+    return read_with_pyogrio(path, layer)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.cadastre")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Load a cadastre extract (GeoJSON, GeoPackage, FlatGeobuf)")
+    imp.add_argument("source")
+    imp.add_argument("--layer")
+    imp.add_argument("--db", default=CADASTRE_DB or "cadastre.sqlite3")
+    imp.add_argument("--replace", action="store_true", help="Drop existing parcels first")
+    args = parser.parse_args(argv)
+    store = CadastreStore(args.db)
+    count = store.import_features(read_features(args.source, args.layer), replace=args.replace)
+    print(f"Imported {count} parcels into {args.db} ({store.stats().get('parcels')} total)")
+
+if __name__ == "__main__":
+    main()
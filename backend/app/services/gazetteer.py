@@ -0,0 +1,192 @@
+import os, re, sqlite3, argparse
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from app.services.cadastre import read_features
+from app.services.store import LocalStore
+
+# Optional local copy of the Address layer (locality -> street -> number) used by
+# resolve_lotplans_from_address before the MapServer. Build it with:
+#   python -m app.services.gazetteer import addresses.gpkg
+GAZETTEER_DB = os.getenv("QLD_GAZETTEER_DB", "")
+# Minimum trigram similarity for a misspelt street name to count as a match.
+FUZZY_MIN_SIMILARITY = float(os.getenv("QLD_GAZETTEER_MIN_SIMILARITY", "0.5"))
+FUZZY_CANDIDATES = 20
+
+STREET_TYPES = {
+    "AL": "ALLEY", "ALLY": "ALLEY", "ARC": "ARCADE", "AV": "AVENUE", "AVE": "AVENUE",
+    "BVD": "BOULEVARD", "BLVD": "BOULEVARD", "BDWY": "BROADWAY", "CCT": "CIRCUIT", "CIR": "CIRCLE",
+    "CL": "CLOSE", "CT": "COURT", "CRT": "COURT", "CRES": "CRESCENT", "CR": "CRESCENT", "CRST": "CREST",
+    "DR": "DRIVE", "DRV": "DRIVE", "ESP": "ESPLANADE", "GDNS": "GARDENS", "GR": "GROVE", "GRV": "GROVE",
+    "HWY": "HIGHWAY", "LA": "LANE", "LN": "LANE", "MWY": "MOTORWAY", "PDE": "PARADE", "PL": "PLACE",
+    "PKWY": "PARKWAY", "RD": "ROAD", "RDGE": "RIDGE", "SQ": "SQUARE", "ST": "STREET", "TCE": "TERRACE",
+    "TRL": "TRAIL", "WY": "WAY",
+}
+_FULL_TYPES = set(STREET_TYPES.values()) | {"WAY", "LOOP", "MEWS", "RISE", "VIEW", "WALK", "ROW", "TRACK", "VISTA"}
+
+def normalize_text(value: Any) -> str:
+    text = str(value or "").upper().replace("'", "").replace(".", "")
+    return re.sub(r"[\s\-]+", " ", text).strip()
+
+def normalize_street_type(value: Any) -> str:
+    text = normalize_text(value)
+    return STREET_TYPES.get(text, text)
+
+def split_street(street: Any, street_type: Any = None) -> Tuple[str, str]:
+    # "SMITH RD" with no separate type -> ("SMITH", "ROAD")
+    name, kind = normalize_text(street), normalize_street_type(street_type)
+    if not kind and " " in name:
+        head, last = name.rsplit(" ", 1)
+        last = STREET_TYPES.get(last, last)
+        if last in _FULL_TYPES:
+            name, kind = head, last
+    return name, kind
+
+def street_variants(street: Any, street_type: Any = None) -> List[Tuple[str, str]]:
+    # Without an explicit type, "MOUNT VIEW" may be the name alone (any type) or
+    # "MOUNT" + VIEW; try the literal reading first.
+    name, kind = split_street(street, street_type)
+    if normalize_street_type(street_type) or not kind:
+        return [(name, kind)]
+    return [(normalize_text(street), ""), (name, kind)]
+
+def normalize_number(value: Any) -> str:
+    return re.sub(r"\s+", "", str(value or "").upper())
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class AddressGazetteer(LocalStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS localities (id INTEGER PRIMARY KEY, name TEXT NOT NULL, state TEXT NOT NULL, UNIQUE(name, state))",
+        "CREATE TABLE IF NOT EXISTS streets (id INTEGER PRIMARY KEY, locality_id INTEGER NOT NULL, name TEXT NOT NULL,"
+        " type TEXT NOT NULL, grams INTEGER NOT NULL, UNIQUE(locality_id, name, type))",
+        "CREATE TABLE IF NOT EXISTS street_trigrams (trigram TEXT NOT NULL, street_id INTEGER NOT NULL,"
+        " PRIMARY KEY(trigram, street_id)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS addresses (street_id INTEGER NOT NULL, number TEXT NOT NULL, lotplan TEXT NOT NULL,"
+        " latitude REAL, longitude REAL)",
+        "CREATE INDEX IF NOT EXISTS addresses_street_number ON addresses(street_id, number)",
+    )
+
+    def _streets(self, conn: sqlite3.Connection, locality: str, state: str, variants: List[Tuple[str, str]]) -> List[int]:
+        localities = [row[0] for row in conn.execute(
+            "SELECT id FROM localities WHERE name = ? AND (? = '' OR state = ?)", (locality, state, state))]
+        if not localities:
+            return []
+        marks = ",".join("?" * len(localities))
+        for name, kind in variants:
+            exact = [row[0] for row in conn.execute(
+                f"SELECT id FROM streets WHERE locality_id IN ({marks}) AND name = ? AND (? = '' OR type = ?)",
+                (*localities, name, kind, kind))]
+            if exact:
+                return exact
+        # Fuzzy fallback: streets in the locality sharing the most trigrams, kept
+        # if their Jaccard similarity is high enough and the type (if any) agrees.
+        scored: List[Tuple[float, int]] = []
+        for name, kind in variants:
+            grams = sorted(trigrams(name))
+            gmarks = ",".join("?" * len(grams))
+            rows = conn.execute(
+                f"SELECT s.id, s.type, s.grams, COUNT(*) AS shared FROM street_trigrams t JOIN streets s ON s.id = t.street_id "
+                f"WHERE t.trigram IN ({gmarks}) AND s.locality_id IN ({marks}) GROUP BY s.id ORDER BY shared DESC LIMIT ?",
+                (*grams, *localities, FUZZY_CANDIDATES),
+            ).fetchall()
+            scored.extend((shared / (len(grams) + total - shared), sid) for sid, stype, total, shared in rows if not kind or stype == kind)
+        if not scored:
+            return []
+        best = max(score for score, _ in scored)
+        if best < FUZZY_MIN_SIMILARITY:
+            return []
+        return list(dict.fromkeys(sid for score, sid in scored if score == best))
+
+    def lookup(self, addr: Dict[str, Any], relax_no_number: bool = False, max_results: int = 50) -> List[Dict[str, Any]]:
+        # Address rows for a parsed address; [] means "not covered locally".
+        if not self.enabled or not addr.get("street") or not addr.get("suburb"):
+            return []
+        variants = street_variants(addr["street"], addr.get("suffix"))
+        number = normalize_number(addr.get("house_number"))
+        if not variants[0][0] or (not number and not relax_no_number):
+            return []
+        try:
+            conn = self._conn()
+            streets = self._streets(conn, normalize_text(addr["suburb"]), normalize_text(addr.get("state")), variants)
+            if not streets:
+                return []
+            marks = ",".join("?" * len(streets))
+            sql = f"SELECT lotplan, latitude, longitude FROM addresses WHERE street_id IN ({marks})"
+            args: List[Any] = list(streets)
+            if number:
+                sql += " AND number = ?"
+                args.append(number)
+            rows = conn.execute(sql + " ORDER BY rowid LIMIT ?", (*args, max_results)).fetchall()
+        except sqlite3.Error:
+            return []
+        return [{"lotplan": lotplan, "latitude": lat, "longitude": lon} for lotplan, lat, lon in rows]
+
+    def import_records(self, records: Iterable[Dict[str, Any]], replace: bool = False) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN")
+        if replace:
+            for table in ("addresses", "street_trigrams", "streets", "localities"):
+                conn.execute(f"DELETE FROM {table}")
+        localities = {(name, state): lid for lid, name, state in conn.execute("SELECT id, name, state FROM localities")}
+        streets = {(lid, name, kind): sid for sid, lid, name, kind in conn.execute("SELECT id, locality_id, name, type FROM streets")}
+        batch: List[Tuple[int, str, str, Any, Any]] = []
+        count = 0
+        for record in records:
+            props = {str(k).lower(): v for k, v in (record.get("properties") or {}).items()}
+            lotplan = re.sub(r"\s+", "", str(props.get("lotplan") or "").upper())
+            name, kind = split_street(props.get("street_name"), props.get("street_type"))
+            locality, state = normalize_text(props.get("locality")), normalize_text(props.get("state"))
+            if not (lotplan and name and locality):
+                continue
+            lat, lon = props.get("latitude"), props.get("longitude")
+            geom = record.get("geometry") or {}
+            if (lat is None or lon is None) and geom.get("type") == "Point":
+                lon, lat = geom["coordinates"][:2]
+            lid = localities.get((locality, state))
+            if lid is None:
+                lid = localities[(locality, state)] = conn.execute(
+                    "INSERT INTO localities(name, state) VALUES (?, ?)", (locality, state)).lastrowid
+            sid = streets.get((lid, name, kind))
+            if sid is None:
+                grams = trigrams(name)
+                sid = streets[(lid, name, kind)] = conn.execute(
+                    "INSERT INTO streets(locality_id, name, type, grams) VALUES (?, ?, ?, ?)", (lid, name, kind, len(grams))).lastrowid
+                conn.executemany("INSERT INTO street_trigrams(trigram, street_id) VALUES (?, ?)", [(g, sid) for g in grams])
+            batch.append((sid, normalize_number(props.get("street_number")), lotplan, lat, lon))
+            count += 1
+            if len(batch) >= 10000:
+                conn.executemany("INSERT INTO addresses VALUES (?, ?, ?, ?, ?)", batch)
+                batch.clear()
+        conn.executemany("INSERT INTO addresses VALUES (?, ?, ?, ?, ?)", batch)
+        conn.execute("COMMIT")
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"path": self.path or None, "enabled": self.enabled}
+        if self.enabled:
+            try:
+                conn = self._conn()
+                for table in ("localities", "streets", "addresses"):
+                    (out[table],) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            except sqlite3.Error as exc:
+                out["error"] = str(exc)
+        return out
+
+address_gazetteer = AddressGazetteer(GAZETTEER_DB)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.gazetteer")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Load an Address layer extract (GeoJSON, GeoPackage, FlatGeobuf)")
+    imp.add_argument("source")
+    imp.add_argument("--layer")
+    imp.add_argument("--db", default=GAZETTEER_DB or "gazetteer.sqlite3")
+    imp.add_argument("--replace", action="store_true", help="Drop existing addresses first")
+    args = parser.parse_args(argv)
+    store = AddressGazetteer(args.db)
+    count = store.import_records(read_features(args.source, args.layer), replace=args.replace)
+    print(f"Imported {count} addresses into {args.db} ({store.stats().get('addresses')} total)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+from shapely.geometry import LineString, Polygon, MultiPolygon
+from shapely.geometry.base import BaseGeometry
+
+Coord = Tuple[float, float]
+
+METRES_PER_DEGREE = 111_320.0
+
+def metres_to_degrees(metres: float) -> float:
+    # Degrees of latitude. A degree of longitude is cos(latitude) times shorter,
+    # which simplify_shared corrects for with x_scale (see longitude_scale).
+    return metres / METRES_PER_DEGREE
+
+def longitude_scale(geoms: Sequence[BaseGeometry]) -> float:
+    # cos() of the latitude midway across the shapes: multiplying longitudes by
+    # it makes a degree the same distance along both axes, locally.
+    bounds = [geom.bounds for geom in geoms if not geom.is_empty]
+    if not bounds:
+        return 1.0
+    latitude = (min(b[1] for b in bounds) + max(b[3] for b in bounds)) / 2
+    return max(math.cos(math.radians(latitude)), 1e-6)
+
+def _polygons(geom: BaseGeometry) -> List[Polygon]:
+    if isinstance(geom, Polygon):
+        return [geom]
+    if isinstance(geom, MultiPolygon):
+        return list(geom.geoms)
+    return []
+
+def _ring(coords: Sequence[Sequence[float]]) -> List[Coord]:
+    ring = [(float(c[0]), float(c[1])) for c in coords]
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+    return ring
+
+def _junctions(rings: List[List[Coord]]) -> Set[Coord]:
+    # A vertex where boundaries meet or split has more than two distinct neighbours
+    # (topojson's rule). Arcs between junctions are identical in every ring that
+    # shares them, so simplifying each arc once keeps shared edges aligned.
+    neighbours: Dict[Coord, Set[Coord]] = defaultdict(set)
+    for ring in rings:
+        n = len(ring)
+        for i, point in enumerate(ring):
+            neighbours[point].add(ring[i - 1])
+            neighbours[point].add(ring[(i + 1) % n])
+    return {point for point, adj in neighbours.items() if len(adj) > 2}
+
+Arc = Tuple[Coord, ...]
+ArcRef = Tuple[Arc, bool]
+
+def _arc(points: List[Coord]) -> ArcRef:
+    # Canonical direction, so an arc walked either way by neighbouring rings has one key.
+    reverse = points[-1] < points[0] or (points[-1] == points[0] and points[-2] < points[1])
+    return (tuple(reversed(points)) if reverse else tuple(points)), reverse
+
+def _ring_arcs(ring: List[Coord], junctions: Set[Coord]) -> List[ArcRef]:
+    cuts = [i for i, point in enumerate(ring) if point in junctions]
+    if not cuts:
+        # Free-standing ring: rotate/orient canonically so duplicates simplify identically.
+        start = ring.index(min(ring))
+        rotated = ring[start:] + ring[:start]
+        return [_arc(rotated + [rotated[0]])]
+    start = cuts[0]
+    rotated = ring[start:] + ring[:start] + [ring[start]]
+    cut_set = {i - start if i >= start else i - start + len(ring) for i in cuts}
+    cut_set.add(len(ring))
+    arcs: List[ArcRef] = []
+    prev = 0
+    for i in sorted(cut_set):
+        if i == 0:
+            continue
+        arcs.append(_arc(rotated[prev:i + 1]))
+        prev = i
+    return arcs
+
+def _simplify_arc(arc: Arc, tolerance: float, x_scale: float) -> List[Coord]:
+    if len(arc) <= 2:
+        return list(arc)
+    line = LineString([(x * x_scale, y) for x, y in arc]).simplify(tolerance, preserve_topology=False)
+    out = [(x / x_scale, y) for x, y in line.coords]
+    # Ends are junctions shared with other arcs: keep them bit-identical.
+    out[0], out[-1] = arc[0], arc[-1]
+    return out
+
+def _assemble(arcs: List[ArcRef], lines: Dict[Arc, List[Coord]]) -> List[Coord]:
+    out: List[Coord] = []
+    for key, reverse in arcs:
+        line = lines[key][::-1] if reverse else lines[key]
+        out.extend(line[1:] if out else line)
+    return out
+
+# Per polygon: its ring arcs (shell first), or the polygon itself when it's left as is.
+Layout = List[Union[Polygon, List[List[ArcRef]]]]
+
+def _build(geom: BaseGeometry, layout: Layout, lines: Dict[Arc, List[Coord]]) -> Optional[BaseGeometry]:
+    polys: List[Polygon] = []
+    for part in layout:
+        if isinstance(part, Polygon):
+            polys.append(part)
+            continue
+        rings = [_assemble(arcs, lines) for arcs in part]
+        if any(len(ring) < 4 for ring in rings):
+            return None
+        polys.append(Polygon(rings[0], rings[1:]))
+    return polys[0] if isinstance(geom, Polygon) else MultiPolygon(polys)
+
+def simplify_shared(geoms: List[BaseGeometry], tolerance: float, x_scale: float = 1.0) -> List[BaseGeometry]:
+    # Douglas-Peucker per shared arc. x_scale multiplies x before simplifying
+    # (longitude_scale for lon/lat input), so tolerance applies in both directions.
+    if tolerance <= 0:
+        return geoms
+    all_rings: List[List[Coord]] = []
+    for geom in geoms:
+        for poly in _polygons(geom):
+            all_rings.append(_ring(poly.exterior.coords))
+            all_rings.extend(_ring(interior.coords) for interior in poly.interiors)
+    junctions = _junctions([ring for ring in all_rings if len(ring) >= 3])
+    layouts: List[Optional[Layout]] = []
+    users: Dict[Arc, Set[int]] = defaultdict(set)
+    for index, geom in enumerate(geoms):
+        polys = _polygons(geom)
+        if not polys:
+            layouts.append(None)
+            continue
+        layout: Layout = []
+        for poly in polys:
+            exterior = _ring(poly.exterior.coords)
+            if len(exterior) < 3:
+                layout.append(poly)
+                continue
+            rings = [exterior] + [_ring(interior.coords) for interior in poly.interiors if len(interior.coords) >= 4]
+            part = [_ring_arcs(ring, junctions) for ring in rings]
+            for arcs in part:
+                for key, _ in arcs:
+                    users[key].add(index)
+            layout.append(part)
+        layouts.append(layout)
+    lines = {key: _simplify_arc(key, tolerance, x_scale) for key in users}
+    out = list(geoms)
+    pending = {index for index, layout in enumerate(layouts) if layout is not None}
+    while pending:
+        # A shape that comes out broken keeps its original arcs, and so must every
+        # neighbour sharing one of them, or their common edges would part.
+        frozen: Set[Arc] = set()
+        for index in sorted(pending):
+            layout = layouts[index]
+            result = _build(geoms[index], layout, lines)
+            if result is not None and result.is_valid:
+                out[index] = result
+                continue
+            out[index] = geoms[index]
+            frozen.update(
+                key for part in layout if not isinstance(part, Polygon)
+                for arcs in part for key, _ in arcs if lines[key] != list(key)
+            )
+        for key in frozen:
+            lines[key] = list(key)
+        pending = {index for key in frozen for index in users[key]}
+    return out
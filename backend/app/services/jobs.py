@@ -0,0 +1,351 @@
+import os, json, time, uuid, socket, asyncio, logging, ipaddress
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import httpx
+from app.services.cache import CACHE_DIR
+from app.services.store import LocalStore
+from app.services.resilience import backoff_delay, set_deadline, reset_deadline
+
+# Bulk jobs: documents are persisted in SQLite and processed by background
+# workers in every app process that has QLD_JOB_WORKERS > 0. Claims are atomic
+# row updates, so several uvicorn workers can share one store.
+JOBS_DB = os.getenv("QLD_JOBS_DB", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("QLD_JOB_WORKERS", "2"))
+JOB_MAX_DOCUMENTS = int(os.getenv("QLD_JOB_MAX_DOCUMENTS", "200"))
+JOB_TTL = float(os.getenv("QLD_JOB_TTL", str(7 * 24 * 3600)))
+# A running document's claim is refreshed every JOB_STALE_AFTER / 3 while a worker
+# is on it; one not refreshed for JOB_STALE_AFTER (its process died) is handed out again.
+JOB_STALE_AFTER = float(os.getenv("QLD_JOB_STALE_AFTER", "900"))
+JOB_POLL_INTERVAL = float(os.getenv("QLD_JOB_POLL_INTERVAL", "2"))
+WEBHOOK_TIMEOUT = float(os.getenv("QLD_JOB_WEBHOOK_TIMEOUT", "10"))
+WEBHOOK_ATTEMPTS = int(os.getenv("QLD_JOB_WEBHOOK_ATTEMPTS", "3"))
+# Comma-separated hosts (subdomains included) webhooks may be sent to. Without
+# a list, any host is accepted as long as it resolves only to public addresses.
+WEBHOOK_ALLOWED_HOSTS = [h.strip().lower().rstrip(".") for h in os.getenv("QLD_JOB_WEBHOOK_HOSTS", "").split(",") if h.strip()]
+
+logger = logging.getLogger(__name__)
+
+# (folder name, resolved parcels, KMZ bytes) for one document.
+DocumentResult = Tuple[str, Dict[str, Any], bytes]
+
+async def check_webhook_url(url: str) -> Optional[str]:
+    # The job payload is POSTed to a caller-chosen URL, so refuse anything that
+    # would point the server at itself or the internal network. Checked on
+    # submission and again before each delivery. Returns the checked address
+    # to connect to (None for allow-listed hosts). Raises ValueError.
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower().rstrip(".")
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError("Webhook URL must be an absolute http(s) URL.")
+    if WEBHOOK_ALLOWED_HOSTS:
+        if not any(host == allowed or host.endswith("." + allowed) for allowed in WEBHOOK_ALLOWED_HOSTS):
+            raise ValueError(f"Webhook host {host} is not allowed.")
+        return None
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError, ValueError) as exc:
+        raise ValueError(f"Webhook host {host} could not be resolved.") from exc
+    for *_, sockaddr in infos:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            raise ValueError(f"Webhook host {host} resolves to a non-public address.")
+    if not infos:
+        raise ValueError(f"Webhook host {host} could not be resolved.")
+    return infos[0][4][0].split("%")[0]
+
+def _pinned_request(url: str, address: Optional[str]) -> Tuple[httpx.URL, Dict[str, str], Dict[str, Any]]:
+    # (url, headers, extensions) that connect to the checked address rather than
+    # resolving the host again, which a rebinding DNS server could answer with
+    # an internal address. Host header and TLS SNI/certificate keep the hostname.
+    target = httpx.URL(url)
+    if address is None:
+        return target, {}, {}
+    return target.copy_with(host=address), {"Host": target.netloc.decode("ascii")}, {"sni_hostname": target.raw_host.decode("ascii")}
+
+class JobStore(LocalStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, created REAL NOT NULL,"
+        " updated REAL NOT NULL, options TEXT NOT NULL, webhook_url TEXT, webhook_status TEXT)",
+        "CREATE TABLE IF NOT EXISTS documents (job_id TEXT NOT NULL, idx INTEGER NOT NULL, name TEXT NOT NULL,"
+        " kind TEXT NOT NULL, status TEXT NOT NULL, error TEXT, claimed REAL, payload BLOB, folder_name TEXT,"
+        " parcels INTEGER, result TEXT, kmz BLOB, PRIMARY KEY(job_id, idx))",
+        "CREATE INDEX IF NOT EXISTS documents_status ON documents(status)",
+    )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def create(self, documents: List[Tuple[str, str, bytes]], options: Dict[str, Any], webhook_url: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO jobs(id, status, created, updated, options, webhook_url) VALUES (?, 'queued', ?, ?, ?, ?)",
+            (job_id, now, now, json.dumps(options), webhook_url),
+        )
+        conn.executemany(
+            "INSERT INTO documents(job_id, idx, name, kind, status, payload) VALUES (?, ?, ?, ?, 'queued', ?)",
+            [(job_id, idx, name, kind, payload) for idx, (name, kind, payload) in enumerate(documents)],
+        )
+        conn.execute("COMMIT")
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "UPDATE documents SET status = 'queued', claimed = NULL WHERE status = 'running' AND claimed < ?",
+            (now - JOB_STALE_AFTER,),
+        )
+        while True:
+            row = conn.execute(
+                "SELECT d.job_id, d.idx FROM documents d JOIN jobs j ON j.id = d.job_id "
+                "WHERE d.status = 'queued' ORDER BY j.created, d.idx LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = conn.execute(
+                "UPDATE documents SET status = 'running', claimed = ? WHERE job_id = ? AND idx = ? AND status = 'queued'",
+                (now, *row),
+            ).rowcount
+            if claimed:
+                break
+        conn.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ? AND status = 'queued'", (now, row[0]))
+        doc = conn.execute(
+            "SELECT d.job_id, d.idx, d.name, d.kind, d.payload, j.options FROM documents d JOIN jobs j ON j.id = d.job_id "
+            "WHERE d.job_id = ? AND d.idx = ?",
+            row,
+        ).fetchone()
+        return {"job_id": doc[0], "index": doc[1], "name": doc[2], "kind": doc[3], "payload": doc[4], "options": json.loads(doc[5])}
+
+    def heartbeat(self, doc: Dict[str, Any]) -> None:
+        self._conn().execute(
+            "UPDATE documents SET claimed = ? WHERE job_id = ? AND idx = ? AND status = 'running'",
+            (time.time(), doc["job_id"], doc["index"]),
+        )
+
+    def release(self, doc: Dict[str, Any]) -> None:
+        self._conn().execute(
+            "UPDATE documents SET status = 'queued', claimed = NULL WHERE job_id = ? AND idx = ? AND status = 'running'",
+            (doc["job_id"], doc["index"]),
+        )
+
+    def complete(self, doc: Dict[str, Any], result: DocumentResult) -> bool:
+        folder_name, resolved, kmz = result
+        parcels = len(resolved.get("all_parcels") or [])
+        stored = {key: resolved.get(key) for key in ("grouped_features", "ungrouped_parcels")}
+        self._conn().execute(
+            "UPDATE documents SET status = 'completed', error = NULL, payload = NULL, folder_name = ?, parcels = ?,"
+            " result = ?, kmz = ? WHERE job_id = ? AND idx = ?",
+            (folder_name, parcels, json.dumps(stored), kmz, doc["job_id"], doc["index"]),
+        )
+        return self._finish_job(doc["job_id"])
+
+    def fail(self, doc: Dict[str, Any], error: str) -> bool:
+        self._conn().execute(
+            "UPDATE documents SET status = 'failed', error = ?, payload = NULL WHERE job_id = ? AND idx = ?",
+            (error, doc["job_id"], doc["index"]),
+        )
+        return self._finish_job(doc["job_id"])
+
+    def _finish_job(self, job_id: str) -> bool:
+        # True exactly once: for the call that moves the job to a final status.
+        conn = self._conn()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM documents WHERE job_id = ? GROUP BY status", (job_id,)).fetchall())
+        now = time.time()
+        if counts.get("queued") or counts.get("running"):
+            conn.execute("UPDATE jobs SET updated = ? WHERE id = ?", (now, job_id))
+            return False
+        status = "completed" if counts.get("completed") else "failed"
+        return bool(conn.execute(
+            "UPDATE jobs SET status = ?, updated = ? WHERE id = ? AND status NOT IN ('completed', 'failed')",
+            (status, now, job_id),
+        ).rowcount)
+
+    def set_webhook_status(self, job_id: str, status: str) -> None:
+        self._conn().execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (status, job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        job = conn.execute(
+            "SELECT status, created, updated, options, webhook_url, webhook_status FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if job is None:
+            return None
+        documents = [
+            {"index": idx, "name": name, "kind": kind, "status": status, "error": error, "folder_name": folder, "parcels": parcels}
+            for idx, name, kind, status, error, folder, parcels in conn.execute(
+                "SELECT idx, name, kind, status, error, folder_name, parcels FROM documents WHERE job_id = ? ORDER BY idx", (job_id,)
+            )
+        ]
+        progress = {"total": len(documents)}
+        for status in ("queued", "running", "completed", "failed"):
+            progress[status] = sum(1 for d in documents if d["status"] == status)
+        return {
+            "job_id": job_id,
+            "status": job[0],
+            "created": job[1],
+            "updated": job[2],
+            "label": json.loads(job[3]).get("label"),
+            "progress": progress,
+            "webhook_url": job[4],
+            "webhook_status": job[5],
+            "documents": documents,
+        }
+
+    def options(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT options FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def document_kmz(self, job_id: str, index: int) -> Optional[Tuple[str, bytes]]:
+        row = self._conn().execute(
+            "SELECT folder_name, kmz FROM documents WHERE job_id = ? AND idx = ? AND status = 'completed'", (job_id, index)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def results(self, job_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        return [
+            (folder, json.loads(result))
+            for folder, result in self._conn().execute(
+                "SELECT folder_name, result FROM documents WHERE job_id = ? AND status = 'completed' ORDER BY idx", (job_id,)
+            )
+        ]
+
+    def purge(self, older_than: float = JOB_TTL) -> int:
+        conn = self._conn()
+        cutoff = time.time() - older_than
+        conn.execute("BEGIN IMMEDIATE")
+        expired = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE updated < ?", (cutoff,))]
+        for job_id in expired:
+            conn.execute("DELETE FROM documents WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        conn.execute("COMMIT")
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        return {
+            "path": self.path,
+            "jobs": dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()),
+            "documents": dict(conn.execute("SELECT status, COUNT(*) FROM documents GROUP BY status").fetchall()),
+        }
+
+class JobRunner:
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = max(0, workers)
+        self._process: Optional[Callable[[Dict[str, Any]], Awaitable[DocumentResult]]] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._active = 0
+        self._errors = 0
+
+    def start(self, process: Callable[[Dict[str, Any]], Awaitable[DocumentResult]]) -> None:
+        self._process = process
+        self._wake = asyncio.Event()
+        self.store.purge()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    def notify(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _worker(self) -> None:
+        failures = 0
+        while True:
+            try:
+                await self._run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # e.g. "database is locked": keep the worker alive and back off.
+                failures += 1
+                self._errors += 1
+                logger.exception("Job worker iteration failed")
+                await asyncio.sleep(JOB_POLL_INTERVAL + backoff_delay(failures))
+            else:
+                failures = 0
+
+    async def _run_once(self) -> None:
+        # Store calls run in a thread: they write blobs and can wait on SQLite locks.
+        self._wake.clear()
+        doc = await asyncio.to_thread(self.store.claim)
+        if doc is None:
+            try:
+                await asyncio.wait_for(self._wake.wait(), JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            return
+        self._active += 1
+        heartbeat = asyncio.create_task(self._heartbeat(doc))
+        # Each document gets its own MapServer lookup budget.
+        token = set_deadline()
+        try:
+            try:
+                result = await self._process(doc)
+            except asyncio.CancelledError:
+                self.store.release(doc)
+                raise
+            except Exception as exc:
+                error = str(getattr(exc, "detail", None) or exc) or type(exc).__name__
+                finished = await asyncio.to_thread(self.store.fail, doc, error)
+            else:
+                finished = await asyncio.to_thread(self.store.complete, doc, result)
+        finally:
+            heartbeat.cancel()
+            reset_deadline(token)
+            self._active -= 1
+        if finished:
+            await self._deliver_webhook(doc["job_id"])
+
+    async def _heartbeat(self, doc: Dict[str, Any]) -> None:
+        # Keeps a long-running document from being taken for a dead worker's.
+        while True:
+            await asyncio.sleep(JOB_STALE_AFTER / 3)
+            try:
+                await asyncio.to_thread(self.store.heartbeat, doc)
+            except Exception:
+                logger.warning("Job heartbeat failed for %s/%s", doc["job_id"], doc["index"], exc_info=True)
+
+    async def _deliver_webhook(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if not job or not job["webhook_url"]:
+            return
+        payload = {key: value for key, value in job.items() if key not in ("webhook_url", "webhook_status")}
+        try:
+            address = await check_webhook_url(job["webhook_url"])
+        except ValueError as exc:
+            await asyncio.to_thread(self.store.set_webhook_status, job_id, f"rejected: {exc}")
+            return
+        url, headers, extensions = _pinned_request(job["webhook_url"], address)
+        status = "failed"
+        async with httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT) as client:
+            for attempt in range(max(1, WEBHOOK_ATTEMPTS)):
+                try:
+                    response = await client.post(url, json=payload, headers=headers, extensions=extensions)
+                    if response.status_code < 400:
+                        status = "delivered"
+                        break
+                    status = f"failed: HTTP {response.status_code}"
+                except httpx.HTTPError as exc:
+                    status = f"failed: {type(exc).__name__}"
+                if attempt + 1 < WEBHOOK_ATTEMPTS:
+                    await asyncio.sleep(backoff_delay(attempt))
+        await asyncio.to_thread(self.store.set_webhook_status, job_id, status)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": len(self._tasks), "active": self._active, "errors": self._errors, **self.store.stats()}
+
+job_store = JobStore(JOBS_DB)
+job_runner = JobRunner(job_store)
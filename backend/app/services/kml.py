@@ -0,0 +1,137 @@
+import time, zipfile
+from typing import Iterable, List, Optional, Sequence
+from xml.sax.saxutils import escape
+from shapely.geometry import Polygon
+
+KML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">\n'
+    "<Document>\n"
+)
+KML_FOOTER = "</Document>\n</kml>\n"
+
+def kml_color(hex_rgb: str, alpha: int) -> str:
+    # KML colours are aabbggrr
+    rgb = hex_rgb.lstrip("#")
+    return f"{alpha:02x}{rgb[4:6]}{rgb[2:4]}{rgb[0:2]}".lower()
+
+def style_xml(fill_rgb: str, fill_alpha: int, line_rgb: str, line_width: float, style_id: Optional[str] = None) -> str:
+    id_attr = f' id="{escape(style_id)}"' if style_id else ""
+    return (
+        f"<Style{id_attr}>"
+        f"<LineStyle><color>{kml_color(line_rgb, 255)}</color><width>{line_width:g}</width></LineStyle>"
+        f"<PolyStyle><color>{kml_color(fill_rgb, fill_alpha)}</color><fill>1</fill><outline>1</outline></PolyStyle>"
+        "</Style>"
+    )
+
+def _num(value: float, precision: Optional[int] = None) -> str:
+    value = float(value)
+    if precision is None:
+        return repr(value)
+    # + 0.0 folds -0.0 into 0.0
+    return repr(round(value, precision) + 0.0)
+
+def _coords(ring: Iterable[Sequence[float]], precision: Optional[int] = None) -> str:
+    points = [f"{_num(c[0], precision)},{_num(c[1], precision)},0.0" for c in ring]
+    if precision is not None:
+        # Quantising can collapse neighbouring vertices; drop the repeats.
+        deduped = [p for i, p in enumerate(points) if i == 0 or p != points[i - 1]]
+        if len(deduped) >= 4:
+            points = deduped
+    return " ".join(points)
+
+def polygon_xml(poly: Polygon, precision: Optional[int] = None) -> str:
+    parts = [
+        "<Polygon><outerBoundaryIs><LinearRing><coordinates>",
+        _coords(poly.exterior.coords, precision),
+        "</coordinates></LinearRing></outerBoundaryIs>",
+    ]
+    for interior in poly.interiors:
+        parts.append("<innerBoundaryIs><LinearRing><coordinates>")
+        parts.append(_coords(interior.coords, precision))
+        parts.append("</coordinates></LinearRing></innerBoundaryIs>")
+    parts.append("</Polygon>")
+    return "".join(parts)
+
+def placemark_xml(name: str, description: str, geometry_xml: str, style_url: Optional[str] = None) -> str:
+    parts = [f"<Placemark><name>{escape(name)}</name>"]
+    if description:
+        parts.append(f"<description>{escape(description)}</description>")
+    if style_url:
+        parts.append(f"<styleUrl>#{escape(style_url)}</styleUrl>")
+    parts.append(geometry_xml)
+    parts.append("</Placemark>\n")
+    return "".join(parts)
+
+def polygons_xml(polygons: List[Polygon], precision: Optional[int] = None) -> str:
+    if len(polygons) == 1:
+        return polygon_xml(polygons[0], precision)
+    return "<MultiGeometry>" + "".join(polygon_xml(poly, precision) for poly in polygons) + "</MultiGeometry>"
+
+def point_xml(x: float, y: float, precision: Optional[int] = None) -> str:
+    return f"<Point><coordinates>{_num(x, precision)},{_num(y, precision)},0.0</coordinates></Point>"
+
+def folder_open(name: str) -> str:
+    return f"<Folder><name>{escape(name)}</name>\n"
+
+FOLDER_CLOSE = "</Folder>\n"
+
+class _ChunkSink:
+    # Write-only, non-seekable target: zipfile falls back to data descriptors.
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class KmzStream:
+    # Incrementally deflates doc.kml into a zip; drain() hands back whatever
+    # compressed bytes are ready so they can be sent while the rest is built.
+    def __init__(self, buffer_size: int = 64 * 1024):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, "w", zipfile.ZIP_DEFLATED)
+        self._entry = self._zip.open("doc.kml", "w")
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._buffer_size = buffer_size
+        # Time spent encoding and deflating, for the "zip" stage metric.
+        self.zip_seconds = 0.0
+
+    def write(self, text: str) -> None:
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= self._buffer_size:
+            self._flush_pending()
+
+    def _flush_pending(self) -> None:
+        if self._pending:
+            start = time.perf_counter()
+            self._entry.write("".join(self._pending).encode("utf-8"))
+            self.zip_seconds += time.perf_counter() - start
+            self._pending.clear()
+            self._pending_size = 0
+
+    def drain(self) -> bytes:
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._flush_pending()
+        start = time.perf_counter()
+        self._entry.close()
+        self._zip.close()
+        self.zip_seconds += time.perf_counter() - start
+        return self._sink.drain()
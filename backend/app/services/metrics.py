@@ -0,0 +1,177 @@
+import time, threading, functools
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from app.services.cache import env_flag
+
+# In-process metrics in the Prometheus text format. Every uvicorn worker keeps
+# its own registry; scrape each worker (or run one) for complete numbers.
+METRICS_ENABLED = env_flag("QLD_METRICS")
+PREFIX = "qld_"
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+T = TypeVar("T")
+Labels = Tuple[Tuple[str, str], ...]
+# (name, type, help, [(labels, value)]) produced at scrape time.
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: Iterable[Tuple[str, Any]]) -> str:
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None, buckets: Sequence[float] = SECONDS_BUCKETS) -> None:
+        key = _labels(labels or {})
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def incr(self, name: str, amount: float = 1, labels: Optional[Dict[str, Any]] = None) -> None:
+        key = _labels(labels or {})
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def collector(self, fn: Callable[[], Iterable[Sample]]) -> Callable[[], Iterable[Sample]]:
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def header(name: str, kind: str, text: Optional[str] = None) -> None:
+            text = text or self._help.get(name)
+            if text:
+                lines.append(f"# HELP {PREFIX}{name} {text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: (h.buckets, list(h.counts), h.total, h.count) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+        for name in sorted(counters):
+            header(name, "counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{PREFIX}{name}{_format_labels(key)} {_format_value(value)}")
+        for name in sorted(histograms):
+            header(name, "histogram")
+            for key, (buckets, counts, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{PREFIX}{name}_count{_format_labels(key)} {count}")
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception:
+                continue
+            for name, kind, text, values in samples:
+                header(name, kind, text)
+                for labels, value in values:
+                    lines.append(f"{PREFIX}{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+registry.describe("stage_duration_seconds", "Time spent in each processing stage.")
+
+# Stage hook: every timed stage goes through record_stage, so per-request
+# consumers (e.g. tracing) can subscribe without touching the call sites.
+_stage_hooks: List[Callable[[str, float, Dict[str, Any]], None]] = []
+
+def add_stage_hook(hook: Callable[[str, float, Dict[str, Any]], None]) -> None:
+    _stage_hooks.append(hook)
+
+def record_stage(stage: str, seconds: float, **labels: Any) -> None:
+    if METRICS_ENABLED:
+        registry.observe("stage_duration_seconds", seconds, {"stage": stage, **labels})
+    for hook in _stage_hooks:
+        hook(stage, seconds, labels)
+
+@contextmanager
+def timed_stage(stage: str, **labels: Any) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, **labels)
+
+def timed(stage: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    def decorate(fn: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_stage(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def timed_iter(stage: str, iterator: Iterable[T]) -> Iterator[T]:
+    # Time spent producing items only, not time the consumer holds each one.
+    iterator = iter(iterator)
+    spent = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                spent += time.perf_counter() - start
+            yield item
+    finally:
+        record_stage(stage, spent)
+
+def observe_count(name: str, value: float, **labels: Any) -> None:
+    if METRICS_ENABLED:
+        registry.observe(name, value, labels, buckets=COUNT_BUCKETS)
+
+def incr(name: str, amount: float = 1, **labels: Any) -> None:
+    if METRICS_ENABLED:
+        registry.incr(name, amount, labels)
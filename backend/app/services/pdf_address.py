@@ -1,85 +1,218 @@
 # (same as before, shortened for brevity in this template)
-import io, re
-from typing import List, Optional, Dict, Any, Tuple
-from pdfminer.high_level import extract_text as pdfminer_extract
+import io, os, re, time, hashlib, tempfile, threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from typing import List, Optional, Dict, Any, Tuple, Iterator, Iterable, Deque
 from pdfminer.pdfpage import PDFPage
-from pdf2image import convert_from_bytes
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdftypes import resolve1
+from pdf2image import convert_from_path, pdfinfo_from_bytes
 import pytesseract
+from app.services.cache import SqliteCache, MISSING, env_flag
+from app.services.metrics import timed_iter, record_stage, incr
+from app.services import tracing
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+OCR_DPI = int(os.getenv("PDF_OCR_DPI", "250"))
+OCR_WORKERS = int(os.getenv("PDF_OCR_WORKERS", str(os.cpu_count() or 1)))
+# Bump when extraction or parsing output changes so cached insights are not reused.
+EXTRACTOR_VERSION = "2"
+
+insights_cache = SqliteCache(
+    "pdf_insights",
+    ttl=float(os.getenv("PDF_INSIGHTS_CACHE_TTL", str(30 * 24 * 3600))),
+    max_entries=int(os.getenv("PDF_INSIGHTS_CACHE_MAX_ENTRIES", "2000")),
+    max_bytes=int(os.getenv("PDF_INSIGHTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    enabled=env_flag("PDF_INSIGHTS_CACHE"),
+)
+
+def _iter_pdfminer_page_texts(pdf_bytes: bytes) -> Iterator[str]:
+    # One parse of the document: pages are walked once with a shared resource
+    # manager (font/cmap cache) and layout pipeline, yielding text per page.
+    rsrcmgr = PDFResourceManager(caching=True)
+    output = io.StringIO()
+    laparams = LAParams()
+
+    def new_pipeline() -> Tuple[TextConverter, PDFPageInterpreter]:
+        device = TextConverter(rsrcmgr, output, codec="utf-8", laparams=laparams)
+        return device, PDFPageInterpreter(rsrcmgr, device)
+
+    device, interpreter = new_pipeline()
     try:
-        txt = pdfminer_extract(io.BytesIO(pdf_bytes))
-        if txt and len(txt.strip()) > 40: return txt
-    except Exception: pass
+        with io.BytesIO(pdf_bytes) as buffer:
+            for page in PDFPage.get_pages(buffer):
+                try:
+                    interpreter.process_page(page)
+                    text = output.getvalue()
+                except Exception:
+                    # A failed page can leave the layout analyser mid-figure; start clean.
+                    device.close()
+                    device, interpreter = new_pipeline()
+                    text = ""
+                output.seek(0)
+                output.truncate(0)
+                yield text
+    finally:
+        device.close()
+
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+_ocr_pool_lock = threading.Lock()
+
+def _ocr_executor() -> Optional[ProcessPoolExecutor]:
+    global _ocr_pool
+    if OCR_WORKERS <= 1:
+        return None
+    if _ocr_pool is None:
+        with _ocr_pool_lock:
+            if _ocr_pool is None:
+                # spawn: the API process is multi-threaded, so don't fork it.
+                _ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _ocr_pool
+
+def close_ocr_executor() -> None:
+    global _ocr_pool
+    with _ocr_pool_lock:
+        pool, _ocr_pool = _ocr_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _ocr_single_page(task: Tuple[str, int, int]) -> Optional[str]:
+    # Runs in a worker process: rasterise exactly one page, OCR it, drop the image.
+    # None when rasterising or OCR failed, as opposed to "" for a blank page.
+    path, page_number, dpi = task
     try:
-        images = convert_from_bytes(pdf_bytes, dpi=250)
-        return "\n".join([pytesseract.image_to_string(img) for img in images])
+        images = convert_from_path(path, dpi=dpi, first_page=page_number, last_page=page_number)
     except Exception:
-        return ""
+        return None
+    try:
+        return "\n".join(pytesseract.image_to_string(image) for image in images)
+    except Exception:
+        return None
+    finally:
+        for image in images:
+            image.close()
 
-def _pdfminer_page_texts(pdf_bytes: bytes) -> List[str]:
-    pages: List[str] = []
+def _pdf_page_count(pdf_bytes: bytes) -> int:
     try:
-        with io.BytesIO(pdf_bytes) as buffer:
-            page_numbers = list(enumerate(PDFPage.get_pages(buffer), start=1))
-        if not page_numbers:
-            return pages
-        for index, _ in page_numbers:
-            try:
-                text = pdfminer_extract(io.BytesIO(pdf_bytes), page_numbers=[index - 1])
-            except Exception:
-                text = ""
-            pages.append(text or "")
+        return int(pdfinfo_from_bytes(pdf_bytes).get("Pages", 0))
     except Exception:
-        return []
-    return pages
+        return 0
 
-def _ocr_page_texts(pdf_bytes: bytes) -> List[str]:
+def _page_texts_or_blank(pdf_bytes: bytes) -> Iterator[Tuple[str, str]]:
+    # (source, text) per page. If pdfminer can't read the file, the remaining
+    # pages (by pdfinfo's count) come back blank so they get OCR'd.
+    done = 0
+    texts: Iterable[str] = _iter_pdfminer_page_texts(pdf_bytes)
+    trace = tracing.current()
+    if trace is not None:
+        texts = tracing.timed_pages(texts, "pdfminer", trace)
     try:
-        images = convert_from_bytes(pdf_bytes, dpi=250)
+        for text in timed_iter("pdfminer_page_texts", texts):
+            done += 1
+            yield "pdfminer", text
+        return
     except Exception:
-        return []
-    ocr_texts: List[str] = []
-    for image in images:
-        try:
-            ocr_texts.append(pytesseract.image_to_string(image))
-        except Exception:
-            ocr_texts.append("")
-    return ocr_texts
-
-def extract_pdf_pages(pdf_bytes: bytes) -> List[Dict[str, Any]]:
-    pdfminer_pages = _pdfminer_page_texts(pdf_bytes)
-    pages_out: List[Dict[str, Any]] = []
-    has_useful_pdfminer = any(txt.strip() for txt in pdfminer_pages)
-
-    if pdfminer_pages:
-        pages_out = [
-            {"page_number": idx + 1, "text": txt, "source": "pdfminer"}
-            for idx, txt in enumerate(pdfminer_pages)
-        ]
-
-    if not pages_out or not has_useful_pdfminer:
-        ocr_texts = _ocr_page_texts(pdf_bytes)
-        if ocr_texts:
-            pages_out = [
-                {"page_number": idx + 1, "text": txt, "source": "ocr"}
-                for idx, txt in enumerate(ocr_texts)
-            ]
-            return pages_out
-
-    # Fill blank pdfminer pages with OCR if available
-    if pages_out:
-        missing_indexes = [idx for idx, page in enumerate(pages_out) if not page["text"].strip()]
-        if missing_indexes:
-            ocr_texts = _ocr_page_texts(pdf_bytes)
-            for idx in missing_indexes:
-                if idx < len(ocr_texts) and ocr_texts[idx].strip():
-                    pages_out[idx] = {
-                        "page_number": idx + 1,
-                        "text": ocr_texts[idx],
-                        "source": "ocr",
-                    }
-    return pages_out
+        pass
+    for _ in range(done, _pdf_page_count(pdf_bytes)):
+        yield "ocr", ""
+
+def iter_pdf_pages(pdf_bytes: bytes, max_pages: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    # Pages in order, each as soon as it's available. Pages without a text layer
+    # are OCR'd in the background (up to OCR_WORKERS ahead) while pdfminer moves
+    # on, so a scanned page only blocks once the consumer reaches it.
+    source_pages = _page_texts_or_blank(pdf_bytes)
+    pool = _ocr_executor()
+    lookahead = max(2, 2 * OCR_WORKERS)
+    trace = tracing.current()
+    pending: Deque[Dict[str, Any]] = deque()
+    exhausted = False
+    next_number = 1
+    path: Optional[str] = None
+    ocr_wait = 0.0
+
+    def ocr_task(number: int) -> Tuple[str, int, int]:
+        nonlocal path
+        if path is None:
+            # Workers read pages from a temp file instead of each receiving the whole PDF.
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                tmp.write(pdf_bytes)
+                path = tmp.name
+        return (path, number, OCR_DPI)
+
+    def pull() -> None:
+        nonlocal exhausted, next_number
+        if max_pages and next_number > max_pages:
+            exhausted = True
+            return
+        item = next(source_pages, None)
+        if item is None:
+            exhausted = True
+            return
+        source, text = item
+        entry: Dict[str, Any] = {"page_number": next_number, "text": text, "source": source, "future": None}
+        if not text.strip() and pool is not None:
+            entry["submitted"] = time.perf_counter()
+            entry["future"] = pool.submit(_ocr_single_page, ocr_task(next_number))
+            entry["future"].add_done_callback(lambda _f, e=entry: e.setdefault("finished", time.perf_counter()))
+        pending.append(entry)
+        next_number += 1
+
+    def ready(entry: Dict[str, Any]) -> bool:
+        return bool(entry["text"].strip()) or (entry["future"] is not None and entry["future"].done())
+
+    try:
+        while True:
+            while not exhausted and len(pending) < lookahead and (not pending or not ready(pending[0])):
+                pull()
+            if not pending:
+                return
+            entry = pending.popleft()
+            number, text, source = entry["page_number"], entry["text"], entry["source"]
+            failed = False
+            if not text.strip():
+                start = time.perf_counter()
+                ocr_text: Optional[str] = None
+                attempted = False
+                if entry["future"] is not None:
+                    try:
+                        ocr_text, attempted = entry["future"].result(), True
+                    except BrokenProcessPool:
+                        close_ocr_executor()
+                        pool = None
+                if not attempted:
+                    ocr_text = _ocr_single_page(ocr_task(number))
+                    entry["finished"] = time.perf_counter()
+                ocr_wait += time.perf_counter() - start
+                if ocr_text is None:
+                    # Flagged so the result isn't cached as if the page were blank.
+                    incr("pdf_ocr_failures_total")
+                    failed, ocr_text = True, ""
+                if trace is not None:
+                    trace.add_page(number, "ocr", entry["finished"] - entry.get("submitted", start), len(ocr_text))
+                if ocr_text.strip():
+                    text, source = ocr_text, "ocr"
+            page: Dict[str, Any] = {"page_number": number, "text": text, "source": source}
+            if failed:
+                page["ocr_failed"] = True
+            yield page
+    finally:
+        for entry in pending:
+            if entry["future"] is not None:
+                entry["future"].cancel()
+        source_pages.close()
+        if path is not None:
+            os.unlink(path)
+        if ocr_wait:
+            record_stage("ocr_page_texts", ocr_wait)
+
+def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+    # Whole-document text; pages without a text layer are OCR'd.
+    return "\n".join(page["text"] for page in iter_pdf_pages(pdf_bytes))
 
 def _address_key(addr: Dict[str, Any]) -> Tuple:
     return (
@@ -93,8 +226,83 @@ def _address_key(addr: Dict[str, Any]) -> Tuple:
         addr.get("postcode") or "",
     )
 
+_LOTPLAN_PATTERN = re.compile(
+    r"(?:(?:LOT|L)\s*(\d+[A-Z]?)(?:\s*ON)?)\s*(?:[-/\\]|\s)+([A-Z]{1,4}\d+)",
+    re.IGNORECASE,
+)
+_LOTPLAN_SLASH_PATTERN = re.compile(
+    r"(\d+[A-Z]?)\s*/\s*([A-Z]{1,4}\d+)",
+    re.IGNORECASE,
+)
+_ADDRESS_PATTERN = re.compile(
+    r'(?:^"?(?P<prop>[^",]+?)"?\s*,?\s+)?'
+    r'(?:(?P<number>\d{1,5}[A-Z]?)\s+)?'
+    r'(?P<street>[A-Za-z0-9 .\'\-]+?)\s+'
+    r'(?P<suffix>Road|Rd|Street|St|Avenue|Ave|Highway|Hwy|Drive|Dr|Court|Ct|Place|Pl|Boulevard|Blvd|Way|Lane|Ln|Crescent|Cres|Terrace|Tce|Close|Cl)?'
+    r'\s*,\s*(?P<suburb>[A-Za-z ]+)\s*(?:,\s*|\s+)(?P<state>QLD|NSW|VIC|SA|WA|TAS|NT|ACT)\b'
+    r'(?:\s+(?P<pcode>\d{4}))?\s*$',
+    re.I,
+)
+# Every address match ends in "<sep><STATE>[ postcode]"; lines without that tail
+# (most of a document) skip the backtracking-heavy full pattern.
+_ADDRESS_TAIL = re.compile(r"(?:,\s*|\s+)(?:QLD|NSW|VIC|SA|WA|TAS|NT|ACT)\b(?:\s+\d{4})?\s*$", re.I)
+_PROPERTY_NUMBER = re.compile(r"\d+[A-Z]?")
+MAX_ADDRESSES_PER_TEXT = 10
+
+def parse_lotplan_from_text(text: str) -> List[str]:
+    found: Dict[str, None] = {}
+    for pattern in (_LOTPLAN_PATTERN, _LOTPLAN_SLASH_PATTERN):
+        for m in pattern.finditer(text):
+            lot = (m.group(1) or "").upper()
+            plan = (m.group(2) or "").upper()
+            if lot and plan:
+                found.setdefault(f"{lot} {plan}")
+    return list(found)
+
+def _clean_line(line: str) -> str:
+    return line.replace(" – ", " - ").replace("—", "-")
+
+def _parse_address_line(line: str) -> Optional[Dict[str, Any]]:
+    # line is already stripped and non-empty.
+    cleaned = _clean_line(line)
+    if "," not in cleaned or not _ADDRESS_TAIL.search(cleaned):
+        return None
+    m = _ADDRESS_PATTERN.search(cleaned)
+    if not m:
+        return None
+    prop = (m.group("prop") or "").strip(' "\'')
+    num = m.group("number")
+    if not num and prop and _PROPERTY_NUMBER.fullmatch(prop):
+        num = prop
+        prop = ""
+    street = (m.group("street") or "").replace(" - ", "-").replace(" -", "-").replace("- ", "-")
+    pcode = m.group("pcode")
+    return {
+        "original": line,
+        "property_name": prop,
+        "house_number": num.strip().upper() if num else None,
+        "street": street.upper(),
+        "suffix": (m.group("suffix") or "").upper(),
+        "suburb": (m.group("suburb") or "").upper(),
+        "state": (m.group("state") or "").upper(),
+        "postcode": int(pcode) if pcode else None,
+    }
+
+def parse_au_address_structured(text: str) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    for ln in text.splitlines():
+        ln = ln.strip()
+        if not ln:
+            continue
+        addr = _parse_address_line(ln)
+        if addr:
+            results.append(addr)
+            if len(results) >= MAX_ADDRESSES_PER_TEXT:
+                break
+    return results
+
 def parse_address_and_lotplans(line: str) -> Optional[Dict[str, Any]]:
-    cleaned = line.replace(" – ", " - ").replace("—", "-")
+    cleaned = _clean_line(line)
     if " - " not in cleaned:
         return None
     addr_part, lot_part = cleaned.split(" - ", 1)
@@ -111,178 +319,141 @@ def parse_address_and_lotplans(line: str) -> Optional[Dict[str, Any]]:
         "lotplans": lot_tokens,
     }
 
-def extract_pdf_insights(pdf_bytes: bytes) -> Dict[str, Any]:
-    pages = extract_pdf_pages(pdf_bytes)
-    lotplan_records: List[Dict[str, Any]] = []
-    address_records: List[Dict[str, Any]] = []
-    seen_lotplans: Dict[str, Dict[str, Any]] = {}
-    seen_addresses: Dict[Tuple, Dict[str, Any]] = {}
-    groups: List[Dict[str, Any]] = []
-    seen_groups: set[Tuple[str, Tuple[str, ...]]] = set()
-
-    for page in pages:
-        text = page.get("text", "")
-        if not text.strip():
-            continue
-        page_number = page.get("page_number")
-        source = page.get("source")
+class _InsightScanner:
+    # Collects address–lot/plan groups, lot/plans and addresses from one walk over
+    # each page's lines, keeping the first occurrence of each.
+    def __init__(self):
+        self.lotplans: Dict[str, Dict[str, Any]] = {}
+        self.addresses: Dict[Tuple, Dict[str, Any]] = {}
+        self.groups: List[Dict[str, Any]] = []
+        self._group_keys: set[Tuple[str, Tuple[str, ...]]] = set()
 
-        for line in text.splitlines():
-            grp = parse_address_and_lotplans(line.strip())
-            if grp:
-                lots_tuple = tuple(grp["lotplans"])
-                key = (grp["raw_address"].upper(), lots_tuple)
-                if key not in seen_groups:
-                    groups.append({
-                        **grp,
-                        "page_number": page_number,
-                        "extraction_source": source,
-                    })
-                    seen_groups.add(key)
+    def _group(self, line: str, page_number: Any, source: Any) -> None:
+        grp = parse_address_and_lotplans(line)
+        if grp:
+            key = (grp["raw_address"].upper(), tuple(grp["lotplans"]))
+            if key not in self._group_keys:
+                self.groups.append({**grp, "page_number": page_number, "extraction_source": source})
+                self._group_keys.add(key)
 
+    def _lotplans(self, text: str, page_number: Any, source: Any) -> None:
         for lp in parse_lotplan_from_text(text):
             lp_norm = lp.upper()
-            if lp_norm not in seen_lotplans:
-                seen_lotplans[lp_norm] = {
-                    "lotplan": lp_norm,
-                    "page_number": page_number,
-                    "extraction_source": source,
-                }
-
-        for addr in parse_au_address_structured(text):
-            key = _address_key(addr)
-            if key not in seen_addresses:
-                seen_addresses[key] = {
-                    "page_number": page_number,
-                    "extraction_source": source,
-                    "address": addr,
-                }
-
-    lotplan_records = list(seen_lotplans.values())
-    address_records = list(seen_addresses.values())
-
-    summary = {
-        "total_pages": len(pages),
-        "lotplans_found": len(lotplan_records),
-        "addresses_found": len(address_records),
-    }
+            if lp_norm not in self.lotplans:
+                self.lotplans[lp_norm] = {"lotplan": lp_norm, "page_number": page_number, "extraction_source": source}
 
-    return {
-        "summary": summary,
-        "pages": pages,
-        "lotplans": sorted(lotplan_records, key=lambda r: (r["page_number"], r["lotplan"])),
-        "addresses": sorted(address_records, key=lambda r: r["page_number"]),
-        "address_lotplan_groups": sorted(groups, key=lambda g: g["page_number"]),
-    }
+    def _address(self, addr: Dict[str, Any], page_number: Any, source: Any) -> None:
+        key = _address_key(addr)
+        if key not in self.addresses:
+            self.addresses[key] = {"page_number": page_number, "extraction_source": source, "address": addr}
 
-def extract_text_insights(text: str) -> Dict[str, Any]:
-    pages = [{"page_number": 1, "text": text or "", "source": "email"}]
-    lotplan_records: List[Dict[str, Any]] = []
-    address_records: List[Dict[str, Any]] = []
-    groups: List[Dict[str, Any]] = []
-    seen_lotplans: Dict[str, Dict[str, Any]] = {}
-    seen_addresses: Dict[Tuple, Dict[str, Any]] = {}
-    seen_groups: set[Tuple[str, Tuple[str, ...]]] = set()
-
-    lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
-    for idx, line in enumerate(lines, start=1):
-        grp = parse_address_and_lotplans(line)
-        if grp:
-            lots_tuple = tuple(grp["lotplans"])
-            key = (grp["raw_address"].upper(), lots_tuple)
-            if key not in seen_groups:
-                groups.append({
-                    **grp,
-                    "page_number": idx,
-                    "extraction_source": "email",
-                })
-                seen_groups.add(key)
-
-        for lp in parse_lotplan_from_text(line):
-            lp_norm = lp.upper()
-            if lp_norm not in seen_lotplans:
-                seen_lotplans[lp_norm] = {
-                    "lotplan": lp_norm,
-                    "page_number": idx,
-                    "extraction_source": "email",
-                }
-
-        for addr in parse_au_address_structured(line):
-            key = _address_key(addr)
-            if key not in seen_addresses:
-                seen_addresses[key] = {
-                    "page_number": idx,
-                    "extraction_source": "email",
-                    "address": addr,
-                }
+    def scan_page(self, text: str, page_number: Any, source: Any) -> None:
+        # Lot/plans are matched over the whole page, since "Lot 3\nRP1234" spans lines.
+        if not text.strip():
+            return
+        addresses = 0
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            self._group(line, page_number, source)
+            if addresses < MAX_ADDRESSES_PER_TEXT:
+                addr = _parse_address_line(line)
+                if addr:
+                    addresses += 1
+                    self._address(addr, page_number, source)
+        self._lotplans(text, page_number, source)
 
-    return {
-        "summary": {
-            "total_pages": 1,
-            "lotplans_found": len(seen_lotplans),
-            "addresses_found": len(seen_addresses),
-        },
-        "pages": pages,
-        "lotplans": sorted(seen_lotplans.values(), key=lambda r: (r["page_number"], r["lotplan"])),
-        "addresses": sorted(seen_addresses.values(), key=lambda r: r["page_number"]),
-        "address_lotplan_groups": sorted(groups, key=lambda g: g["page_number"]),
-    }
+    def scan_lines(self, text: str, source: Any) -> None:
+        # Free text (emails): each non-empty line counts as its own "page".
+        number = 0
+        for line in (text or "").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            number += 1
+            self._group(line, number, source)
+            self._lotplans(line, number, source)
+            addr = _parse_address_line(line)
+            if addr:
+                self._address(addr, number, source)
 
-_LOTPLAN_PATTERN = re.compile(
-    r"(?:(?:LOT|L)\s*(\d+[A-Z]?)(?:\s*ON)?)\s*(?:[-/\\]|\s)+([A-Z]{1,4}\d+)",
-    re.IGNORECASE,
-)
-_LOTPLAN_SLASH_PATTERN = re.compile(
-    r"(\d+[A-Z]?)\s*/\s*([A-Z]{1,4}\d+)",
-    re.IGNORECASE,
-)
+    def insights(self, pages: List[Dict[str, Any]], total_pages: int) -> Dict[str, Any]:
+        return {
+            "summary": {
+                "total_pages": total_pages,
+                "lotplans_found": len(self.lotplans),
+                "addresses_found": len(self.addresses),
+            },
+            "pages": pages,
+            "lotplans": sorted(self.lotplans.values(), key=lambda r: (r["page_number"], r["lotplan"])),
+            "addresses": sorted(self.addresses.values(), key=lambda r: r["page_number"]),
+            "address_lotplan_groups": sorted(self.groups, key=lambda g: g["page_number"]),
+        }
 
-def parse_lotplan_from_text(text: str) -> List[str]:
-    found: List[str] = []
-    for pattern in (_LOTPLAN_PATTERN, _LOTPLAN_SLASH_PATTERN):
-        for m in pattern.finditer(text):
-            lot = (m.group(1) or "").upper()
-            plan = (m.group(2) or "").upper()
-            if not lot or not plan:
-                continue
-            token = f"{lot} {plan}"
-            if token not in found:
-                found.append(token)
-    return found
+def _insights_cache_key(pdf_bytes: bytes, max_pages: Optional[int] = None, stop_after_matches: Optional[int] = None) -> str:
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    key = f"{digest}:v{EXTRACTOR_VERSION}:dpi{OCR_DPI}"
+    if max_pages or stop_after_matches:
+        key += f":pages{max_pages or 0}:matches{stop_after_matches or 0}"
+    return key
 
-def parse_au_address_structured(text: str) -> List[Dict[str, Any]]:
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    results = []
-    pat = re.compile(
-        r'(?:^"?(?P<prop>[^",]+?)"?\s*,?\s+)?'
-        r'(?:(?P<number>\d{1,5}[A-Z]?)\s+)?'
-        r'(?P<street>[A-Za-z0-9 .\'\-]+?)\s+'
-        r'(?P<suffix>Road|Rd|Street|St|Avenue|Ave|Highway|Hwy|Drive|Dr|Court|Ct|Place|Pl|Boulevard|Blvd|Way|Lane|Ln|Crescent|Cres|Terrace|Tce|Close|Cl)?'
-        r'\s*,\s*(?P<suburb>[A-Za-z ]+)\s*(?:,\s*|\s+)(?P<state>QLD|NSW|VIC|SA|WA|TAS|NT|ACT)\b'
-        r'(?:\s+(?P<pcode>\d{4}))?\s*$',
-        re.I,
-    )
-    for ln in lines:
-        m = pat.search(ln.replace(" – ", " - ").replace("—", "-"))
-        if not m: continue
-        prop = (m.group("prop") or "").strip(' "\'')
-        num = m.group("number")
-        if not num and prop and re.fullmatch(r"\d+[A-Z]?", prop):
-            num = prop
-            prop = ""
-        street = (m.group("street") or "").replace(" - ", "-").replace(" -", "-").replace("- ", "-")
-        suffix = (m.group("suffix") or "").upper()
-        suburb = (m.group("suburb") or "").upper()
-        state = (m.group("state") or "").upper()
-        pcode = m.group("pcode")
-        results.append({
-            "original": ln,
-            "property_name": prop,
-            "house_number": num.strip().upper() if num else None,
-            "street": street.upper(),
-            "suffix": suffix,
-            "suburb": suburb,
-            "state": state,
-            "postcode": int(pcode) if pcode else None
-        })
-    return results[:10]
+def _document_page_count(pdf_bytes: bytes) -> int:
+    # From the page tree, without interpreting any page.
+    try:
+        document = PDFDocument(PDFParser(io.BytesIO(pdf_bytes)))
+        return int(resolve1(resolve1(document.catalog["Pages"])["Count"]))
+    except Exception:
+        return _pdf_page_count(pdf_bytes)
+
+def iter_pdf_insights(pdf_bytes: bytes, max_pages: Optional[int] = None, stop_after_matches: Optional[int] = None) -> Iterator[Tuple[str, Any]]:
+    # Yields ("page", {"page_number", "source", "lotplans"}) as each page is parsed,
+    # with the lot/plans first seen on it, then ("insights", <full result>).
+    # Extraction stops after max_pages pages, or after the page on which the lot/plans
+    # plus addresses found reach stop_after_matches (e.g. once the schedule of lands
+    # has been read, skipping the appendices).
+    key = _insights_cache_key(pdf_bytes, max_pages, stop_after_matches)
+    cached = insights_cache.get(key)
+    trace = tracing.current()
+    if trace is not None:
+        trace.note("pdf_insights_cache", "hit" if cached is not MISSING else "miss")
+    if cached is not MISSING:
+        yield "insights", cached
+        return
+    scanner = _InsightScanner()
+    pages: List[Dict[str, Any]] = []
+    limited = False
+    stream = iter_pdf_pages(pdf_bytes, max_pages=max_pages)
+    try:
+        for page in stream:
+            incr("pdf_pages_total", source=page.get("source"))
+            pages.append(page)
+            seen_lotplans, seen_groups = len(scanner.lotplans), len(scanner.groups)
+            scanner.scan_page(page.get("text", ""), page.get("page_number"), page.get("source"))
+            found = list(scanner.lotplans)[seen_lotplans:]
+            found.extend(lp for group in scanner.groups[seen_groups:] for lp in group["lotplans"])
+            yield "page", {"page_number": page["page_number"], "source": page["source"], "lotplans": list(dict.fromkeys(found))}
+            if stop_after_matches and len(scanner.lotplans) + len(scanner.addresses) >= stop_after_matches:
+                limited = True
+                break
+        else:
+            limited = bool(max_pages) and len(pages) >= max_pages
+    finally:
+        stream.close()
+    insights = scanner.insights(pages, len(pages))
+    insights["summary"]["stopped_early"] = limited and len(pages) < _document_page_count(pdf_bytes)
+    if not any(page.get("ocr_failed") for page in pages):
+        # A page whose OCR failed would otherwise be cached as blank for the full TTL.
+        insights_cache.set(key, insights, ttl=insights_cache.ttl)
+    yield "insights", insights
+
+def extract_pdf_insights(pdf_bytes: bytes, max_pages: Optional[int] = None, stop_after_matches: Optional[int] = None) -> Dict[str, Any]:
+    for kind, value in iter_pdf_insights(pdf_bytes, max_pages=max_pages, stop_after_matches=stop_after_matches):
+        if kind == "insights":
+            return value
+    raise RuntimeError("PDF insight extraction produced no result")
+
+def extract_text_insights(text: str) -> Dict[str, Any]:
+    scanner = _InsightScanner()
+    scanner.scan_lines(text, "email")
+    return scanner.insights([{"page_number": 1, "text": text or "", "source": "email"}], 1)
@@ -0,0 +1,164 @@
+import os, time, random, threading
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+RETRY_ATTEMPTS = int(os.getenv("QLD_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("QLD_RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.getenv("QLD_RETRY_MAX_DELAY", "4"))
+REQUEST_DEADLINE = float(os.getenv("QLD_REQUEST_DEADLINE", "45"))
+BREAKER_FAILURES = int(os.getenv("QLD_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("QLD_BREAKER_RESET", "30"))
+
+class UpstreamError(Exception):
+    retry_after: Optional[int] = None
+
+class CircuitOpen(UpstreamError):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable; failing fast.")
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+class DeadlineExceeded(UpstreamError):
+    def __init__(self):
+        super().__init__("Upstream lookups exceeded the request deadline.")
+
+def backoff_delay(attempt: int) -> float:
+    # "Full jitter" exponential backoff
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+class Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, int] = {}
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._values)
+
+class Deadline:
+    # The clock starts at the first upstream call, so time spent before any
+    # lookup (PDF extraction, OCR) doesn't eat into the lookup budget.
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._expires: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        with self._lock:
+            if self._expires is None:
+                self._expires = time.monotonic() + self.seconds
+            return self._expires - time.monotonic()
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("upstream_deadline", default=None)
+
+def set_deadline(seconds: Optional[float] = None):
+    seconds = REQUEST_DEADLINE if seconds is None else seconds
+    return _deadline.set(Deadline(seconds) if seconds > 0 else None)
+
+def reset_deadline(token) -> None:
+    _deadline.reset(token)
+
+def attempt_timeout(default: float) -> float:
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return min(default, remaining)
+
+def retry_sleep(attempt: int) -> Optional[float]:
+    # Backoff before the next attempt, or None when there's no time left for one.
+    delay = backoff_delay(attempt)
+    deadline = _deadline.get()
+    if deadline is not None and deadline.remaining() <= delay:
+        return None
+    return delay
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    def before_call(self) -> bool:
+        # True when this call is the half-open trial.
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout or self._trial:
+                raise CircuitOpen(self.name, max(0.0, self.reset_timeout - waited))
+            # Half-open: let a single trial request through.
+            self._trial = True
+            return True
+
+    def call(self) -> "BreakerCall":
+        return BreakerCall(self, self.before_call())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def record_abandoned(self, trial: bool) -> None:
+        # The call ended without a verdict (cancelled, out of time): free the
+        # trial slot so the next caller can probe the service.
+        if trial:
+            with self._lock:
+                self._trial = False
+
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._trial or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state(),
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+        }
+
+class BreakerCall:
+    # One logical call, retries included: records a single outcome, and
+    # releases the half-open trial if the call ends any other way.
+    def __init__(self, breaker: CircuitBreaker, trial: bool):
+        self.breaker = breaker
+        self.trial = trial
+        self.settled = False
+
+    def success(self) -> None:
+        self.settled = True
+        self.breaker.record_success()
+
+    def failure(self) -> None:
+        self.settled = True
+        self.breaker.record_failure()
+
+    def __enter__(self) -> "BreakerCall":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if not self.settled:
+            self.breaker.record_abandoned(self.trial)
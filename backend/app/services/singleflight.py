@@ -0,0 +1,99 @@
+import asyncio, threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+class _Abandoned(Exception):
+    # The leader was cancelled (or failed for reasons of its own); followers
+    # retry and one of them takes over.
+    pass
+
+class _Call:
+    __slots__ = ("future", "loop")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop]):
+        self.future: Future = Future()
+        self.loop = loop
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution and its result
+    # (or exception). Works across threads and coroutines: the in-flight call
+    # is a concurrent.futures.Future that threads block on and coroutines await.
+    # Exceptions of the "unshared" types describe the leader's own situation
+    # (e.g. its request deadline ran out), not the call: followers retry instead.
+    def __init__(self, unshared: Tuple[Type[Exception], ...] = ()):
+        self.unshared = unshared
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counts = {"leaders": 0, "shared": 0}
+
+    def _join(self, key: Hashable, loop: Optional[asyncio.AbstractEventLoop]) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._counts["shared"] += 1
+                return call, False
+            call = _Call(loop)
+            self._calls[key] = call
+            self._counts["leaders"] += 1
+            return call, True
+
+    def _finish(self, key: Hashable, call: _Call, result: Any = None, exc: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        if call.future.done():
+            return
+        if exc is not None:
+            shared = isinstance(exc, Exception) and not isinstance(exc, self.unshared)
+            call.future.set_exception(exc if shared else _Abandoned())
+        else:
+            call.future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        while True:
+            call, leader = self._join(key, None)
+            if leader:
+                break
+            if call.loop is not None and call.loop is running:
+                # Blocking here would stall the loop the leader is running on.
+                return fn()
+            try:
+                return call.future.result()
+            except _Abandoned:
+                continue
+        try:
+            result = fn()
+        except BaseException as exc:
+            self._finish(key, call, exc=exc)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        while True:
+            call, leader = self._join(key, loop)
+            if leader:
+                break
+            try:
+                # Shielded: a cancelled follower must not cancel the shared future.
+                return await asyncio.shield(asyncio.wrap_future(call.future))
+            except _Abandoned:
+                continue
+        try:
+            result = await fn()
+        except BaseException as exc:
+            self._finish(key, call, exc=exc)
+            raise
+        self._finish(key, call, result=result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counts, "in_flight": len(self._calls)}
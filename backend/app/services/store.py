@@ -0,0 +1,32 @@
+import os, sqlite3, threading
+from typing import Optional, Tuple
+
+class LocalStore:
+    # Thread-local connections to a SQLite store (cadastre, gazetteer, job
+    # queue); subclasses list their DDL in SCHEMA. By default a store is only
+    # used once its file exists.
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, path: Optional[str]):
+        self.path = path or ""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and os.path.exists(self.path)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with self._lock:
+                if not self._ready:
+                    for ddl in self.SCHEMA:
+                        conn.execute(ddl)
+                    self._ready = True
+            self._local.conn = conn
+        return conn
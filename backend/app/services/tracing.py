@@ -0,0 +1,143 @@
+import os, time, uuid, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from app.services.metrics import add_stage_hook
+
+# Per-request traces, enabled by the X-Debug-Timing header. Without it the
+# only cost at each instrumented point is one ContextVar lookup.
+DEBUG_TRACES_KEPT = int(os.getenv("QLD_DEBUG_TRACES", "100"))
+MAX_TRACE_EVENTS = 2000
+
+class Trace:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, List[float]] = {}
+        self.queries: List[Dict[str, Any]] = []
+        self.pages: List[Dict[str, Any]] = []
+        self.notes: Dict[str, Any] = {}
+        self.total_ms: Optional[float] = None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def add_stage(self, stage: str, seconds: float, labels: Dict[str, Any]) -> None:
+        name = "_".join([stage, *(str(value) for _, value in sorted(labels.items()))])
+        with self._lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += seconds * 1000
+            entry[1] += 1
+
+    def add_page(self, page_number: int, source: str, seconds: float, chars: int) -> None:
+        with self._lock:
+            if len(self.pages) < MAX_TRACE_EVENTS:
+                self.pages.append({"page": page_number, "source": source, "ms": round(seconds * 1000, 3), "chars": chars})
+
+    def note(self, key: str, value: Any) -> None:
+        with self._lock:
+            self.notes[key] = value
+
+    @contextmanager
+    def query(self, layer: str, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        entry: Dict[str, Any] = {
+            "layer": layer,
+            "where": params.get("where"),
+            "geometry": params.get("geometry"),
+            "offset": params.get("resultOffset"),
+            "count_only": bool(params.get("returnCountOnly")) or None,
+            "start_ms": round(self.elapsed_ms(), 3),
+        }
+        token = _query_entry.set(entry)
+        start = time.perf_counter()
+        try:
+            yield entry
+        except Exception as exc:
+            entry["error"] = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            _query_entry.reset(token)
+            entry["ms"] = round((time.perf_counter() - start) * 1000, 3)
+            # Without a byte count the response came from another caller's identical in-flight query.
+            entry.setdefault("shared", "bytes" not in entry and "error" not in entry)
+            with self._lock:
+                if len(self.queries) < MAX_TRACE_EVENTS:
+                    self.queries.append({key: value for key, value in entry.items() if value is not None})
+
+    def server_timing(self) -> str:
+        with self._lock:
+            stages = sorted(self.stages.items())
+        parts = [f'{name};dur={ms:.1f};desc="{count} call{"s" if count != 1 else ""}"' for name, (ms, count) in stages]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+    def to_json(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "method": self.method,
+                "path": self.path,
+                "total_ms": round(self.total_ms if self.total_ms is not None else self.elapsed_ms(), 3),
+                "complete": self.total_ms is not None,
+                "stages": {name: {"ms": round(ms, 3), "calls": count} for name, (ms, count) in sorted(self.stages.items())},
+                "queries": list(self.queries),
+                "pages": sorted(self.pages, key=lambda page: (page["page"], page["source"])),
+                "notes": dict(self.notes),
+            }
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("debug_trace", default=None)
+_query_entry: ContextVar[Optional[Dict[str, Any]]] = ContextVar("debug_trace_query", default=None)
+
+def current() -> Optional[Trace]:
+    return _trace.get()
+
+def start_trace(method: str, path: str):
+    trace = Trace(method, path)
+    return trace, _trace.set(trace)
+
+def end_trace(token) -> None:
+    _trace.reset(token)
+
+def record_response(status: Optional[int], nbytes: int, features: Optional[int]) -> None:
+    # Called by the upstream fetch that actually hit the network.
+    entry = _query_entry.get()
+    if entry is not None:
+        entry.update({"status": status, "bytes": nbytes, "features": features})
+
+def timed_pages(iterator: Iterable[str], source: str, trace: Trace) -> Iterator[str]:
+    start = time.perf_counter()
+    for number, text in enumerate(iterator, start=1):
+        now = time.perf_counter()
+        trace.add_page(number, source, now - start, len(text))
+        yield text
+        start = time.perf_counter()
+
+def _stage_hook(stage: str, seconds: float, labels: Dict[str, Any]) -> None:
+    trace = _trace.get()
+    if trace is not None:
+        trace.add_stage(stage, seconds, labels)
+
+add_stage_hook(_stage_hook)
+
+class TraceStore:
+    # The last N finished traces, for GET /admin/traces/{id}.
+    def __init__(self, size: int):
+        self.size = max(0, size)
+        self._lock = threading.Lock()
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces[trace.id] = trace
+            while len(self._traces) > self.size:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return self._traces.get(trace_id)
+
+trace_store = TraceStore(DEBUG_TRACES_KEPT)
@@ -0,0 +1,150 @@
+import os, asyncio, contextvars, functools, threading
+import multiprocessing
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+# CPU-heavy work (PDF extraction, KMZ generation) runs here instead of on the
+# event loop. "thread" keeps contextvars/metrics in-process (pdftoppm and
+# tesseract already run as subprocesses); "process" isolates pdfminer's GIL use.
+PDF_EXECUTOR_KIND = os.getenv("PDF_EXECUTOR_KIND", "thread").lower()
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_QUEUE_DEPTH = int(os.getenv("PDF_QUEUE_DEPTH", "8"))
+PDF_RETRY_AFTER = int(os.getenv("PDF_RETRY_AFTER", "30"))
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Server is busy processing other documents.")
+        self.retry_after = retry_after
+
+class BoundedExecutor:
+    def __init__(self, name: str, workers: int, queue_depth: int, kind: str = "thread", retry_after: int = 30):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.kind = kind
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+        self._pool: Optional[Executor] = None
+        self._stream_pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.kind == "process":
+                        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._pool
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull(self.retry_after)
+        with self._lock:
+            self._in_flight += 1
+        call = functools.partial(fn, *args, **kwargs)
+        try:
+            if self.kind != "process":
+                call = functools.partial(contextvars.copy_context().run, call)
+            future = self._executor().submit(call)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the work finishes, even if the request is cancelled.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def run_when_free(self, fn: Callable[..., Any], *args: Any, poll: float = 1.0, **kwargs: Any) -> Any:
+        # Background work waits for a slot instead of failing with QueueFull.
+        while True:
+            try:
+                return await self.run(fn, *args, **kwargs)
+            except QueueFull:
+                await asyncio.sleep(poll)
+
+    async def stream(self, fn: Callable[..., Iterator[Any]], *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        # Starts the generator up to its slot claim so QueueFull surfaces before any
+        # response is sent. The slot is held by the generator itself: one dropped
+        # before it is iterated (client gone) is closed by aclose() or the event
+        # loop's async-generator finaliser, which runs its finally.
+        stream = self._stream(fn, args, kwargs)
+        await stream.__anext__()
+        return stream
+
+    def _stream_executor(self) -> Executor:
+        # Generators can't cross a process boundary; process pools stream from threads.
+        if self.kind != "process":
+            return self._executor()
+        if self._stream_pool is None:
+            with self._lock:
+                if self._stream_pool is None:
+                    self._stream_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-stream")
+        return self._stream_pool
+
+    async def _stream(self, fn: Callable[..., Iterator[Any]], args: tuple, kwargs: dict) -> AsyncIterator[Any]:
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull(self.retry_after)
+        with self._lock:
+            self._in_flight += 1
+        pool = self._stream_executor()
+        context = contextvars.copy_context()
+        done = object()
+        created: Optional[Future] = None
+        step: Optional[Future] = None
+        try:
+            yield None  # slot claimed; consumed by stream()
+            created = step = pool.submit(context.run, functools.partial(fn, *args, **kwargs))
+            iterator = await asyncio.wrap_future(created)
+            while True:
+                step = pool.submit(context.run, next, iterator, done)
+                item = await asyncio.wrap_future(step)
+                if item is done:
+                    break
+                yield item
+        finally:
+            self._close_stream(created, step)
+
+    def _close_stream(self, created: Optional[Future], step: Optional[Future]) -> None:
+        # The worker may still be inside fn() or next() (a cancelled await doesn't
+        # stop it); once it returns, close the generator so pdfminer/OCR shut down,
+        # and only then free the slot.
+        def close(_future: Optional[Future] = None) -> None:
+            try:
+                if created is not None and not created.cancelled() and created.exception() is None:
+                    closer = getattr(created.result(), "close", None)
+                    if closer is not None:
+                        closer()
+            except Exception:
+                pass
+            finally:
+                self._release()
+
+        if step is None:
+            close()
+        else:
+            step.add_done_callback(close)
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pools = [self._pool, self._stream_pool]
+            self._pool = self._stream_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+pdf_executor = BoundedExecutor("pdf", PDF_WORKERS, PDF_QUEUE_DEPTH, kind=PDF_EXECUTOR_KIND, retry_after=PDF_RETRY_AFTER)
@@ -0,0 +1,34 @@
+# KMZ generation time and output size for synthetic parcel sets, with and
+# without simplification / coordinate quantisation.
+#   cd backend && python -m benchmarks.bench_kmz [parcels ...]
+import io, sys, time, zipfile
+from typing import List
+
+from app.services.arcgis import to_kmz
+from benchmarks.synthetic import parcel_features
+
+MODES = [
+    ("full", {}),
+    ("precision=7", {"precision": 7}),
+    ("simplify=1m", {"simplify_m": 1.0}),
+    ("simplify=1m,p=7", {"simplify_m": 1.0, "precision": 7}),
+]
+
+def main(sizes: List[int], repeat: int = 3) -> None:
+    print(f"{'parcels':>8} {'features':>9} {'mode':>16} {'seconds':>9} {'kmz bytes':>10} {'doc.kml bytes':>14}")
+    for size in sizes:
+        features = parcel_features(size)
+        half = len(features) // 2
+        grouped = {"Group A": features[:half], "Group B": features[half:]}
+        for label, options in MODES:
+            best = float("inf")
+            kmz = b""
+            for _ in range(repeat):
+                start = time.perf_counter()
+                kmz = to_kmz([], folder_name="bench", grouped_features=grouped, **options)
+                best = min(best, time.perf_counter() - start)
+            doc_size = len(zipfile.ZipFile(io.BytesIO(kmz)).read("doc.kml"))
+            print(f"{size:>8} {len(features):>9} {label:>16} {best:>9.3f} {len(kmz):>10} {doc_size:>14}")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 500])
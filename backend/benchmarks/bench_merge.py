@@ -0,0 +1,45 @@
+# Lot/plan merge micro-benchmark: per-feature shape()/unary_union/mapping (and
+# the writer's second shape()) versus the vectorised _merge_features_by_lotplan.
+#   cd backend && python -m benchmarks.bench_merge [parcels ...]
+import sys, time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from shapely.geometry import shape, mapping
+from shapely.ops import unary_union
+
+from app.services.arcgis import _merge_features_by_lotplan
+from benchmarks.synthetic import parcel_features
+
+def legacy_merge(features: List[Dict[str, Any]]) -> List[Any]:
+    grouped: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for feat in features:
+        grouped[feat["properties"]["lotplan"]].append(feat)
+    merged = []
+    for feats in grouped.values():
+        geoms = [shape(f["geometry"]) for f in feats]
+        unioned = unary_union(geoms) if len(geoms) > 1 else geoms[0]
+        merged.append(mapping(unioned))
+    return [shape(geom) for geom in merged]
+
+def vectorised_merge(features: List[Dict[str, Any]]) -> List[Any]:
+    return [f["geometry"] for f in _merge_features_by_lotplan(features)]
+
+def _best(fn, features, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(features)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(sizes: List[int], repeat: int = 5) -> None:
+    print(f"{'parcels':>8} {'features':>9} {'legacy s':>9} {'vector s':>9} {'speedup':>8}")
+    for size in sizes:
+        features = parcel_features(size, multipart_every=2)
+        legacy = _best(legacy_merge, features, repeat)
+        vector = _best(vectorised_merge, features, repeat)
+        print(f"{size:>8} {len(features):>9} {legacy:>9.4f} {vector:>9.4f} {legacy / vector:>7.2f}x")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 500, 2000])
@@ -0,0 +1,40 @@
+# Pages/sec for per-page pdfminer text extraction on synthetic multi-page PDFs.
+#   cd backend && python -m benchmarks.bench_pdf_pages
+import io, sys, time
+from typing import Callable, List
+
+from pdfminer.high_level import extract_text as pdfminer_extract
+from pdfminer.pdfpage import PDFPage
+
+from app.services.pdf_address import _iter_pdfminer_page_texts
+from benchmarks.synthetic import text_pdf
+
+def legacy_page_texts(pdf_bytes: bytes) -> List[str]:
+    # The previous implementation: one full document parse per page.
+    with io.BytesIO(pdf_bytes) as buffer:
+        count = sum(1 for _ in PDFPage.get_pages(buffer))
+    return [pdfminer_extract(io.BytesIO(pdf_bytes), page_numbers=[i]) or "" for i in range(count)]
+
+def single_pass_page_texts(pdf_bytes: bytes) -> List[str]:
+    return list(_iter_pdfminer_page_texts(pdf_bytes))
+
+def pages_per_second(fn: Callable[[bytes], List[str]], pdf_bytes: bytes, repeat: int = 3) -> float:
+    best = float("inf")
+    pages = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = len(fn(pdf_bytes))
+        best = min(best, time.perf_counter() - start)
+    return pages / best
+
+def main(sizes: List[int]) -> None:
+    print(f"{'pages':>6} {'legacy p/s':>12} {'single-pass p/s':>16} {'speedup':>8}")
+    for size in sizes:
+        pdf_bytes = text_pdf(size)
+        assert legacy_page_texts(pdf_bytes) == single_pass_page_texts(pdf_bytes)
+        old = pages_per_second(legacy_page_texts, pdf_bytes)
+        new = pages_per_second(single_pass_page_texts, pdf_bytes)
+        print(f"{size:>6} {old:>12.1f} {new:>16.1f} {new / old:>7.1f}x")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [5, 20, 60])
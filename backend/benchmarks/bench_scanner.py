@@ -0,0 +1,160 @@
+# Throughput of lot/plan + address extraction on large email bodies, comparing the
+# single-pass scanner with the previous per-parser implementation (which it must
+# match exactly; the script fails otherwise).
+#   cd backend && python -m benchmarks.bench_scanner [lines ...]
+import re, sys, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.pdf_address import _InsightScanner, _address_key, extract_text_insights
+from benchmarks.synthetic import email_body
+
+# --- previous implementation, kept verbatim for comparison ---
+_LEGACY_LOTPLAN_PATTERN = re.compile(
+    r"(?:(?:LOT|L)\s*(\d+[A-Z]?)(?:\s*ON)?)\s*(?:[-/\\]|\s)+([A-Z]{1,4}\d+)",
+    re.IGNORECASE,
+)
+_LEGACY_LOTPLAN_SLASH_PATTERN = re.compile(
+    r"(\d+[A-Z]?)\s*/\s*([A-Z]{1,4}\d+)",
+    re.IGNORECASE,
+)
+
+def legacy_parse_lotplan_from_text(text: str) -> List[str]:
+    found: List[str] = []
+    for pattern in (_LEGACY_LOTPLAN_PATTERN, _LEGACY_LOTPLAN_SLASH_PATTERN):
+        for m in pattern.finditer(text):
+            lot = (m.group(1) or "").upper()
+            plan = (m.group(2) or "").upper()
+            if not lot or not plan:
+                continue
+            token = f"{lot} {plan}"
+            if token not in found:
+                found.append(token)
+    return found
+
+def legacy_parse_au_address_structured(text: str) -> List[Dict[str, Any]]:
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    results = []
+    pat = re.compile(
+        r'(?:^"?(?P<prop>[^",]+?)"?\s*,?\s+)?'
+        r'(?:(?P<number>\d{1,5}[A-Z]?)\s+)?'
+        r'(?P<street>[A-Za-z0-9 .\'\-]+?)\s+'
+        r'(?P<suffix>Road|Rd|Street|St|Avenue|Ave|Highway|Hwy|Drive|Dr|Court|Ct|Place|Pl|Boulevard|Blvd|Way|Lane|Ln|Crescent|Cres|Terrace|Tce|Close|Cl)?'
+        r'\s*,\s*(?P<suburb>[A-Za-z ]+)\s*(?:,\s*|\s+)(?P<state>QLD|NSW|VIC|SA|WA|TAS|NT|ACT)\b'
+        r'(?:\s+(?P<pcode>\d{4}))?\s*$',
+        re.I,
+    )
+    for ln in lines:
+        m = pat.search(ln.replace(" – ", " - ").replace("—", "-"))
+        if not m: continue
+        prop = (m.group("prop") or "").strip(' "\'')
+        num = m.group("number")
+        if not num and prop and re.fullmatch(r"\d+[A-Z]?", prop):
+            num = prop
+            prop = ""
+        street = (m.group("street") or "").replace(" - ", "-").replace(" -", "-").replace("- ", "-")
+        suffix = (m.group("suffix") or "").upper()
+        suburb = (m.group("suburb") or "").upper()
+        state = (m.group("state") or "").upper()
+        pcode = m.group("pcode")
+        results.append({
+            "original": ln,
+            "property_name": prop,
+            "house_number": num.strip().upper() if num else None,
+            "street": street.upper(),
+            "suffix": suffix,
+            "suburb": suburb,
+            "state": state,
+            "postcode": int(pcode) if pcode else None
+        })
+    return results[:10]
+
+def legacy_parse_address_and_lotplans(line: str) -> Optional[Dict[str, Any]]:
+    cleaned = line.replace(" – ", " - ").replace("—", "-")
+    if " - " not in cleaned:
+        return None
+    addr_part, lot_part = cleaned.split(" - ", 1)
+    addr_candidates = legacy_parse_au_address_structured(addr_part)
+    if not addr_candidates:
+        return None
+    lot_tokens = legacy_parse_lotplan_from_text(lot_part)
+    if not lot_tokens:
+        return None
+    return {"address": addr_candidates[0], "raw_address": addr_part.strip(), "lotplans": lot_tokens}
+
+def legacy_extract_text_insights(text: str) -> Dict[str, Any]:
+    pages = [{"page_number": 1, "text": text or "", "source": "email"}]
+    groups: List[Dict[str, Any]] = []
+    seen_lotplans: Dict[str, Dict[str, Any]] = {}
+    seen_addresses: Dict[Tuple, Dict[str, Any]] = {}
+    seen_groups: set = set()
+    lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
+    for idx, line in enumerate(lines, start=1):
+        grp = legacy_parse_address_and_lotplans(line)
+        if grp:
+            key = (grp["raw_address"].upper(), tuple(grp["lotplans"]))
+            if key not in seen_groups:
+                groups.append({**grp, "page_number": idx, "extraction_source": "email"})
+                seen_groups.add(key)
+        for lp in legacy_parse_lotplan_from_text(line):
+            lp_norm = lp.upper()
+            if lp_norm not in seen_lotplans:
+                seen_lotplans[lp_norm] = {"lotplan": lp_norm, "page_number": idx, "extraction_source": "email"}
+        for addr in legacy_parse_au_address_structured(line):
+            key = _address_key(addr)
+            if key not in seen_addresses:
+                seen_addresses[key] = {"page_number": idx, "extraction_source": "email", "address": addr}
+    return {
+        "summary": {"total_pages": 1, "lotplans_found": len(seen_lotplans), "addresses_found": len(seen_addresses)},
+        "pages": pages,
+        "lotplans": sorted(seen_lotplans.values(), key=lambda r: (r["page_number"], r["lotplan"])),
+        "addresses": sorted(seen_addresses.values(), key=lambda r: r["page_number"]),
+        "address_lotplan_groups": sorted(groups, key=lambda g: g["page_number"]),
+    }
+
+def legacy_scan_page(text: str) -> Dict[str, Any]:
+    # The per-page loop of the previous _extract_pdf_insights.
+    groups, seen_groups, seen_lotplans, seen_addresses = [], set(), {}, {}
+    for line in text.splitlines():
+        grp = legacy_parse_address_and_lotplans(line.strip())
+        if grp:
+            key = (grp["raw_address"].upper(), tuple(grp["lotplans"]))
+            if key not in seen_groups:
+                groups.append({**grp, "page_number": 1, "extraction_source": "pdfminer"})
+                seen_groups.add(key)
+    for lp in legacy_parse_lotplan_from_text(text):
+        seen_lotplans.setdefault(lp.upper(), {"lotplan": lp.upper(), "page_number": 1, "extraction_source": "pdfminer"})
+    for addr in legacy_parse_au_address_structured(text):
+        seen_addresses.setdefault(_address_key(addr), {"page_number": 1, "extraction_source": "pdfminer", "address": addr})
+    return {"groups": groups, "lotplans": list(seen_lotplans.values()), "addresses": list(seen_addresses.values())}
+
+# --- end of previous implementation ---
+
+def scan_page(text: str) -> Dict[str, Any]:
+    scanner = _InsightScanner()
+    scanner.scan_page(text, 1, "pdfminer")
+    return {"groups": scanner.groups, "lotplans": list(scanner.lotplans.values()), "addresses": list(scanner.addresses.values())}
+
+def best_time(fn: Callable[[], Any], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(sizes: List[int]) -> None:
+    print(f"{'lines':>7} {'case':>13} {'legacy lines/s':>15} {'scanner lines/s':>16} {'speedup':>8}")
+    for size in sizes:
+        text = email_body(size)
+        count = len(text.splitlines())
+        for case, legacy, current in (
+            ("email", lambda: legacy_extract_text_insights(text), lambda: extract_text_insights(text)),
+            ("pdf page", lambda: legacy_scan_page(text), lambda: scan_page(text)),
+        ):
+            if legacy() != current():
+                sys.exit(f"{case}: scanner output differs from the previous implementation at {size} lines")
+            old, new = best_time(legacy), best_time(current)
+            print(f"{size:>7} {case:>13} {count / old:>15,.0f} {count / new:>16,.0f} {old / new:>7.1f}x")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000])
@@ -0,0 +1,46 @@
+# Compare two benchmarks.run JSON files case by case (median times).
+#   cd backend && python -m benchmarks.compare base.json new.json [--threshold 0.1]
+# Exits 1 if any case got slower than the threshold, so it can gate CI.
+import sys, json, argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+def _load(path: str) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    with open(path, encoding="utf-8") as fh:
+        report = json.load(fh)
+    results = {}
+    for entry in report.get("results", []):
+        key = entry["name"] + "".join(f" {k}={v}" for k, v in entry.get("params", {}).items())
+        results[key] = entry
+    return report.get("meta", {}), results
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown reported as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+    base_meta, base = _load(args.base)
+    new_meta, new = _load(args.new)
+    print(f"base: {base_meta.get('commit')} ({base_meta.get('timestamp')})  new: {new_meta.get('commit')} ({new_meta.get('timestamp')})")
+    print(f"{'case':<52} {'base ms':>10} {'new ms':>10} {'ratio':>7}")
+    regressions = 0
+    for key in list(dict.fromkeys([*base, *new])):
+        old, cur = base.get(key, {}), new.get(key, {})
+        if "median" not in old or "median" not in cur:
+            reason = cur.get("skipped") or old.get("skipped") or ("only in base" if key not in new else "only in new")
+            print(f"{key:<52} {'-':>10} {'-':>10} {'-':>7}  ({reason})")
+            continue
+        ratio = cur["median"] / old["median"] if old["median"] else float("inf")
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "  slower"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = "  faster"
+        print(f"{key:<52} {old['median'] * 1000:>10.2f} {cur['median'] * 1000:>10.2f} {ratio:>7.2f}{flag}")
+    if regressions:
+        print(f"{regressions} case(s) slower than {args.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
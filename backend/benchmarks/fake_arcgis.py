@@ -0,0 +1,306 @@
+# A local stand-in for the QLD MapServer: serves /<layer>/query (f=geojson) from
+# a dataset of recorded features, with configurable latency, so end-to-end
+# benchmarks don't depend on (or load) the real service.
+#   cd backend && python -m benchmarks.fake_arcgis serve [--dataset FILE] [--latency 0.05]
+#   cd backend && python -m benchmarks.fake_arcgis record dataset.json
+# "record" proxies every query to QLD_MAPSERVER_BASE and saves the features it
+# returns; point the app (or benchmarks.run --dataset) at it to build a replay set.
+import json, re, sys, time, random, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs, urlencode
+from urllib.request import urlopen
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+_TOKEN = re.compile(r"\s*(?:(UPPER)\s*\(|('(?:[^']|'')*')|(\d+(?:\.\d+)?)|([A-Za-z_]\w*)|(<>|<=|>=|[=<>(),]))", re.I)
+
+def _tokens(where: str) -> List[Tuple[str, Any]]:
+    out: List[Tuple[str, Any]] = []
+    pos = 0
+    where = where.strip()
+    while pos < len(where):
+        match = _TOKEN.match(where, pos)
+        if not match:
+            raise ValueError(f"Unsupported where-clause near {where[pos:pos + 20]!r}")
+        upper, string, number, word, op = match.groups()
+        if upper:
+            out.append(("upper", None))
+        elif string is not None:
+            out.append(("value", string[1:-1].replace("''", "'")))
+        elif number is not None:
+            out.append(("value", float(number)))
+        elif word is not None:
+            keyword = word.upper()
+            out.append(("op", keyword) if keyword in ("AND", "OR", "NOT", "IN", "LIKE", "IS", "NULL") else ("field", word.lower()))
+        else:
+            out.append(("op", op))
+        pos = match.end()
+    return out
+
+def _like(pattern: str) -> "re.Pattern[str]":
+    return re.compile("^" + "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern) + "$", re.S)
+
+class _Where:
+    # Recursive-descent evaluator for the where-clauses the app builds:
+    # AND/OR groups of UPPER(field) = / LIKE / IN comparisons, and 1=1.
+    def __init__(self, where: str):
+        self.tokens = _tokens(where or "1=1")
+        self.pos = 0
+        self.predicate = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected token {self.tokens[self.pos]!r}")
+
+    def _peek(self) -> Tuple[str, Any]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ("end", None)
+
+    def _take(self, kind: str, value: Any = None) -> Any:
+        token = self._peek()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise ValueError(f"Expected {value or kind}, got {token!r}")
+        self.pos += 1
+        return token[1]
+
+    def _or(self) -> Predicate:
+        parts = [self._and()]
+        while self._peek() == ("op", "OR"):
+            self.pos += 1
+            parts.append(self._and())
+        return parts[0] if len(parts) == 1 else (lambda row: any(p(row) for p in parts))
+
+    def _and(self) -> Predicate:
+        parts = [self._term()]
+        while self._peek() == ("op", "AND"):
+            self.pos += 1
+            parts.append(self._term())
+        return parts[0] if len(parts) == 1 else (lambda row: all(p(row) for p in parts))
+
+    def _term(self) -> Predicate:
+        if self._peek() == ("op", "NOT"):
+            self.pos += 1
+            inner = self._term()
+            return lambda row: not inner(row)
+        if self._peek() == ("op", "("):
+            self.pos += 1
+            inner = self._or()
+            self._take("op", ")")
+            return inner
+        left = self._operand()
+        kind, op = self._peek()
+        self.pos += 1
+        if op == "IS":
+            negate = self._peek() == ("op", "NOT")
+            self.pos += negate
+            self._take("op", "NULL")
+            return lambda row: (left(row) is None) != negate
+        if op == "IN":
+            self._take("op", "(")
+            values = [self._operand()(None)]
+            while self._peek() == ("op", ","):
+                self.pos += 1
+                values.append(self._operand()(None))
+            self._take("op", ")")
+            members = set(values)
+            return lambda row: left(row) in members
+        right = self._operand()
+        if op == "LIKE":
+            pattern = _like(str(right(None)))
+            return lambda row: left(row) is not None and bool(pattern.match(str(left(row))))
+        compare = {"=": lambda a, b: a == b, "<>": lambda a, b: a != b, "<": lambda a, b: a < b,
+                   ">": lambda a, b: a > b, "<=": lambda a, b: a <= b, ">=": lambda a, b: a >= b}.get(op)
+        if kind != "op" or compare is None:
+            raise ValueError(f"Unsupported operator {op!r}")
+
+        def check(row: Dict[str, Any]) -> bool:
+            a, b = left(row), right(row)
+            if a is None or b is None:
+                return False
+            if isinstance(a, float) or isinstance(b, float):
+                try:
+                    a, b = float(a), float(b)
+                except (TypeError, ValueError):
+                    return False
+            return compare(a, b)
+        return check
+
+    def _operand(self) -> Callable[[Optional[Dict[str, Any]]], Any]:
+        kind, value = self._peek()
+        if kind == "upper":
+            self.pos += 1
+            inner = self._operand()
+            self._take("op", ")")
+            return lambda row: None if inner(row) is None else str(inner(row)).upper()
+        self.pos += 1
+        if kind == "value":
+            return lambda row: value
+        if kind == "field":
+            return lambda row: row.get(value) if row is not None else None
+        raise ValueError(f"Unexpected token {(kind, value)!r}")
+
+def _sort_value(value: Any) -> Tuple[int, Any]:
+    return (0, value) if isinstance(value, (int, float)) else (1, str(value or ""))
+
+def where_predicate(where: str) -> Predicate:
+    return _Where(where).predicate
+
+class FakeMapServer:
+    def __init__(self, dataset: Dict[str, Any], latency: float = 0.0, jitter: float = 0.0,
+                 max_record_count: int = 2000, upstream: Optional[str] = None):
+        self.layers: Dict[str, List[Dict[str, Any]]] = {str(k): list(v) for k, v in (dataset.get("layers") or {}).items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.max_record_count = max_record_count
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._shapes: Dict[Tuple[str, int], Any] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "server not started"
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def dataset(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"layers": {layer: list(feats) for layer, feats in self.layers.items()}}
+
+    def _shape(self, layer: str, index: int, feature: Dict[str, Any]) -> Any:
+        from shapely.geometry import shape
+        key = (layer, index)
+        if key not in self._shapes:
+            geom = feature.get("geometry")
+            self._shapes[key] = shape(geom) if geom else None
+        return self._shapes[key]
+
+    def query(self, layer: str, params: Dict[str, str]) -> Dict[str, Any]:
+        if self.upstream:
+            return self._record(layer, params)
+        features = self.layers.get(layer)
+        if features is None:
+            return {"error": {"code": 400, "message": f"Invalid layer {layer}"}}
+        try:
+            predicate = where_predicate(params.get("where", "1=1"))
+        except ValueError as exc:
+            return {"error": {"code": 400, "message": f"Unable to complete operation: {exc}"}}
+        point = None
+        if params.get("geometry") and params.get("geometryType", "esriGeometryPoint") == "esriGeometryPoint":
+            from shapely.geometry import Point
+            geom = json.loads(params["geometry"])
+            point = Point(float(geom["x"]), float(geom["y"]))
+        hits = []
+        for index, feature in enumerate(features):
+            props = {str(k).lower(): v for k, v in (feature.get("properties") or {}).items()}
+            if not predicate(props):
+                continue
+            if point is not None:
+                shp = self._shape(layer, index, feature)
+                if shp is None or not shp.intersects(point):
+                    continue
+            hits.append(feature)
+        if str(params.get("returnCountOnly", "")).lower() == "true":
+            return {"type": "FeatureCollection", "features": [], "properties": {"count": len(hits)}}
+        order = [field.split()[0].lower() for field in (params.get("orderByFields") or "").split(",") if field.strip()]
+        if order:
+            hits.sort(key=lambda f: tuple(_sort_value((f.get("properties") or {}).get(field)) for field in order))
+        offset = int(params.get("resultOffset") or 0)
+        count = min(int(params.get("resultRecordCount") or self.max_record_count), self.max_record_count)
+        page = hits[offset:offset + count]
+        out: Dict[str, Any] = {"type": "FeatureCollection", "features": page}
+        if offset + count < len(hits):
+            out["properties"] = {"exceededTransferLimit": True}
+        return out
+
+    def _record(self, layer: str, params: Dict[str, str]) -> Dict[str, Any]:
+        with urlopen(f"{self.upstream}/{layer}/query?{urlencode(params)}", timeout=60) as response:
+            data = json.loads(response.read())
+        with self._lock:
+            known = self.layers.setdefault(layer, [])
+            seen = {json.dumps(f.get("properties"), sort_keys=True) for f in known}
+            for feature in data.get("features") or []:
+                key = json.dumps(feature.get("properties"), sort_keys=True)
+                if key not in seen:
+                    known.append(feature)
+                    seen.add(key)
+        return data
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeMapServer":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                parts = urlsplit(self.path)
+                match = re.search(r"/(\d+)/query$", parts.path)
+                if not match:
+                    self.send_error(404)
+                    return
+                params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency or fake.jitter:
+                    time.sleep(fake.latency + random.uniform(0, fake.jitter))
+                body = json.dumps(fake.query(match.group(1), params)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+def load_dataset(path: Optional[str]) -> Dict[str, Any]:
+    if path:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    from benchmarks.synthetic import mapserver_dataset, quote_lines
+    return mapserver_dataset(quote_lines(2000))
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import os
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_arcgis")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Replay a dataset (default: synthetic)")
+    serve.add_argument("--dataset")
+    record = sub.add_parser("record", help="Proxy to the real MapServer and save what it returns")
+    record.add_argument("out")
+    record.add_argument("--upstream", default=os.getenv("QLD_MAPSERVER_BASE", "https://spatial-gis.information.qld.gov.au/arcgis/rest/services/PlanningCadastre/LandParcelPropertyFramework/MapServer"))
+    for cmd in (serve, record):
+        cmd.add_argument("--port", type=int, default=8090)
+        cmd.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+        cmd.add_argument("--jitter", type=float, default=0.0, help="Extra random 0..N seconds per response")
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        fake = FakeMapServer(load_dataset(args.dataset), latency=args.latency, jitter=args.jitter)
+    else:
+        fake = FakeMapServer({}, latency=args.latency, jitter=args.jitter, upstream=args.upstream)
+    fake.start(port=args.port)
+    print(f"Fake MapServer on {fake.url} (set QLD_MAPSERVER_BASE={fake.url}); Ctrl-C to stop", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.stop()
+        if args.command == "record":
+            with open(args.out, "w", encoding="utf-8") as fh:
+                json.dump(fake.dataset(), fh)
+            print(f"Recorded {sum(len(v) for v in fake.layers.values())} features to {args.out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# Benchmark suite: parsers, PDF insight extraction (text and scanned PDFs),
+# feature merging, KMZ generation at 10/100/1000 parcels and end-to-end endpoint
+# latency against a local fake MapServer. Results are written as JSON so runs
+# can be compared between commits with benchmarks.compare.
+#   cd backend && python -m benchmarks.run [--out results.json] [--filter kmz] [--quick]
+#   cd backend && python -m benchmarks.compare base.json results.json
+import os, sys, json, time, base64, shutil, tempfile, platform, argparse, statistics, subprocess
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.fake_arcgis import FakeMapServer, load_dataset
+from benchmarks.synthetic import email_body, parcel_features, quote_lines, scanned_pdf, text_pdf
+
+# (name, params, setup) -> setup() returns the callable to time, or raises Skip.
+Case = Tuple[str, Dict[str, Any], Callable[[], Callable[[], Any]]]
+
+class Skip(Exception):
+    pass
+
+def _configure_app(mapserver_url: str, workdir: str) -> None:
+    # Must run before anything under app/ is imported: settings are read at import time.
+    os.environ.update({
+        "QLD_MAPSERVER_BASE": mapserver_url,
+        "QLD_CACHE_DIR": workdir,
+        "QLD_PARCEL_CACHE": "false",
+        "QLD_LABEL_CACHE": "false",
+        "PDF_INSIGHTS_CACHE": "false",
+        "QLD_CADASTRE_DB": "",
+        "QLD_GAZETTEER_DB": "",
+        "QLD_JOB_WORKERS": "0",
+        "QLD_RETRY_ATTEMPTS": "0",
+        "X_API_KEY": "",
+    })
+
+def _ocr_available() -> bool:
+    return bool(shutil.which("pdftoppm") and shutil.which("tesseract"))
+
+def parser_cases(quick: bool) -> List[Case]:
+    from app.services.pdf_address import extract_text_insights, parse_au_address_structured, parse_lotplan_from_text
+    cases: List[Case] = []
+    for lines in ([1000] if quick else [1000, 10000]):
+        text = "\n".join(quote_lines(lines))
+        cases.append(("parse_au_address_structured", {"lines": lines}, lambda text=text: lambda: parse_au_address_structured(text)))
+        cases.append(("parse_lotplan_from_text", {"lines": lines}, lambda text=text: lambda: parse_lotplan_from_text(text)))
+        body = email_body(lines)
+        cases.append(("extract_text_insights", {"lines": lines}, lambda body=body: lambda: extract_text_insights(body)))
+    return cases
+
+def pdf_cases(quick: bool) -> List[Case]:
+    from app.services.pdf_address import extract_pdf_insights
+    cases: List[Case] = []
+    for pages in ([1, 10] if quick else [1, 10, 50]):
+        pdf = text_pdf(pages)
+        cases.append(("extract_pdf_insights", {"kind": "text", "pages": pages}, lambda pdf=pdf: lambda: extract_pdf_insights(pdf)))
+
+    def scanned(pages: int) -> Callable[[], Any]:
+        if not _ocr_available():
+            raise Skip("pdftoppm/tesseract not installed")
+        pdf = scanned_pdf(pages)
+        return lambda: extract_pdf_insights(pdf)
+    for pages in ([1] if quick else [1, 5]):
+        cases.append(("extract_pdf_insights", {"kind": "scanned", "pages": pages}, lambda pages=pages: scanned(pages)))
+    return cases
+
+def geometry_cases(quick: bool) -> List[Case]:
+    from app.services.arcgis import _merge_features_by_lotplan, to_kmz
+    cases: List[Case] = []
+    for parcels in (10, 100, 1000):
+        features = parcel_features(parcels)
+        cases.append(("merge_features_by_lotplan", {"parcels": parcels}, lambda f=features: lambda: _merge_features_by_lotplan(f)))
+        cases.append(("to_kmz", {"parcels": parcels}, lambda f=features: lambda: to_kmz(f, folder_name="bench")))
+    return cases
+
+def endpoint_cases(quick: bool, fake: FakeMapServer) -> List[Case]:
+    dataset = fake.dataset()["layers"]
+    addresses = [f["properties"] for f in dataset.get("0", [])]
+    lotplans = [f["properties"]["lotplan"] for f in dataset.get("3", [])]
+
+    def client() -> Any:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        return TestClient(app, headers={"Cache-Control": "no-cache"})
+
+    def ok(response: Any) -> Any:
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.request.url.path}: HTTP {response.status_code} {response.text[:200]}")
+        return response.content
+
+    def by_lotplan(count: int) -> Callable[[], Any]:
+        if len(lotplans) < count:
+            raise Skip(f"dataset has only {len(lotplans)} parcels")
+        c, query = client(), ",".join(lotplans[:count])
+        return lambda: ok(c.get("/kmz_by_lotplan", params={"lotplan": query}))
+
+    def by_address() -> Callable[[], Any]:
+        if not addresses:
+            raise Skip("dataset has no addresses")
+        c, address = client(), addresses[0]["address"]
+        return lambda: ok(c.post("/kmz_by_address", json={"address": address}))
+
+    def process_pdf(pages: int) -> Callable[[], Any]:
+        c, pdf = client(), text_pdf(pages)
+        return lambda: ok(c.post("/process_pdf_kmz", files={"pdf": ("quote.pdf", pdf, "application/pdf")}))
+
+    def from_email() -> Callable[[], Any]:
+        c = client()
+        payload = {
+            "subject": "Fencing quote",
+            "body_text": "\n".join(quote_lines(20, seed=3)),
+            "attachments": [{"filename": "quote.pdf", "content_type": "application/pdf",
+                             "content_base64": base64.b64encode(text_pdf(2)).decode()}],
+        }
+        return lambda: ok(c.post("/kmz_from_email", json=payload))
+
+    cases: List[Case] = [
+        ("endpoint", {"route": "/kmz_by_lotplan", "lotplans": 1}, lambda: by_lotplan(1)),
+        ("endpoint", {"route": "/kmz_by_lotplan", "lotplans": 50}, lambda: by_lotplan(50)),
+        ("endpoint", {"route": "/kmz_by_address"}, by_address),
+        ("endpoint", {"route": "/process_pdf_kmz", "pages": 5}, lambda: process_pdf(5)),
+        ("endpoint", {"route": "/kmz_from_email"}, from_email),
+    ]
+    return cases
+
+def measure(fn: Callable[[], Any], repeat: int, min_time: float) -> List[float]:
+    fn()  # warm-up: imports, pools, connections
+    runs: List[float] = []
+    spent = 0.0
+    while len(runs) < repeat or spent < min_time:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        runs.append(elapsed)
+        spent += elapsed
+        if len(runs) >= repeat * 20:
+            break
+    return runs
+
+def _summary(runs: List[float]) -> Dict[str, Any]:
+    return {
+        "runs": len(runs),
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    commit = out.stdout.strip() or None
+    return f"{commit}-dirty" if commit and dirty.stdout.strip() else commit
+
+def label(name: str, params: Dict[str, Any]) -> str:
+    return name + "".join(f" {key}={value}" for key, value in params.items())
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--out", help="Write results JSON here (default: stdout only)")
+    parser.add_argument("--filter", action="append", default=[], help="Only run cases whose label contains this (repeatable)")
+    parser.add_argument("--repeat", type=int, default=5, help="Minimum timed runs per case (default 5)")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Keep repeating until this many seconds are spent (default 0.5)")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs and fewer runs")
+    parser.add_argument("--dataset", help="Recorded MapServer dataset for the endpoint cases (default: synthetic)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake MapServer response latency in seconds (default 0.02)")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.repeat, args.min_time = min(args.repeat, 3), 0.0
+
+    workdir = tempfile.mkdtemp(prefix="qld-bench-")
+    fake = FakeMapServer(load_dataset(args.dataset), latency=args.latency).start()
+    _configure_app(fake.url, workdir)
+    try:
+        cases = parser_cases(args.quick) + pdf_cases(args.quick) + geometry_cases(args.quick) + endpoint_cases(args.quick, fake)
+        results: List[Dict[str, Any]] = []
+        print(f"{'case':<52} {'runs':>5} {'median ms':>11} {'min ms':>10} {'stdev ms':>10}", file=sys.stderr)
+        for name, params, setup in cases:
+            text = label(name, params)
+            if args.filter and not any(f in text for f in args.filter):
+                continue
+            entry: Dict[str, Any] = {"name": name, "params": params}
+            try:
+                entry.update(_summary(measure(setup(), args.repeat, args.min_time)))
+            except Skip as exc:
+                entry["skipped"] = str(exc)
+                print(f"{text:<52} skipped: {exc}", file=sys.stderr)
+            else:
+                print(f"{text:<52} {entry['runs']:>5} {entry['median'] * 1000:>11.2f} {entry['min'] * 1000:>10.2f} {entry['stdev'] * 1000:>10.2f}", file=sys.stderr)
+            results.append(entry)
+    finally:
+        fake.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+            "mapserver_latency": args.latency,
+            "dataset": args.dataset or "synthetic",
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Wrote {len(results)} results to {args.out}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
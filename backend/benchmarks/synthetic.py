@@ -0,0 +1,168 @@
+import random, re
+from typing import List, Optional
+
+_STREETS = ["SMITH", "MAIN", "BRUCE", "KENNEDY", "GORE", "WARREGO", "CUNNINGHAM", "NEW ENGLAND"]
+_SUFFIXES = ["Road", "Rd", "Street", "St", "Highway", "Hwy", "Drive", "Lane"]
+_SUBURBS = ["TOOWOOMBA", "DALBY", "ROMA", "WARWICK", "GATTON", "STANTHORPE"]
+_PLANS = ["RP", "SP", "CP", "DD", "AG"]
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def quote_lines(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    lines: List[str] = []
+    for i in range(count):
+        kind = i % 5
+        street = rng.choice(_STREETS).title()
+        suffix = rng.choice(_SUFFIXES)
+        suburb = rng.choice(_SUBURBS).title()
+        lot = rng.randint(1, 99)
+        plan = f"{rng.choice(_PLANS)}{rng.randint(1000, 999999)}"
+        if kind == 0:
+            lines.append(f"{rng.randint(1, 999)} {street} {suffix}, {suburb} QLD {rng.randint(4000, 4999)} - Lot {lot} {plan}")
+        elif kind == 1:
+            lines.append(f"Lot {lot} on {plan} and {lot + 1}/{plan}")
+        elif kind == 2:
+            lines.append(f"{rng.randint(1, 999)} {street} {suffix}, {suburb}, QLD")
+        else:
+            lines.append(f"Schedule item {i}: supply and install fencing, gates and {rng.randint(1, 50)} strainer posts.")
+    return lines
+
+def email_body(lines: int) -> str:
+    # Quote lines mixed with the noise real emails carry: blank lines, dashes,
+    # "Lot 3\nRP1234" split across lines and signatures.
+    out: List[str] = []
+    for i, line in enumerate(quote_lines(lines)):
+        out.append(line.replace(" - ", " – ") if i % 17 == 0 else line)
+        if i % 13 == 0:
+            out.append("")
+        if i % 29 == 0:
+            out.append(f"Lot {i % 90 + 1}")
+            out.append(f"RP{100000 + i}")
+        if i % 31 == 0:
+            out.append("Regards, Sam — Fencing Co, Toowoomba QLD")
+    return "\n".join(out)
+
+def text_pdf(pages: int, lines_per_page: int = 40, seed: int = 7, blank_pages: Optional[List[int]] = None) -> bytes:
+    blank = set(blank_pages or [])
+    all_lines = quote_lines(pages * lines_per_page, seed=seed)
+    objects: List[bytes] = []
+    # 1: catalog, 2: pages, 3: font, then a (page, content stream) pair per page
+    page_ids = [4 + 2 * p for p in range(pages)]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for p, page_id in enumerate(page_ids):
+        chunk = [] if p in blank else all_lines[p * lines_per_page:(p + 1) * lines_per_page]
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in chunk:
+            ops.append(f"({_pdf_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for index, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{index} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+    return bytes(out)
+
+def parcel_features(count: int, vertices: int = 64, multipart_every: int = 4, seed: int = 11) -> List[dict]:
+    # Roughly circular parcels on a grid; every Nth lot/plan also comes back as
+    # extra adjoining features, like multi-part parcels from the Parcels layer.
+    import math
+    rng = random.Random(seed)
+    features: List[dict] = []
+    for i in range(count):
+        cx = 151.0 + (i % 40) * 0.02
+        cy = -27.0 - (i // 40) * 0.02
+        lotplan = f"{i + 1}RP{100000 + i}"
+        parts = 1 + (2 if multipart_every and i % multipart_every == 0 else 0)
+        for part in range(parts):
+            ox = cx + part * 0.004
+            ring = []
+            for v in range(vertices):
+                angle = 2 * math.pi * v / vertices
+                radius = 0.002 * (1 + 0.1 * rng.random())
+                ring.append([ox + radius * math.cos(angle), cy + radius * math.sin(angle)])
+            ring.append(ring[0])
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": [ring]},
+                "properties": {"lotplan": lotplan, "objectid": i * 10 + part, "lot_area": 40000 + i},
+            })
+    return features
+
+def scanned_pdf(pages: int, lines_per_page: int = 30, seed: int = 7) -> bytes:
+    # Image-only pages with no text layer, so extraction has to go through OCR.
+    import io
+    from PIL import Image, ImageDraw, ImageFont
+    all_lines = quote_lines(pages * lines_per_page, seed=seed)
+    font = ImageFont.load_default()
+    images = []
+    for p in range(pages):
+        image = Image.new("L", (1240, 1754), 255)
+        draw = ImageDraw.Draw(image)
+        for row, line in enumerate(all_lines[p * lines_per_page:(p + 1) * lines_per_page]):
+            draw.text((80, 80 + row * 48), line, fill=0, font=font)
+        images.append(image)
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:], resolution=150)
+    return out.getvalue()
+
+_LOT_ON_PLAN = re.compile(r"Lot (\d+) (?:on )?([A-Z]{2}\d+)")
+_LOT_SLASH_PLAN = re.compile(r"\b(\d+)/([A-Z]{2}\d+)")
+_ADDRESS_LINE = re.compile(r"^(\d+) ([A-Za-z ]+?) (\w+), ([A-Za-z]+),? QLD")
+
+def mapserver_dataset(lines: List[str], bulk_parcels: int = 2500) -> dict:
+    # Address (0) and Parcels (3) features for every address and lot/plan in the
+    # quote lines, plus "<n>SP5000" filler parcels for bulk lot/plan lookups.
+    parcels: dict = {}
+    addresses: List[dict] = []
+
+    def parcel(lotplan: str) -> List[float]:
+        if lotplan not in parcels:
+            i = len(parcels)
+            x, y = 150.0 + (i % 200) * 0.002, -28.0 - (i // 200) * 0.002
+            ring = [[x, y], [x + 0.001, y], [x + 0.001, y + 0.001], [x, y + 0.001], [x, y]]
+            parcels[lotplan] = {
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": [ring]},
+                "properties": {"lotplan": lotplan, "objectid": i + 1, "lot_area": 1000 + i, "tenure": "Freehold"},
+            }
+        x, y = parcels[lotplan]["geometry"]["coordinates"][0][0]
+        return [x + 0.0005, y + 0.0005]
+
+    for n, line in enumerate(lines):
+        pairs = _LOT_ON_PLAN.findall(line) + _LOT_SLASH_PLAN.findall(line)
+        for lot, plan in pairs:
+            parcel(f"{lot}{plan}")
+        match = _ADDRESS_LINE.match(line)
+        if not match:
+            continue
+        number, street, suffix, suburb = match.groups()
+        lotplan = f"{pairs[0][0]}{pairs[0][1]}" if pairs else f"{n + 1}SP{900000 + n}"
+        lon, lat = parcel(lotplan)
+        addresses.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {
+                "objectid": len(addresses) + 1, "lotplan": lotplan, "street_number": number,
+                "street_name": street.upper(), "street_type": suffix.upper(), "street_suffix": None,
+                "locality": suburb.upper(), "state": "QLD", "address": line.split(" - ")[0],
+                "latitude": lat, "longitude": lon,
+            },
+        })
+    for i in range(1, bulk_parcels + 1):
+        parcel(f"{i}SP5000")
+    return {"layers": {"0": addresses, "3": list(parcels.values())}}
@@ -0,0 +1,31 @@
+# Settings are read when app/ is imported, so the environment (and the fake
+# MapServer it points at) is set up before any test module is collected.
+import os, sys, atexit, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from benchmarks.fake_arcgis import FakeMapServer
+from benchmarks.synthetic import mapserver_dataset, quote_lines
+
+_fake = FakeMapServer(mapserver_dataset(quote_lines(80))).start()
+atexit.register(_fake.stop)
+os.environ.update({
+    "QLD_MAPSERVER_BASE": _fake.url,
+    "QLD_CACHE_DIR": tempfile.mkdtemp(prefix="qld-test-"),
+    "QLD_PARCEL_CACHE": "false",
+    "QLD_LABEL_CACHE": "false",
+    "PDF_INSIGHTS_CACHE": "false",
+    "QLD_CADASTRE_DB": "",
+    "QLD_GAZETTEER_DB": "",
+    "QLD_JOB_WORKERS": "0",
+    "QLD_RETRY_ATTEMPTS": "0",
+    "X_API_KEY": "",
+})
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app, headers={"Cache-Control": "no-cache"})
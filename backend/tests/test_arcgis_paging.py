@@ -0,0 +1,21 @@
+# iter_query_features streams the same features paged_query_plan collects.
+import pytest
+
+from app.services import arcgis
+
+@pytest.mark.parametrize("parallel", [True, False])
+@pytest.mark.parametrize("max_features", [None, 30])
+def test_iter_query_features_matches_paged_plan(monkeypatch, parallel, max_features):
+    monkeypatch.setattr(arcgis, "MAX_RECORD_COUNT", 7)
+    monkeypatch.setattr(arcgis, "PARALLEL_PAGES", parallel)
+    params = {"where": "1=1", "returnGeometry": "false"}
+    expected, _ = arcgis.run_plan(arcgis.paged_query_plan(arcgis.PARCELS_LAYER, params, max_features))
+    streamed = list(arcgis.iter_query_features(arcgis.PARCELS_LAYER, params, max_features))
+    assert len(expected) > 7
+    assert streamed == expected
+
+def test_iter_query_features_streams_into_kmz(monkeypatch):
+    monkeypatch.setattr(arcgis, "MAX_RECORD_COUNT", 7)
+    features = arcgis.iter_query_features(arcgis.PARCELS_LAYER, {"where": "1=1"}, max_features=20)
+    kmz = b"".join(arcgis.iter_kmz(features, folder_name="paged"))
+    assert kmz.startswith(b"PK")
@@ -0,0 +1,26 @@
+# simplify_shared: neighbours stay aligned when one of them can't be simplified.
+import math
+
+from shapely.geometry import Polygon
+
+from app.services.geometry import longitude_scale, simplify_shared
+
+SHARED = [(0, 0), (4, 0), (5, 0.8), (6, 0), (10, 0)]
+
+def test_invalid_result_keeps_shared_arc_for_neighbours():
+    # Straightening the shared bump would cut through below's tongue.
+    below = Polygon(SHARED + [(10, -1), (5.2, -1), (5.2, 0.3), (4.8, 0.3), (4.8, -1), (0, -1)])
+    above = Polygon(list(reversed(SHARED)) + [(0, 2), (10, 2)])
+    out = simplify_shared([below, above], 0.9)
+    assert out[0].equals(below)
+    assert (5.0, 0.8) in out[1].exterior.coords
+    assert out[1].is_valid and out[0].intersection(out[1]).area == 0
+
+def test_longitude_scaled_before_simplifying():
+    bump = Polygon([(0, 0), (0, 4), (1.5, 5), (0, 6), (0, 10), (-5, 10), (-5, 0)])
+    assert (1.5, 5.0) in simplify_shared([bump], 1.0)[0].exterior.coords
+    assert (1.5, 5.0) not in simplify_shared([bump], 1.0, x_scale=0.5)[0].exterior.coords
+
+def test_longitude_scale_uses_mid_latitude():
+    square = Polygon([(150, -61), (151, -61), (151, -59), (150, -59)])
+    assert math.isclose(longitude_scale([square]), 0.5, rel_tol=1e-9)
@@ -0,0 +1,58 @@
+# Job claims survive long documents; webhooks go to the address that was checked.
+import os, asyncio, tempfile
+
+import httpx
+
+from app.services import jobs
+
+def _store() -> jobs.JobStore:
+    return jobs.JobStore(os.path.join(tempfile.mkdtemp(prefix="qld-jobs-"), "jobs.sqlite3"))
+
+def test_heartbeat_keeps_running_document_claimed(monkeypatch):
+    store = _store()
+    store.create([("a.pdf", "pdf", b"%PDF")], {})
+    doc = store.claim()
+    clock = [jobs.time.time()]
+    monkeypatch.setattr(jobs.time, "time", lambda: clock[0])
+    clock[0] += jobs.JOB_STALE_AFTER * 0.9
+    store.heartbeat(doc)
+    clock[0] += jobs.JOB_STALE_AFTER * 0.9
+    assert store.claim() is None
+    clock[0] += jobs.JOB_STALE_AFTER * 1.1
+    assert store.claim()["index"] == doc["index"]
+
+def test_runner_heartbeats_while_processing(monkeypatch):
+    store = _store()
+    job_id = store.create([("a.pdf", "pdf", b"%PDF")], {})
+    beats = []
+    monkeypatch.setattr(jobs, "JOB_STALE_AFTER", 0.06)
+    monkeypatch.setattr(store, "heartbeat", lambda doc: beats.append(doc["index"]))
+
+    async def process(doc):
+        await asyncio.sleep(0.1)
+        return "folder", {"all_parcels": []}, b"kmz"
+
+    async def run():
+        runner = jobs.JobRunner(store, workers=0)
+        runner.start(process)
+        await runner._run_once()
+
+    asyncio.run(run())
+    assert beats
+    assert store.get(job_id)["status"] == "completed"
+
+def test_webhook_posts_to_checked_address():
+    url, headers, extensions = jobs._pinned_request("https://hooks.example.com:8443/done?x=1", "93.184.216.34")
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.update(url=str(request.url), host=request.headers["host"], sni=request.extensions.get("sni_hostname"))
+        return httpx.Response(204)
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        client.post(url, json={}, headers=headers, extensions=extensions)
+    assert seen == {"url": "https://93.184.216.34:8443/done?x=1", "host": "hooks.example.com:8443", "sni": "hooks.example.com"}
+
+def test_allow_listed_webhook_is_not_pinned():
+    url, headers, extensions = jobs._pinned_request("https://hooks.example.com/done", None)
+    assert str(url) == "https://hooks.example.com/done" and not headers and not extensions
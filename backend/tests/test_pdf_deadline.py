@@ -0,0 +1,25 @@
+# /process_pdf_kmz with extraction slower than the request deadline: the lot/plan
+# prefetch must not start the request's lookup budget while pages are still
+# being extracted.
+import time
+
+PAGE_DELAY = 1.5
+
+def test_slow_extraction_does_not_spend_lookup_budget(client, monkeypatch):
+    import app.main
+    from app.services import resilience
+    from benchmarks.synthetic import text_pdf
+    extract = app.main.iter_pdf_insights
+
+    def slow_pages(*args, **kwargs):
+        for kind, value in extract(*args, **kwargs):
+            yield kind, value
+            if kind == "page":
+                time.sleep(PAGE_DELAY)
+
+    monkeypatch.setattr(resilience, "REQUEST_DEADLINE", 1.0)
+    monkeypatch.setattr(app.main, "iter_pdf_insights", slow_pages)
+    started = time.monotonic()
+    response = client.post("/process_pdf_kmz", files={"pdf": ("quote.pdf", text_pdf(2), "application/pdf")})
+    assert time.monotonic() - started > 2 * PAGE_DELAY
+    assert response.status_code == 200, response.text[:200]
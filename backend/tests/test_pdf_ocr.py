@@ -0,0 +1,27 @@
+# PDF text extraction: OCR failures must not be cached as blank pages.
+from app.services import pdf_address
+from benchmarks.synthetic import text_pdf
+
+def _cached_keys(monkeypatch, ocr_result):
+    keys = []
+    monkeypatch.setattr(pdf_address, "OCR_WORKERS", 1)
+    monkeypatch.setattr(pdf_address, "_ocr_single_page", lambda task: ocr_result)
+    monkeypatch.setattr(pdf_address.insights_cache, "get", lambda key: pdf_address.MISSING)
+    monkeypatch.setattr(pdf_address.insights_cache, "set", lambda key, value, ttl=None: keys.append(key))
+    insights = pdf_address.extract_pdf_insights(text_pdf(3, blank_pages=[1]))
+    return insights, keys
+
+def test_failed_ocr_is_flagged_and_not_cached(monkeypatch):
+    insights, keys = _cached_keys(monkeypatch, None)
+    assert [page.get("ocr_failed", False) for page in insights["pages"]] == [False, True, False]
+    assert keys == []
+
+def test_blank_ocr_page_is_cached(monkeypatch):
+    insights, keys = _cached_keys(monkeypatch, "")
+    assert not any(page.get("ocr_failed") for page in insights["pages"])
+    assert len(keys) == 1
+
+def test_extract_text_from_pdf_joins_pages():
+    text = pdf_address.extract_text_from_pdf(text_pdf(2))
+    pages = [page["text"] for page in pdf_address.iter_pdf_pages(text_pdf(2))]
+    assert text == "\n".join(pages) and all(pages)